@@ -0,0 +1,915 @@
+#!/usr/bin/env python3
+"""
+Benchmarks offline do Conversor de Vídeo/Áudio
+
+Sobe um servidor HTTP local com arquivos de mídia sintéticos (com suporte
+a Range, latência e limite de banda configuráveis) e uma página que
+imita o Streamyard, mede o caminho atual do DownloadThread e guarda o
+histórico por commit para detectar regressões.
+
+Uso:
+    python benchmark.py                       # todos os benchmarks
+    python benchmark.py --only download --size-mb 50 --bandwidth-mbps 200
+    python benchmark.py --compare             # falha se houver regressão
+    python benchmark.py --only scratch --share-dir /mnt/nas/teste
+    python benchmark.py --only layout         # pasta única vs. subpastas com 50 mil arquivos
+    python benchmark.py --only hls --latency-ms 50
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import main
+
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_history.jsonl')
+
+STREAMYARD_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Streamyard (benchmark)</title></head>
+<body>
+<button class="play-button" onclick="document.getElementById('v').play()">play</button>
+<video id="v" src="/media/VOD.mp4" preload="auto"></video>
+</body>
+</html>
+"""
+
+# Content-Type das rotas /media/ por extensão (o extrator genérico do yt-dlp reconhece HLS por ele)
+MEDIA_TYPES = {
+    '.mp4': 'video/mp4',
+    '.m4a': 'audio/mp4',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+def write_hls(media_dir, name, segments, segment_size, segment_seconds=2, ended=True):
+    """
+    Grava uma playlist HLS com segmentos aleatórios em media_dir (sem ended, uma transmissão ainda no ar)
+    
+    Returns:
+        bytes: Conteúdo dos segmentos concatenados em ordem (o arquivo esperado após o download)
+    """
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f"#EXT-X-TARGETDURATION:{segment_seconds}", '#EXT-X-MEDIA-SEQUENCE:0']
+    if ended:
+        lines.append('#EXT-X-PLAYLIST-TYPE:VOD')
+    data = []
+    for index in range(segments):
+        segment = os.urandom(segment_size)
+        with open(os.path.join(media_dir, f"{name}-{index}.ts"), 'wb') as f:
+            f.write(segment)
+        data.append(segment)
+        lines += [f"#EXTINF:{segment_seconds}.0,", f"{name}-{index}.ts"]
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+    with open(os.path.join(media_dir, f"{name}.m3u8"), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return b''.join(data)
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Servidor que não imprime conexões encerradas pelo cliente (ex: após um HEAD)"""
+    
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """
+    Servidor HTTP local que entrega mídia sintética
+    
+    Rotas:
+        /media/<nome>.mp4 | .m4a     Arquivo de mídia (com suporte a Range)
+        /media/<nome>.m3u8 | .ts     Playlist HLS e seus fragmentos
+        /streamyard.com/watch/<id>   Página que imita o Streamyard
+    """
+    
+    def __init__(self, media_dir, latency=0.0, bandwidth=None, stall_after=None, stall_requests=(1,)):
+        """
+        Args:
+            media_dir: Pasta com os arquivos servidos em /media/
+            latency: Atraso (segundos) antes do primeiro byte de cada resposta
+            bandwidth: Limite de banda por conexão em bytes/s (None = sem limite)
+            stall_after: Bytes entregues antes de a conexão cair para ~5 KB/s (None = nunca)
+            stall_requests: Números (1 = primeira) das requisições de mídia que travam;
+                com o extrator genérico do yt-dlp, a primeira é a análise e a segunda o download
+        """
+        self.media_dir = media_dir
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.stall_after = stall_after
+        self.stall_requests = set(stall_requests)
+        self.media_requests = 0
+        self._lock = threading.Lock()
+        self.requests = 0
+        # Conexões atendidas ao mesmo tempo (agora e o pico), para conferir a concorrência dos clientes
+        self.active = 0
+        self.peak_active = 0
+        self._server = QuietHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def _make_handler(self):
+        fixture = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_HEAD(self):
+                self.handle_request(send_body=False)
+            
+            def do_GET(self):
+                self.handle_request(send_body=True)
+            
+            def handle_request(self, send_body):
+                with fixture._lock:
+                    fixture.requests += 1
+                    fixture.active += 1
+                    fixture.peak_active = max(fixture.peak_active, fixture.active)
+                try:
+                    self.route(send_body)
+                finally:
+                    with fixture._lock:
+                        fixture.active -= 1
+            
+            def route(self, send_body):
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                
+                path = self.path.split('?')[0]
+                if path.startswith('/streamyard.com/'):
+                    body = STREAMYARD_PAGE.encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    if send_body:
+                        self.wfile.write(body)
+                    return
+                
+                name = os.path.basename(path)
+                file_path = os.path.join(fixture.media_dir, name)
+                if not path.startswith('/media/') or not os.path.isfile(file_path):
+                    self.send_error(404)
+                    return
+                self.send_media(file_path, send_body)
+            
+            def send_media(self, file_path, send_body):
+                size = os.path.getsize(file_path)
+                start, end = 0, size - 1
+                range_header = self.headers.get('Range')
+                if range_header and range_header.startswith('bytes='):
+                    first, _, last = range_header[6:].split(',')[0].partition('-')
+                    if first:
+                        start = int(first)
+                        end = min(int(last), size - 1) if last else size - 1
+                    else:
+                        start = max(0, size - int(last))
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{size}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                
+                content_type = MEDIA_TYPES.get(os.path.splitext(file_path)[1], 'video/mp4')
+                self.send_header('Content-Type', content_type)
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                if not send_body:
+                    return
+                
+                stalls = fixture.next_media_request()
+                chunk_size = 64 * 1024
+                sent = 0
+                started = time.monotonic()
+                with open(file_path, 'rb') as f:
+                    f.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        chunk = f.read(min(chunk_size, remaining))
+                        if not chunk:
+                            break
+                        try:
+                            self.wfile.write(chunk)
+                        except (BrokenPipeError, ConnectionResetError):
+                            return
+                        sent += len(chunk)
+                        remaining -= len(chunk)
+                        if stalls and sent >= fixture.stall_after:
+                            self.trickle(f, remaining)
+                            return
+                        if fixture.bandwidth:
+                            # Dorme o necessário para manter a taxa média abaixo do limite
+                            ahead = sent / fixture.bandwidth - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+        
+            def trickle(self, f, remaining):
+                """Simula uma borda de CDN ruim: 1 KB a cada 0,2s até o cliente desistir"""
+                while remaining > 0:
+                    chunk = f.read(min(1024, remaining))
+                    try:
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    remaining -= len(chunk)
+                    time.sleep(0.2)
+        
+        return Handler
+    
+    def next_media_request(self):
+        """Numera a requisição de mídia e diz se ela deve travar"""
+        with self._lock:
+            self.media_requests += 1
+            return self.stall_after is not None and self.media_requests in self.stall_requests
+
+
+class FakeS3Server:
+    """
+    Serviço local que imita o S3/MinIO, com os objetos na memória
+    
+    Aceita PUT/GET de objetos e o ciclo do upload multipart (?uploads,
+    ?partNumber&uploadId, conclusão e abort), confere a assinatura V4 de
+    cada requisição e registra quando cada parte chegou.
+    """
+    
+    ACCESS_KEY = 'minio-local'
+    SECRET_KEY = 'minio-local-secret'
+    
+    def __init__(self, bandwidth=None):
+        """
+        Args:
+            bandwidth: Limite de banda de cada upload em bytes/s (None = sem limite)
+        """
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.uploads = {}
+        self.part_times = []
+        self.aborted = 0
+        self._lock = threading.Lock()
+        self._server = QuietHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+    
+    def sink(self, url='s3://bucket/prefixo', **kwargs):
+        """S3Sink apontado para este servidor"""
+        return main.S3Sink(url, endpoint=self.endpoint, access_key=self.ACCESS_KEY,
+                           secret_key=self.SECRET_KEY, region='us-east-1', **kwargs)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def _make_handler(self):
+        fake = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def read_body(self):
+                """Lê o corpo respeitando o limite de banda"""
+                remaining = int(self.headers.get('Content-Length') or 0)
+                chunks = []
+                started = time.monotonic()
+                while remaining > 0:
+                    chunk = self.rfile.read(min(64 * 1024, remaining))
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    remaining -= len(chunk)
+                    if fake.bandwidth:
+                        ahead = sum(map(len, chunks)) / fake.bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                return b''.join(chunks)
+            
+            def signature_ok(self, body):
+                authorization = self.headers.get('Authorization', '')
+                signed = authorization.partition('SignedHeaders=')[2].partition(',')[0].split(';')
+                headers = {name: self.headers[name] for name in signed if name != 'host' and name in self.headers}
+                payload_hash = hashlib.sha256(body).hexdigest()
+                expected = main.sign_v4(self.command, f"http://{self.headers['Host']}{self.path}", headers,
+                                        payload_hash, fake.ACCESS_KEY, fake.SECRET_KEY, 'us-east-1',
+                                        self.headers.get('x-amz-date', ''))
+                return authorization == expected and self.headers.get('x-amz-content-sha256') == payload_hash
+            
+            def handle_s3(self):
+                from urllib.parse import urlsplit, parse_qs, unquote
+                parts = urlsplit(self.path)
+                # Endereçamento por caminho: /<bucket>/<chave>; os objetos ficam sob a chave
+                key = unquote(parts.path.lstrip('/')).partition('/')[2]
+                query = {name: values[0] for name, values in parse_qs(parts.query, keep_blank_values=True).items()}
+                body = self.read_body()
+                if not self.signature_ok(body):
+                    self.reply(403, b'<Error><Code>SignatureDoesNotMatch</Code></Error>')
+                    return
+                
+                with fake._lock:
+                    if self.command == 'GET':
+                        if key not in fake.objects:
+                            self.reply(404, b'<Error><Code>NoSuchKey</Code></Error>')
+                        else:
+                            self.reply(200, fake.objects[key])
+                    elif self.command == 'POST' and 'uploads' in query:
+                        upload_id = f"upload-{len(fake.uploads) + 1}"
+                        fake.uploads[upload_id] = (key, {})
+                        self.reply(200, f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId>"
+                                        "</InitiateMultipartUploadResult>".encode())
+                    elif 'uploadId' in query and query['uploadId'] not in fake.uploads:
+                        self.reply(404, b'<Error><Code>NoSuchUpload</Code></Error>')
+                    elif self.command == 'PUT' and 'partNumber' in query:
+                        number = int(query['partNumber'])
+                        fake.uploads[query['uploadId']][1][number] = body
+                        fake.part_times.append((key, number, time.monotonic()))
+                        self.reply(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+                    elif self.command == 'POST':
+                        upload_key, parts_by_number = fake.uploads.pop(query['uploadId'])
+                        fake.objects[upload_key] = b''.join(parts_by_number[n] for n in sorted(parts_by_number))
+                        self.reply(200, b'<CompleteMultipartUploadResult/>')
+                    elif self.command == 'DELETE':
+                        del fake.uploads[query['uploadId']]
+                        fake.aborted += 1
+                        self.reply(204)
+                    else:
+                        fake.objects[key] = body
+                        self.reply(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+            
+            do_GET = do_PUT = do_POST = do_DELETE = handle_s3
+        
+        return Handler
+
+
+def create_media(media_dir, size_mb):
+    """
+    Gera os arquivos servidos pelo FixtureServer
+    
+    Com FFmpeg disponível, gera mídia real (necessária para o benchmark de
+    transcodificação); sem FFmpeg, gera bytes aleatórios do tamanho pedido.
+    
+    Returns:
+        bool: True se a mídia gerada é real (decodificável)
+    """
+    size = int(size_mb * 1024 * 1024)
+    ffmpeg = shutil.which('ffmpeg')
+    
+    if ffmpeg:
+        # Duração aproximada para chegar ao tamanho pedido a ~4 Mbit/s
+        duration = max(5, int(size * 8 / 4_000_000))
+        subprocess.run([
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'testsrc=size=1280x720:rate=30:duration={duration}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+            '-c:v', 'libx264', '-b:v', '4M', '-preset', 'ultrafast', '-c:a', 'aac',
+            '-shortest', os.path.join(media_dir, 'video.mp4')
+        ], check=True)
+        subprocess.run([
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-i', os.path.join(media_dir, 'video.mp4'), '-vn', '-c:a', 'copy',
+            os.path.join(media_dir, 'audio.m4a')
+        ], check=True)
+    else:
+        with open(os.path.join(media_dir, 'video.mp4'), 'wb') as f:
+            f.write(os.urandom(size))
+        with open(os.path.join(media_dir, 'audio.m4a'), 'wb') as f:
+            f.write(os.urandom(max(1, size // 8)))
+    
+    shutil.copyfile(os.path.join(media_dir, 'video.mp4'), os.path.join(media_dir, 'VOD.mp4'))
+    return bool(ffmpeg)
+
+
+def run_download_thread(url, output_path, download_type):
+    """
+    Executa o DownloadThread de forma síncrona (sem event loop do Qt)
+    
+    Returns:
+        tuple: (sucesso, mensagem, JobMetrics)
+    """
+    result = {}
+    thread = main.DownloadThread(url, output_path, download_type, f"bench_{main.new_job_id()}")
+    thread.finished.connect(lambda success, message: result.update(success=success, message=message))
+    thread.run()
+    return result.get('success', False), result.get('message', ''), thread.metrics
+
+
+def measure(name, repeats, func):
+    """Executa func repetidamente e resume os tempos (e a vazão, se func retornar bytes)"""
+    durations = []
+    byte_counts = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        byte_count = func()
+        durations.append(time.perf_counter() - start)
+        if byte_count:
+            byte_counts.append(byte_count)
+    
+    summary = {
+        'benchmark': name,
+        'repeats': repeats,
+        'median_seconds': round(statistics.median(durations), 4),
+        'min_seconds': round(min(durations), 4),
+    }
+    if byte_counts:
+        summary['throughput_mb_s'] = round(statistics.median(byte_counts) / statistics.median(durations) / 1024 / 1024, 2)
+    return summary
+
+
+def bench_download(server, work_dir, repeats):
+    """Download direto de um MP4 pelo caminho completo do DownloadThread"""
+    url = f"{server.base_url}/media/video.mp4"
+    
+    def once():
+        success, message, metrics = run_download_thread(url, work_dir, 'mp4')
+        if not success:
+            raise RuntimeError(message)
+        clean_dir(work_dir)
+        return metrics.downloaded_bytes
+    
+    return measure('download_mp4', repeats, once)
+
+
+def bench_transcode(server, work_dir, repeats):
+    """Download + extração de MP3 (FFmpegExtractAudio) pelo DownloadThread"""
+    url = f"{server.base_url}/media/audio.m4a"
+    
+    def once():
+        success, message, metrics = run_download_thread(url, work_dir, 'mp3')
+        if not success:
+            raise RuntimeError(message)
+        clean_dir(work_dir)
+        return metrics.downloaded_bytes
+    
+    return measure('download_transcode_mp3', repeats, once)
+
+
+def bench_chapters(server, work_dir, repeats, chapters=20):
+    """Separação do vídeo sintético em capítulos com um FFmpeg por vez vs. em paralelo"""
+    source = os.path.join(server.media_dir, 'video.mp4')
+    duration = float(subprocess.run(
+        [shutil.which('ffprobe'), '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', source],
+        capture_output=True, text=True, check=True).stdout)
+    step = duration / chapters
+    chapter_list = [{'start_time': index * step, 'end_time': (index + 1) * step, 'title': f"Parte {index + 1}"}
+                    for index in range(chapters)]
+    copy = os.path.join(work_dir, 'palestra.mp4')
+    shutil.copyfile(source, copy)
+    
+    def split(workers):
+        def once():
+            main.split_chapters(copy, chapter_list, 'mp4', shutil.which('ffmpeg'), shutil.which('ffprobe'),
+                                duration=duration, workers=workers)
+            shutil.rmtree(os.path.join(work_dir, 'palestra'))
+        return once
+    
+    serial = measure('chapters_serial', repeats, split(1))
+    result = measure('chapters_parallel', repeats, split(main.CHAPTER_WORKERS))
+    os.remove(copy)
+    result.update(chapters=chapters, chapter_workers=main.CHAPTER_WORKERS,
+                  serial_median_seconds=serial['median_seconds'],
+                  speedup=round(serial['median_seconds'] / result['median_seconds'], 2))
+    return result
+
+
+def bench_resolve(server, work_dir, repeats):
+    """Resolução do link VOD.mp4 na página que imita o Streamyard (requer Chrome)"""
+    url = f"{server.base_url}/streamyard.com/watch/benchmark"
+    
+    def once():
+        if not main.extract_streamyard_url(url):
+            raise RuntimeError("link VOD.mp4 não encontrado na página de teste")
+        return 0
+    
+    return measure('streamyard_resolve', repeats, once)
+
+
+def bench_sink(server, work_dir, repeats):
+    """
+    Download + envio para um bucket local (FakeS3Server com a mesma banda do servidor de mídia)
+    
+    Compara o caminho antigo (baixar e só depois enviar o arquivo) com o
+    upload multipart feito enquanto o download grava.
+    """
+    url = f"{server.base_url}/media/video.mp4"
+    
+    with FakeS3Server(server.bandwidth) as s3:
+        sink = s3.sink('s3://bench/saida')
+        
+        def sequential():
+            success, message, metrics = run_download_thread(url, work_dir, 'mp4')
+            if not success:
+                raise RuntimeError(message)
+            with ThreadPoolExecutor(max_workers=main.S3_UPLOAD_WORKERS) as executor:
+                for name in os.listdir(work_dir):
+                    sink.upload_file(os.path.join(work_dir, name), executor)
+            clean_dir(work_dir)
+            return metrics.downloaded_bytes
+        
+        def streaming():
+            main.configure_output_sink(sink)
+            try:
+                success, message, metrics = run_download_thread(url, work_dir, 'mp4')
+            finally:
+                main.configure_output_sink(None)
+            if not success:
+                raise RuntimeError(message)
+            clean_dir(work_dir)
+            return metrics.downloaded_bytes
+        
+        before = measure('download_then_upload', repeats, sequential)
+        result = measure('download_streaming_upload', repeats, streaming)
+    result['sequential_median_seconds'] = before['median_seconds']
+    result['speedup'] = round(before['median_seconds'] / result['median_seconds'], 2)
+    return result
+
+
+def bench_scratch(server, work_dir, repeats, share_dir=None, scratch_dir=None):
+    """
+    Download MP4 gravando direto no destino vs. numa pasta rápida com publicação atômica
+    
+    Aponte --share-dir para o compartilhamento de rede real; sem ele, o
+    destino é uma pasta temporária do próprio disco.
+    """
+    share_dir = share_dir or work_dir
+    scratch_dir = scratch_dir or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+    url = f"{server.base_url}/media/video.mp4"
+    
+    def once():
+        success, message, metrics = run_download_thread(url, share_dir, 'mp4')
+        if not success:
+            raise RuntimeError(message)
+        for name in os.listdir(share_dir):
+            if name.startswith('bench_'):
+                os.remove(os.path.join(share_dir, name))
+        return metrics.downloaded_bytes
+    
+    previous = os.environ.pop(main.SCRATCH_ENV_VAR, None)
+    try:
+        direct = measure('download_direct_to_share', repeats, once)
+        main.configure_scratch_dir(os.path.join(scratch_dir, 'conversor_bench'))
+        result = measure('download_scratch_publish', repeats, once)
+    finally:
+        shutil.rmtree(os.path.join(scratch_dir, 'conversor_bench'), ignore_errors=True)
+        os.environ.pop(main.SCRATCH_ENV_VAR, None)
+        if previous is not None:
+            os.environ[main.SCRATCH_ENV_VAR] = previous
+    result['direct_median_seconds'] = direct['median_seconds']
+    result['speedup'] = round(direct['median_seconds'] / result['median_seconds'], 2)
+    return result
+
+
+def bench_hls(server, work_dir, repeats, segments=40):
+    """
+    Download de uma playlist HLS com um fragmento por vez vs. com os fragmentos em paralelo
+    
+    A diferença aparece com latência: use --latency-ms para simular a distância até a CDN.
+    """
+    size = os.path.getsize(os.path.join(server.media_dir, 'video.mp4'))
+    write_hls(server.media_dir, 'hls', segments, max(1, size // segments))
+    url = f"{server.base_url}/media/hls.m3u8"
+    
+    def once():
+        success, message, metrics = run_download_thread(url, work_dir, 'mp4')
+        if not success:
+            raise RuntimeError(message)
+        for name in os.listdir(work_dir):
+            if name.startswith('bench_'):
+                os.remove(os.path.join(work_dir, name))
+        return metrics.downloaded_bytes
+    
+    previous = os.environ.get(main.FRAGMENT_WORKERS_ENV_VAR)
+    workers = main.get_fragment_workers()
+    try:
+        main.configure_fragment_workers(1)
+        sequential = measure('hls_sequential_fragments', repeats, once)
+        main.configure_fragment_workers(workers)
+        result = measure('hls_parallel_fragments', repeats, once)
+    finally:
+        os.environ.pop(main.FRAGMENT_WORKERS_ENV_VAR, None)
+        if previous is not None:
+            os.environ[main.FRAGMENT_WORKERS_ENV_VAR] = previous
+    result['fragment_workers'] = workers
+    result['sequential_fragments_median_seconds'] = sequential['median_seconds']
+    result['speedup'] = round(sequential['median_seconds'] / result['median_seconds'], 2)
+    return result
+
+
+def simulate_mean_completion(policy, durations, workers=2, speedup=100):
+    """
+    Simula a fila com `workers` downloads simultâneos e devolve o tempo médio de conclusão
+    
+    Cada job leva duração / speedup segundos simulados; todos entram na
+    fila no instante zero, como um lote colado de uma vez.
+    """
+    import heapq
+    scheduler = main.JobScheduler(policy=policy)
+    for duration in durations:
+        scheduler.put({'duration': duration})
+    
+    free_at = [0.0] * workers
+    completions = []
+    while len(scheduler):
+        start = heapq.heappop(free_at)
+        end = start + scheduler.get()['duration'] / speedup
+        completions.append(end)
+        heapq.heappush(free_at, end)
+    return statistics.mean(completions)
+
+
+def bench_scheduler(server, work_dir, repeats, jobs=50_000):
+    """Custo de put/get no JobScheduler e tempo médio de conclusão de um lote misto (fifo × sjf)"""
+    import random
+    import queue
+    rng = random.Random(42)
+    batch = [{'duration': rng.choice([60, 120, 300, 600, 14_400]), 'priority': rng.choice([1, 1, 2])}
+             for _ in range(jobs)]
+    
+    def once():
+        scheduler = main.JobScheduler()
+        for job in batch:
+            scheduler.put(job)
+        for _ in batch:
+            scheduler.get()
+        return 0
+    
+    def baseline():
+        fifo = queue.Queue()
+        for job in batch:
+            fifo.put(job)
+        for _ in batch:
+            fifo.get()
+    
+    summary = measure('scheduler_put_get', repeats, once)
+    start = time.perf_counter()
+    baseline()
+    summary['queue_baseline_seconds'] = round(time.perf_counter() - start, 4)
+    summary['overhead_us_per_job'] = round(
+        (summary['median_seconds'] - summary['queue_baseline_seconds']) / jobs * 1e6, 2)
+    
+    # Um stream de 4 horas colado na frente de 30 clipes curtos
+    mixed = [14_400] + [rng.randint(60, 300) for _ in range(30)]
+    summary['mean_completion_fifo_s'] = round(simulate_mean_completion('fifo', mixed), 1)
+    summary['mean_completion_sjf_s'] = round(simulate_mean_completion('sjf', mixed), 1)
+    return summary
+
+
+def bench_layout(server, work_dir, repeats, files=50_000):
+    """
+    Biblioteca grande: listar a pasta única vs. uma subpasta do layout hash, e o custo de reservar um nome
+    
+    Preenche uma pasta com `files` arquivos vazios e, ao lado, a mesma
+    quantidade distribuída pelo layout hash com o índice de caminhos.
+    """
+    flat_dir = os.path.join(work_dir, 'layout_flat')
+    sharded_dir = os.path.join(work_dir, 'layout_hash')
+    os.makedirs(flat_dir)
+    index = main.PathIndex(sharded_dir)
+    try:
+        index._db.execute('BEGIN')
+        for number in range(files):
+            open(os.path.join(flat_dir, f"video_{number}.mp4"), 'wb').close()
+            key = f"Youtube:{number}|mp4|"
+            relative = index.claim(key, main.layout_subdir('hash', {}, key), f"video_{number}", 'mp4')
+            os.makedirs(os.path.join(sharded_dir, os.path.dirname(relative)), exist_ok=True)
+            open(os.path.join(sharded_dir, relative), 'wb').close()
+        index._db.execute('COMMIT')
+        shard = os.path.join(sharded_dir, main.layout_subdir('hash', {}, 'Youtube:0|mp4|'))
+        
+        summary = measure('layout_flat_listdir', repeats, lambda: len(os.listdir(flat_dir)) and 0)
+        sharded = measure('layout_shard_listdir_x1000', repeats, lambda: [os.listdir(shard) for _ in range(1000)] and 0)
+        counter = iter(range(files, files * 10))
+        
+        def claims():
+            for _ in range(1000):
+                key = f"Youtube:{next(counter)}|mp4|"
+                index.claim(key, main.layout_subdir('hash', {}, key), 'aula', 'mp4')
+        
+        claim = measure('layout_claim_x1000', repeats, claims)
+        summary['shard_listdir_us'] = round(sharded['median_seconds'] / 1000 * 1e6, 1)
+        summary['claim_us'] = round(claim['median_seconds'] / 1000 * 1e6, 1)
+        summary['files'] = files
+        return summary
+    finally:
+        index.close()
+        shutil.rmtree(flat_dir, ignore_errors=True)
+        shutil.rmtree(sharded_dir, ignore_errors=True)
+
+
+def clean_dir(path):
+    """Remove os arquivos gerados entre uma repetição e outra"""
+    for name in os.listdir(path):
+        os.remove(os.path.join(path, name))
+
+
+def current_commit():
+    """Commit atual do repositório (ou 'desconhecido' fora de um checkout git)"""
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def load_history(path):
+    """Lê o histórico de execuções anteriores"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_with_history(results, history, commit, threshold):
+    """
+    Compara cada benchmark com a execução mais recente de outro commit
+    
+    Returns:
+        list: Mensagens das regressões encontradas
+    """
+    regressions = []
+    for result in results:
+        previous = [
+            entry for entry in history
+            if entry['benchmark'] == result['benchmark'] and entry['commit'] != commit
+            and entry['config'] == result['config']
+        ]
+        if not previous:
+            print(f"   {result['benchmark']}: sem histórico para comparar")
+            continue
+        baseline = previous[-1]
+        change = result['median_seconds'] / baseline['median_seconds'] - 1
+        print(f"   {result['benchmark']}: {change:+.1%} em relação a {baseline['commit']}")
+        if change > threshold:
+            regressions.append(
+                f"{result['benchmark']}: {baseline['median_seconds']}s → "
+                f"{result['median_seconds']}s ({change:+.1%}) desde {baseline['commit']}"
+            )
+    return regressions
+
+
+def main_benchmark(argv=None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Benchmarks offline do Conversor de Vídeo/Áudio")
+    parser.add_argument('--only', choices=['download', 'transcode', 'resolve', 'scheduler', 'sink', 'scratch', 'layout', 'hls', 'chapters'], action='append',
+                        help="Executa apenas os benchmarks indicados (pode repetir)")
+    parser.add_argument('--repeats', type=int, default=3, help="Repetições por benchmark")
+    parser.add_argument('--size-mb', type=float, default=20, help="Tamanho da mídia sintética")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Latência antes do primeiro byte")
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help="Limite de banda por conexão (0 = sem limite)")
+    parser.add_argument('--share-dir', help="Destino lento (ex: compartilhamento de rede) do benchmark scratch")
+    parser.add_argument('--scratch-dir', help="Pasta rápida do benchmark scratch (padrão: /dev/shm)")
+    parser.add_argument('--history', default=HISTORY_FILE, help="Arquivo de histórico (JSON-lines)")
+    parser.add_argument('--compare', action='store_true', help="Compara com o histórico e falha se houver regressão")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Piora tolerada na comparação (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+    
+    # Não mistura as métricas dos benchmarks com as dos downloads reais
+    main.configure_metrics()
+    
+    bandwidth = args.bandwidth_mbps * 1_000_000 / 8 if args.bandwidth_mbps else None
+    config = {'size_mb': args.size_mb, 'latency_ms': args.latency_ms, 'bandwidth_mbps': args.bandwidth_mbps}
+    selected = args.only or ['download', 'transcode', 'resolve', 'scheduler', 'sink', 'scratch', 'layout', 'hls', 'chapters']
+    commit = current_commit()
+    
+    media_dir = tempfile.mkdtemp(prefix='bench_media_')
+    work_dir = tempfile.mkdtemp(prefix='bench_out_')
+    results = []
+    try:
+        print(f"🧪 Gerando mídia sintética ({args.size_mb} MB)...")
+        real_media = create_media(media_dir, args.size_mb)
+        
+        with FixtureServer(media_dir, args.latency_ms / 1000, bandwidth) as server:
+            print(f"📡 Servidor de fixtures em {server.base_url}\n")
+            benchmarks = [
+                ('download', bench_download, None),
+                ('transcode', bench_transcode, None if real_media else "FFmpeg não encontrado"),
+                ('resolve', bench_resolve, None if shutil.which('chromedriver') or shutil.which('google-chrome')
+                 or shutil.which('chromium') else "Chrome/ChromeDriver não encontrado"),
+                ('scheduler', bench_scheduler, None),
+                ('sink', bench_sink, None),
+                ('scratch', lambda server, work_dir, repeats: bench_scratch(
+                    server, work_dir, repeats, args.share_dir, args.scratch_dir), None),
+                ('layout', bench_layout, None),
+                ('hls', bench_hls, None),
+                ('chapters', bench_chapters, None if real_media and shutil.which('ffprobe') else "FFmpeg não encontrado"),
+            ]
+            for key, func, skip_reason in benchmarks:
+                if key not in selected:
+                    continue
+                if skip_reason:
+                    print(f"⏭️  {key}: ignorado ({skip_reason})")
+                    continue
+                try:
+                    result = func(server, work_dir, args.repeats)
+                except RuntimeError as e:
+                    print(f"❌ {key}: {e}")
+                    continue
+                result.update({
+                    'commit': commit,
+                    'date': datetime.now().isoformat(timespec='seconds'),
+                    'config': config,
+                })
+                results.append(result)
+                throughput = f" | {result['throughput_mb_s']} MB/s" if 'throughput_mb_s' in result else ''
+                print(f"✅ {result['benchmark']}: mediana {result['median_seconds']}s "
+                      f"(mín {result['min_seconds']}s){throughput}")
+                if 'mean_completion_sjf_s' in result:
+                    print(f"   {result['overhead_us_per_job']} µs/job além da queue.Queue | conclusão média "
+                          f"do lote misto: fifo {result['mean_completion_fifo_s']}s → sjf {result['mean_completion_sjf_s']}s")
+                if 'direct_median_seconds' in result:
+                    print(f"   gravando direto no destino: {result['direct_median_seconds']}s "
+                          f"({result['speedup']}x o tempo com a pasta rápida)")
+                if 'claim_us' in result:
+                    print(f"   {result['files']} arquivos: uma subpasta do layout hash é listada em "
+                          f"{result['shard_listdir_us']} µs; reservar um nome no índice leva {result['claim_us']} µs")
+                if 'serial_median_seconds' in result:
+                    print(f"   {result['chapters']} capítulos um por vez: {result['serial_median_seconds']}s "
+                          f"({result['speedup']}x o tempo com {result['chapter_workers']} FFmpeg em paralelo)")
+                if 'sequential_fragments_median_seconds' in result:
+                    print(f"   um fragmento por vez: {result['sequential_fragments_median_seconds']}s "
+                          f"({result['speedup']}x o tempo com {result['fragment_workers']} em paralelo)")
+                if 'sequential_median_seconds' in result:
+                    print(f"   baixar e depois enviar: {result['sequential_median_seconds']}s "
+                          f"({result['speedup']}x mais lento que enviar durante o download)")
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    regressions = []
+    if args.compare:
+        print("\n📈 Comparação com o histórico:")
+        regressions = compare_with_history(results, load_history(args.history), commit, args.threshold)
+    
+    with open(args.history, 'a', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+    print(f"\n💾 Resultados adicionados a {args.history}")
+    
+    if regressions:
+        print("\n⚠️ Regressões encontradas:")
+        for regression in regressions:
+            print(f"   • {regression}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_benchmark())
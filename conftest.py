@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Configuração comum dos testes
+"""
+
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(monkeypatch, tmp_path_factory):
+    """Histórico, métricas, cache de loudness e pasta de dados temporários: nenhum teste grava em ~/.conversor-video-audio"""
+    data_dir = tmp_path_factory.mktemp('dados')
+    monkeypatch.setenv('CONVERSOR_DATA_DIR', str(data_dir))
+    monkeypatch.delenv(main.HISTORY_ENV_VAR, raising=False)
+    monkeypatch.setattr(main, 'APP_DATA_DIR', data_dir)
+    monkeypatch.setattr(main, '_history', main.HistoryStore(':memory:'))
+    monkeypatch.setattr(main, '_metrics_recorder', main.MetricsRecorder())
+    monkeypatch.setattr(main, '_loudness_cache', None)
@@ -8,17 +8,27 @@ Desenvolvido com PyQt6 e yt-dlp
 import sys
 import os
 import re
+import csv
+import json
+import time
+import sqlite3
+import threading
+import contextvars
 import requests
 from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QRadioButton, QButtonGroup,
     QTextEdit, QFileDialog, QProgressBar, QGroupBox, QMessageBox,
-    QScrollArea
+    QScrollArea, QPlainTextEdit, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QDialog, QComboBox, QDateTimeEdit
 )
-from PyQt6.QtCore import QThread, pyqtSignal, Qt, QTimer
-from PyQt6.QtGui import QFont, QIcon, QPalette, QColor
+from PyQt6.QtCore import QThread, pyqtSignal, Qt, QTimer, QDateTime
+from PyQt6.QtGui import QFont, QIcon, QPalette, QColor, QKeySequence, QAction
 import yt_dlp
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
 
 
 def clean_and_validate_url(url):
@@ -119,8 +129,11 @@ def extract_streamyard_url(url):
         # Habilita o log de performance para capturar requisições de rede
         chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
         
-        # Inicia o driver
-        driver = webdriver.Chrome(options=chrome_options)
+        # Inicia o driver (ou reaproveita um navegador já aberto no modo serviço)
+        if _browser_pool is not None:
+            driver = _browser_pool.acquire(lambda: webdriver.Chrome(options=chrome_options))
+        else:
+            driver = webdriver.Chrome(options=chrome_options)
         
         try:
             # Acessa a página
@@ -166,8 +179,6 @@ def extract_streamyard_url(url):
                 except Exception as e:
                     continue
             
-            driver.quit()
-            
             # Retorna o primeiro URL VOD.mp4 encontrado
             if vod_urls:
                 # Prioriza URLs que contenham "vod" no nome
@@ -177,7 +188,9 @@ def extract_streamyard_url(url):
             return None
             
         finally:
-            if driver:
+            if driver and _browser_pool is not None:
+                _browser_pool.release(driver)
+            elif driver:
                 driver.quit()
         
     except ImportError:
@@ -188,6 +201,692 @@ def extract_streamyard_url(url):
         return None
 
 
+class BrowserPool:
+    """
+    Navegadores do Selenium mantidos abertos entre extrações do Streamyard
+    
+    Abrir o Chrome custa alguns segundos por extração; no modo serviço os
+    navegadores são devolvidos ao pool (com a página e o log de rede limpos)
+    em vez de fechados.
+    """
+    
+    def __init__(self, size=2):
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def acquire(self, factory):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return factory()
+    
+    def release(self, driver):
+        try:
+            driver.get('about:blank')
+            driver.get_log('performance')  # descarta o log de rede da extração anterior
+        except Exception:
+            driver.quit()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(driver)
+                return
+        driver.quit()
+    
+    def close(self):
+        with self._lock:
+            drivers, self._idle = self._idle, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+_browser_pool = None
+
+
+def enable_browser_pool(size=2):
+    """Mantém navegadores abertos entre extrações do Streamyard (modo serviço)"""
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool(size)
+    return _browser_pool
+
+
+def disable_browser_pool():
+    """Fecha os navegadores mantidos abertos"""
+    global _browser_pool
+    pool, _browser_pool = _browser_pool, None
+    if pool is not None:
+        pool.close()
+
+
+def host_key(url):
+    """
+    Identifica o host de uma URL para limites e circuit breakers
+    
+    Subdomínios comuns (www., m.) são ignorados e youtu.be conta como youtube.com.
+    """
+    from urllib.parse import urlparse
+    host = (urlparse(url or '').hostname or '').lower()
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return {'youtu.be': 'youtube.com'}.get(host, host)
+
+
+class JobError(Exception):
+    """Base da taxonomia de erros dos jobs (cada subclasse tem sua política de retentativa)"""
+    title = "❌ Erro durante o download"
+    advice = (
+        "💡 Sugestões gerais:\n"
+        "1. Verifique se a URL está correta\n"
+        "2. Tente novamente em alguns minutos\n"
+        "3. Verifique sua conexão com a internet\n"
+        "4. Se persistir, o vídeo pode ter restrições"
+    )
+    short_message = None
+    # Erros de limitação do servidor abrem o circuit breaker do host
+    throttling = False
+    
+    def __init__(self, message='', retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+    
+    def describe(self):
+        """Mensagem detalhada para o usuário"""
+        return f"{self.title}\n\n{self.advice}\n\nErro técnico: {self}"
+    
+    def describe_short(self):
+        """Mensagem curta usada na análise de vídeos"""
+        return self.short_message or f"Erro ao analisar: {self}"
+
+
+class BotDetectionError(JobError):
+    """O YouTube pediu login/captcha por suspeita de automação"""
+    title = "❌ YouTube detectou atividade automatizada"
+    advice = (
+        "💡 Soluções recomendadas:\n"
+        "1. Aguarde alguns minutos e tente novamente\n"
+        "2. Use uma conexão VPN diferente\n"
+        "3. Tente acessar o vídeo no navegador primeiro\n"
+        "4. Se persistir, o vídeo pode ter restrições regionais"
+    )
+    short_message = "YouTube detectou atividade automatizada. Aguarde alguns minutos e tente novamente."
+    throttling = True
+
+
+class RateLimitedError(JobError):
+    """HTTP 429: o servidor está limitando o número de requisições"""
+    title = "❌ Muitas requisições (Erro 429)"
+    advice = (
+        "💡 Solução:\n"
+        "• Aguarde 15-30 minutos antes de tentar novamente\n"
+        "• O servidor está limitando o número de downloads"
+    )
+    short_message = "Muitas requisições. Aguarde alguns minutos e tente novamente."
+    throttling = True
+
+
+class AccessDeniedError(JobError):
+    """HTTP 403: acesso negado (restrição regional ou link assinado expirado)"""
+    title = "❌ Acesso negado (Erro 403)"
+    advice = (
+        "💡 Soluções:\n"
+        "1. Aguarde alguns minutos e tente novamente\n"
+        "2. O vídeo pode ter restrições geográficas\n"
+        "3. Tente usar uma VPN de outro país\n"
+        "4. Verifique se o vídeo ainda está disponível"
+    )
+    short_message = "Acesso negado. O vídeo pode ter restrições regionais."
+
+
+class UnavailableError(JobError):
+    """Vídeo privado, removido ou inexistente (não adianta tentar de novo)"""
+    title = "❌ Vídeo não disponível"
+    advice = (
+        "Possíveis causas:\n"
+        "• Vídeo foi removido ou tornado privado\n"
+        "• Restrições regionais ou de idade\n"
+        "• Link expirado ou inválido"
+    )
+    short_message = "Vídeo não disponível (privado, removido ou com restrições)."
+
+
+class NetworkError(JobError):
+    """Falha de conexão, DNS ou timeout"""
+    title = "❌ Problema de conexão"
+    advice = (
+        "💡 Soluções:\n"
+        "1. Verifique sua conexão com a internet\n"
+        "2. Tente novamente em alguns instantes\n"
+        "3. Verifique se não há bloqueio de firewall\n"
+        "4. Se usar VPN, tente desconectar temporariamente"
+    )
+    short_message = "Problema de conexão. Verifique sua internet e tente novamente."
+
+
+class SinkError(JobError):
+    """Falha ao enviar o arquivo para o armazenamento de objetos (S3, MinIO, R2...)"""
+    title = "❌ Falha no envio para o armazenamento"
+    advice = (
+        "💡 Soluções:\n"
+        "1. Confira o endereço do serviço (--sink-endpoint) e o nome do bucket\n"
+        "2. Confira as credenciais em AWS_ACCESS_KEY_ID e AWS_SECRET_ACCESS_KEY\n"
+        "3. Tente novamente em alguns instantes"
+    )
+    short_message = "Não foi possível enviar o arquivo para o armazenamento."
+
+
+class InsufficientSpaceError(JobError):
+    """O download não cabe no espaço livre do disco"""
+    title = "❌ Espaço em disco insuficiente"
+    advice = (
+        "💡 Soluções:\n"
+        "1. Libere espaço na pasta de destino (ou na pasta temporária, se usar --scratch)\n"
+        "2. Escolha outra pasta de destino\n"
+        "3. Baixe só o áudio (MP3) ou uma qualidade menor"
+    )
+    short_message = "Espaço em disco insuficiente para este download."
+
+
+class StreamyardExtractionError(JobError):
+    """Erro quando não é possível extrair o link do vídeo de uma página do Streamyard"""
+    
+    def __init__(self):
+        super().__init__(
+            "❌ Não foi possível extrair o link do vídeo do Streamyard.\n\n"
+            "Possíveis causas:\n"
+            "1. O vídeo não está mais disponível\n"
+            "2. Problemas de conexão\n"
+            "3. Streamyard mudou a estrutura da página\n\n"
+            "Tente:\n"
+            "• Verificar se o vídeo está disponível no navegador\n"
+            "• Tentar novamente em alguns instantes\n"
+            "• Copiar manualmente o link .mp4 usando F12 → Rede"
+        )
+    
+    def describe(self):
+        return str(self)
+
+
+class UnknownJobError(JobError):
+    """Erro não classificado (mostra o traceback completo)"""
+    
+    def __init__(self, message='', details=''):
+        super().__init__(message)
+        self.details = details
+    
+    def describe(self):
+        return (
+            f"{self.title}:\n\n{self}\n\n"
+            f"{self.advice}\n\n"
+            f"Detalhes técnicos:\n{self.details}"
+        )
+
+
+def _http_status(e):
+    """Procura um código HTTP na exceção ou nas exceções encadeadas (yt-dlp guarda a original em exc_info)"""
+    seen = set()
+    while e is not None and id(e) not in seen:
+        seen.add(id(e))
+        status = getattr(e, 'status', None) or getattr(e, 'code', None)
+        if isinstance(status, int) and 100 <= status < 600:
+            retry_after = None
+            response = getattr(e, 'response', None) or getattr(e, 'fp', None)
+            headers = getattr(response, 'headers', None) or getattr(e, 'headers', None)
+            if headers is not None:
+                try:
+                    retry_after = float(headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    pass
+            return status, retry_after
+        exc_info = getattr(e, 'exc_info', None)
+        e = (exc_info[1] if exc_info else None) or e.__cause__ or e.__context__
+    return None, None
+
+
+def classify_error(e):
+    """
+    Converte qualquer exceção de extração/download em uma subclasse de JobError
+    
+    Usa primeiro o código HTTP (quando o yt-dlp o preserva) e, na falta dele,
+    as mesmas frases que o aplicativo já reconhecia nas mensagens de erro.
+    """
+    import traceback
+    
+    if isinstance(e, JobError):
+        return e
+    
+    message = str(e)
+    status, retry_after = _http_status(e)
+    if status == 429:
+        return RateLimitedError(message, retry_after)
+    if status == 403:
+        return AccessDeniedError(message)
+    if status in (404, 410):
+        return UnavailableError(message)
+    
+    error_str = message.lower()
+    if any(phrase in error_str for phrase in ['sign in to confirm', 'not a bot', 'captcha']):
+        return BotDetectionError(message)
+    if 'http error 429' in error_str or 'too many requests' in error_str:
+        return RateLimitedError(message, retry_after)
+    if any(phrase in error_str for phrase in ['private video', 'unavailable', 'removed']):
+        return UnavailableError(message)
+    if any(phrase in error_str for phrase in ['network', 'connection', 'timeout', 'timed out', 'resolve']):
+        return NetworkError(message)
+    if 'http error 403' in error_str or 'forbidden' in error_str:
+        return AccessDeniedError(message)
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return NetworkError(message)
+    return UnknownJobError(message, traceback.format_exc())
+
+
+class RetryPolicy:
+    """Número de tentativas e backoff exponencial com jitter completo"""
+    
+    def __init__(self, attempts, base_delay, max_delay):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay(self, attempt):
+        """Espera antes da tentativa seguinte à número `attempt` (1 = primeira falha)"""
+        import random
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+# Política de retentativa por tipo de erro (tipos ausentes não são repetidos)
+RETRY_POLICIES = {
+    NetworkError: RetryPolicy(attempts=4, base_delay=2, max_delay=60),
+    RateLimitedError: RetryPolicy(attempts=3, base_delay=30, max_delay=600),
+    BotDetectionError: RetryPolicy(attempts=2, base_delay=60, max_delay=900),
+    AccessDeniedError: RetryPolicy(attempts=2, base_delay=5, max_delay=60),
+    StreamyardExtractionError: RetryPolicy(attempts=2, base_delay=5, max_delay=30),
+    SinkError: RetryPolicy(attempts=2, base_delay=5, max_delay=60),
+}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de um host
+    
+    Depois de `threshold` erros de limitação (429, detecção de bot)
+    seguidos, o circuito abre e todos os jobs daquele host esperam
+    `cooldown` segundos (ou o Retry-After do servidor). Em seguida um único
+    job de teste passa (meio-aberto): se der certo o circuito fecha, se
+    falhar abre de novo com o dobro da espera.
+    """
+    
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    
+    def __init__(self, threshold=2, cooldown=120, max_cooldown=1800):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def wait_time(self):
+        """Segundos que o chamador deve esperar antes de tentar (0 = pode seguir)"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self.open_until:
+                    return self.open_until - now
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return 5.0
+                self._probe_in_flight = True
+            return 0.0
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._probe_in_flight = False
+    
+    def record_failure(self, error):
+        """Registra o erro de uma tentativa; só erros de limitação contam para abrir o circuito"""
+        with self._lock:
+            if not error.throttling:
+                if self.state == self.HALF_OPEN:
+                    # O teste não foi limitado pelo servidor: o host voltou a responder
+                    self.state = self.CLOSED
+                    self._probe_in_flight = False
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            elif self.failures < self.threshold:
+                return
+            self.state = self.OPEN
+            self._probe_in_flight = False
+            self.open_until = time.monotonic() + max(self.cooldown, error.retry_after or 0)
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host):
+    """Circuit breaker compartilhado por todos os jobs de um host"""
+    with _circuit_breakers_lock:
+        if host not in _circuit_breakers:
+            _circuit_breakers[host] = CircuitBreaker()
+        return _circuit_breakers[host]
+
+
+class HostLimiter:
+    """
+    Limita as requisições a um host: no máximo `concurrency` operações ao
+    mesmo tempo e, em média, `rate` inícios por segundo (token bucket com
+    rajada de até `burst`)
+    """
+    
+    def __init__(self, concurrency=4, rate=2.0, burst=4):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _take_token(self):
+        """Retira um token; devolve 0 ou quantos segundos faltam para o próximo"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+    
+    @contextmanager
+    def slot(self, sleep=time.sleep):
+        """Context manager que ocupa uma vaga do host pelo tempo da operação"""
+        self._semaphore.acquire()
+        try:
+            while True:
+                wait = self._take_token()
+                if wait <= 0:
+                    break
+                sleep(wait)
+            yield
+        finally:
+            self._semaphore.release()
+    
+    def start(self, sleep=time.sleep):
+        """Espera a vez de abrir uma requisição (vaga e token), sem ocupar a vaga depois dela"""
+        with self.slot(sleep):
+            pass
+
+
+# Limites por host: (operações simultâneas, inícios por segundo, rajada)
+DEFAULT_HOST_LIMIT = (4, 2.0, 4)
+HOST_LIMITS = {
+    'youtube.com': (2, 0.5, 3),
+    'streamyard.com': (2, 1.0, 2),
+}
+HOST_LIMITS_ENV_VAR = 'CONVERSOR_HOST_LIMITS'
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def parse_host_limits(text):
+    """
+    Lê limites no formato "host=simultâneos[:por_segundo[:rajada]],..."
+    
+    Exemplo: "youtube.com=2:0.5,vimeo.com=3"
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        host, _, spec = item.partition('=')
+        values = spec.split(':')
+        try:
+            concurrency = int(values[0])
+            rate = float(values[1]) if len(values) > 1 and values[1] else DEFAULT_HOST_LIMIT[1]
+            burst = int(values[2]) if len(values) > 2 and values[2] else max(1, concurrency)
+        except ValueError:
+            raise ValueError(f"Limite inválido para o host: {item!r}")
+        if not host or concurrency < 1 or rate <= 0 or burst < 1:
+            raise ValueError(f"Limite inválido para o host: {item!r}")
+        limits[host_key(f"https://{host.strip()}")] = (concurrency, rate, burst)
+    return limits
+
+
+def configure_host_limits(limits):
+    """Atualiza os limites por host (valem para os limitadores criados a partir daqui)"""
+    with _host_limiters_lock:
+        HOST_LIMITS.update(limits)
+        for host in limits:
+            _host_limiters.pop(host, None)
+
+
+def load_host_limits_from_env():
+    """Aplica os limites definidos na variável de ambiente (se houver)"""
+    if os.environ.get(HOST_LIMITS_ENV_VAR):
+        configure_host_limits(parse_host_limits(os.environ[HOST_LIMITS_ENV_VAR]))
+
+
+def get_host_limiter(host):
+    """Limitador compartilhado pela análise e pelo download de um host"""
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = HostLimiter(*HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        return _host_limiters[host]
+
+
+def run_with_retry(func, url, log=None, sleep=time.sleep, on_retry=None):
+    """
+    Executa func() respeitando o circuit breaker do host e a política de retentativa
+    
+    O limite do host não ocupa uma vaga durante func() inteira: o
+    download_media a usa só na extração e no início de cada transferência,
+    e a mídia em si, servida pela CDN, não prende outros jobs do host.
+    
+    Args:
+        func: Função sem argumentos (ex: o download de um job)
+        url: URL do job (define o host)
+        log: Função que recebe mensagens de andamento (opcional)
+        sleep: Função de espera (pode ser trocada para permitir cancelamento)
+        on_retry: Callback chamado com o número da nova tentativa (opcional)
+    
+    Returns:
+        O retorno de func()
+    
+    Raises:
+        JobError: O erro classificado da última tentativa
+    """
+    log = log or (lambda message: None)
+    host = host_key(url)
+    breaker = get_circuit_breaker(host)
+    attempt = 0
+    
+    while True:
+        wait = breaker.wait_time()
+        if wait > 0:
+            log(f"⏸️ {host} está limitando requisições; jobs deste host pausados por {wait:.0f}s")
+            sleep(wait)
+            continue
+        
+        try:
+            result = func()
+        except Exception as e:
+            error = classify_error(e)
+            breaker.record_failure(error)
+            attempt += 1
+            policy = RETRY_POLICIES.get(type(error))
+            if policy is None or attempt >= policy.attempts:
+                if error is e:
+                    raise
+                raise error from e
+            delay = max(policy.delay(attempt), error.retry_after or 0)
+            log(f"🔁 {error.title.replace('❌ ', '')}: tentativa {attempt + 1}/{policy.attempts} em {delay:.0f}s")
+            if on_retry:
+                on_retry(attempt + 1)
+            sleep(delay)
+            continue
+        
+        breaker.record_success()
+        return result
+
+
+# Número máximo de análises simultâneas ao processar um lote de URLs
+MAX_ANALYSIS_WORKERS = 6
+
+
+def split_url_text(text):
+    """
+    Separa um texto colado (várias linhas, vírgulas ou espaços) em URLs candidatas
+    
+    Args:
+        text: Texto com uma ou mais URLs
+    
+    Returns:
+        list: Trechos não vazios, na ordem em que aparecem
+    """
+    if not text:
+        return []
+    return [token for token in re.split(r'[\s,;]+', text) if token]
+
+
+def read_url_file(path):
+    """
+    Lê URLs candidatas de um arquivo .txt (uma por linha) ou .csv (qualquer coluna)
+    
+    Args:
+        path: Caminho do arquivo
+    
+    Returns:
+        list: Trechos lidos do arquivo, na ordem em que aparecem
+    """
+    candidates = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if str(path).lower().endswith('.csv'):
+            for row in csv.reader(f):
+                # Ignora células que não parecem URLs (ex: cabeçalho "url")
+                candidates.extend(cell.strip() for cell in row if '://' in cell)
+        else:
+            for line in f:
+                candidates.extend(split_url_text(line))
+    return candidates
+
+
+def clean_url_batch(candidates):
+    """
+    Limpa, valida e remove duplicatas de uma lista de URLs
+    
+    Args:
+        candidates: Lista de URLs brutas
+    
+    Returns:
+        tuple: (URLs válidas sem duplicatas, trechos rejeitados)
+    """
+    urls = []
+    rejected = []
+    seen = set()
+    for raw in candidates:
+        url = clean_and_validate_url(raw)
+        if not url:
+            rejected.append(raw)
+            continue
+        if url in seen:
+            continue
+        seen.add(url)
+        urls.append(url)
+    return urls, rejected
+
+
+def fetch_video_info(url):
+    """
+    Busca as informações básicas de um vídeo sem baixá-lo
+    
+    Args:
+        url: URL já limpa do vídeo
+    
+    Returns:
+        dict: title, duration e uploader do vídeo
+    """
+    # Se for Streamyard, retorna info genérica (não suporta análise prévia)
+    if 'streamyard.com' in url.lower():
+        return {
+            'title': 'Vídeo do Streamyard',
+            'duration': 0,
+            'uploader': 'Streamyard',
+        }
+    
+    # Para YouTube e outras plataformas
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'socket_timeout': 15,
+        'retries': 2,
+        # Configurações para evitar bloqueio
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android', 'ios'],
+            }
+        },
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Linux; Android 11; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.120 Mobile Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+        },
+        'nocheckcertificate': True,
+    }
+    
+    if hedged_extraction_enabled() and host_key(url) == 'youtube.com':
+        # Título, duração e autor já vêm na extração, sem escolher formatos
+        info, _ = hedged_extract_info(url, ydl_opts)
+    else:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+    filesize = info.get('filesize') or info.get('filesize_approx')
+    if not filesize and info.get('requested_formats'):
+        # Vídeo e áudio separados: o tamanho é a soma dos dois formatos
+        sizes = [f.get('filesize') or f.get('filesize_approx') for f in info['requested_formats']]
+        filesize = sum(sizes) if all(sizes) else None
+    return {
+        'title': info.get('title', 'video'),
+        'duration': info.get('duration', 0),
+        'uploader': info.get('uploader', 'Desconhecido'),
+        'filesize_approx': filesize,
+    }
+
+
+def fetch_video_info_limited(url):
+    """fetch_video_info ocupando uma vaga do limitador do host pelo tempo da análise"""
+    with get_host_limiter(host_key(url)).slot():
+        return fetch_video_info(url)
+
+
+def describe_info_error(e):
+    """Converte uma exceção da análise em uma mensagem curta para o usuário"""
+    return classify_error(e).describe_short()
+
+
+def suggest_filename(title):
+    """Remove caracteres inválidos de um título para usá-lo como nome de arquivo"""
+    return re.sub(r'[<>:"/\\|?*]', '', title).strip()
+
+
 class VideoInfoThread(QThread):
     """Thread para buscar informações do vídeo sem bloquear a interface"""
     info_received = pyqtSignal(dict)
@@ -199,86 +898,4588 @@ class VideoInfoThread(QThread):
     
     def run(self):
         """Busca informações do vídeo"""
+        host = host_key(self.url)
+        breaker = get_circuit_breaker(host)
         try:
-            # Se for Streamyard, retorna info genérica (não suporta análise prévia)
-            if 'streamyard.com' in self.url.lower():
-                video_info = {
-                    'title': 'Vídeo do Streamyard',
-                    'duration': 0,
-                    'uploader': 'Streamyard',
-                }
-                self.info_received.emit(video_info)
-                return
-            
-            # Para YouTube e outras plataformas
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'skip_download': True,
-                'socket_timeout': 15,
-                'retries': 2,
-                # Configurações para evitar bloqueio
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android', 'ios'],
-                        'skip': ['hls'],
-                    }
-                },
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Linux; Android 11; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.120 Mobile Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                },
-                'nocheckcertificate': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                video_info = {
-                    'title': info.get('title', 'video'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Desconhecido'),
-                }
-                self.info_received.emit(video_info)
+            with get_host_limiter(host).slot():
+                info = fetch_video_info(self.url)
+            breaker.record_success()
+            self.info_received.emit(info)
         except Exception as e:
-            error_str = str(e).lower()
-            
-            # Tratamento específico para erros comuns na análise
-            if any(phrase in error_str for phrase in ['sign in to confirm', 'not a bot', 'captcha']):
-                error_message = "YouTube detectou atividade automatizada. Aguarde alguns minutos e tente novamente."
-            elif any(phrase in error_str for phrase in ['private video', 'unavailable', 'removed']):
-                error_message = "Vídeo não disponível (privado, removido ou com restrições)."
-            elif any(phrase in error_str for phrase in ['network', 'connection', 'timeout', 'resolve']):
-                error_message = "Problema de conexão. Verifique sua internet e tente novamente."
-            elif 'http error 403' in error_str:
-                error_message = "Acesso negado. O vídeo pode ter restrições regionais."
-            else:
-                error_message = f"Erro ao analisar: {str(e)}"
-            
-            self.error_occurred.emit(error_message)
+            # A análise avulsa não repete, mas informa o circuit breaker do host
+            error = classify_error(e)
+            breaker.record_failure(error)
+            self.error_occurred.emit(error.describe_short())
 
 
-class DownloadThread(QThread):
-    """Thread para executar o download sem bloquear a interface"""
-    progress = pyqtSignal(str)
-    finished = pyqtSignal(bool, str)
-    download_progress = pyqtSignal(int)
+class BatchInfoThread(QThread):
+    """Thread que analisa um lote de URLs em paralelo com um pool limitado"""
+    item_analyzed = pyqtSignal(int, dict)
+    item_failed = pyqtSignal(int, str)
+    batch_done = pyqtSignal()
     
-    def __init__(self, url, output_path, download_type, custom_filename=None):
+    def __init__(self, urls, max_workers=MAX_ANALYSIS_WORKERS):
         super().__init__()
+        self.urls = list(urls)
+        self.max_workers = max_workers
+        self._stopped = False
+    
+    def stop(self):
+        """Cancela as análises que ainda não começaram"""
+        self._stopped = True
+    
+    def run(self):
+        """Analisa as URLs e emite cada resultado assim que fica pronto"""
+        batch_id = f"batch-{new_job_id()}"
+        with job_context(batch_id), ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Cada tarefa leva uma cópia do contexto, para que os spans saiam com o id do lote
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.analyze, url): index
+                for index, url in enumerate(self.urls)
+            }
+            for future in as_completed(futures):
+                if self._stopped:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                index = futures[future]
+                try:
+                    self.item_analyzed.emit(index, future.result())
+                except Exception as e:
+                    self.item_failed.emit(index, describe_info_error(e))
+        if get_tracer():
+            get_tracer().close_job(batch_id)
+        self.batch_done.emit()
+    
+    @staticmethod
+    def analyze(url):
+        """Analisa uma URL do lote"""
+        with trace_span('fetch_video_info', url=url):
+            # A vaga é ocupada a cada tentativa e liberada durante a espera entre elas
+            return run_with_retry(lambda: fetch_video_info_limited(url), url)
+
+
+# Pasta com os dados locais da aplicação (métricas, relatórios, caches)
+APP_DATA_DIR = Path(os.environ.get('CONVERSOR_DATA_DIR') or Path.home() / '.conversor-video-audio')
+
+
+def new_job_id():
+    """Gera um identificador curto e único para um job"""
+    import uuid
+    return uuid.uuid4().hex[:12]
+
+
+# Variável de ambiente com a pasta dos traces (também repassada aos processos filhos)
+TRACE_ENV_VAR = 'CONVERSOR_TRACE'
+
+# Job em execução no contexto atual (propagado para threads com contextvars.copy_context)
+current_job_id = contextvars.ContextVar('current_job_id', default=None)
+
+
+class Tracer:
+    """
+    Grava spans no formato "trace event" do Chrome (chrome://tracing, Perfetto)
+    
+    Cada job tem seu próprio arquivo <pasta>/<job_id>.json, no formato de
+    array JSON sem fechamento que os visualizadores aceitam. Os eventos são
+    acrescentados com O_APPEND, então threads e processos diferentes podem
+    escrever no mesmo job sem coordenação.
+    """
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._open_spans = {}
+    
+    def _fd(self, job_id):
+        """Descritor do arquivo do job (criado com o cabeçalho '[' se ainda não existir)"""
+        key = job_id or f"process-{os.getpid()}"
+        with self._lock:
+            fd = self._files.get(key)
+            if fd is None:
+                path = self.directory / f"{key}.json"
+                try:
+                    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | os.O_APPEND, 0o644)
+                    os.write(fd, b'[\n')
+                except FileExistsError:
+                    fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+                self._files[key] = fd
+            return fd
+    
+    def emit(self, event, job_id=None):
+        """Grava um evento já montado"""
+        job_id = job_id or current_job_id.get()
+        event.setdefault('pid', os.getpid())
+        event.setdefault('tid', threading.get_ident())
+        event.setdefault('args', {})['job_id'] = job_id
+        line = (json.dumps(event, ensure_ascii=False, default=str) + ',\n').encode('utf-8')
+        try:
+            os.write(self._fd(job_id), line)
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o trace: {e}")
+    
+    @contextmanager
+    def span(self, name, job_id=None, **args):
+        """Context manager que registra um span completo (evento 'X')"""
+        start = time.time_ns() // 1000
+        try:
+            yield
+        finally:
+            end = time.time_ns() // 1000
+            self.emit({'name': name, 'cat': 'job', 'ph': 'X', 'ts': start, 'dur': end - start, 'args': args}, job_id)
+    
+    def begin(self, key, name, job_id=None, **args):
+        """Abre um span que será fechado em outro ponto (ex: por hooks do yt-dlp)"""
+        self._open_spans[key] = (name, time.time_ns() // 1000, job_id or current_job_id.get(),
+                                 threading.get_ident(), args)
+    
+    def open_span_args(self, key):
+        """Argumentos de um span aberto com begin(), ou None se não houver"""
+        opened = self._open_spans.get(key)
+        return opened[4] if opened else None
+    
+    def end(self, key, **args):
+        """Fecha um span aberto com begin() (ignora chaves desconhecidas)"""
+        opened = self._open_spans.pop(key, None)
+        if opened is None:
+            return
+        name, start, job_id, tid, begin_args = opened
+        event = {'name': name, 'cat': 'job', 'ph': 'X', 'ts': start,
+                 'dur': time.time_ns() // 1000 - start, 'tid': tid, 'args': {**begin_args, **args}}
+        self.emit(event, job_id)
+    
+    def close_job(self, job_id):
+        """Fecha o arquivo de um job encerrado"""
+        with self._lock:
+            fd = self._files.pop(job_id, None)
+        if fd is not None:
+            os.close(fd)
+
+
+_tracer = None
+
+
+def get_tracer():
+    """Retorna o Tracer global, ou None se o tracing estiver desligado"""
+    global _tracer
+    if _tracer is None and os.environ.get(TRACE_ENV_VAR):
+        _tracer = Tracer(os.environ[TRACE_ENV_VAR])
+    return _tracer
+
+
+def enable_tracing(directory=None):
+    """Liga o tracing; a pasta é exportada no ambiente para que processos filhos a herdem"""
+    global _tracer
+    directory = Path(directory) if directory else APP_DATA_DIR / 'traces'
+    os.environ[TRACE_ENV_VAR] = str(directory)
+    _tracer = Tracer(directory)
+    return _tracer
+
+
+def disable_tracing():
+    """Desliga o tracing dos próximos jobs"""
+    global _tracer
+    os.environ.pop(TRACE_ENV_VAR, None)
+    _tracer = None
+
+
+def trace_span(name, **args):
+    """Span do job atual, ou um contexto vazio se o tracing estiver desligado"""
+    tracer = get_tracer()
+    return tracer.span(name, **args) if tracer else nullcontext()
+
+
+@contextmanager
+def job_context(job_id):
+    """Define o job atual (usado nos spans) enquanto o bloco executa"""
+    token = current_job_id.set(job_id)
+    try:
+        yield
+    finally:
+        current_job_id.reset(token)
+
+
+class JobMetrics:
+    """
+    Tempos de cada etapa de um job de download
+    
+    Etapas registradas: url_cleaning, streamyard_resolve, extraction,
+    download, merge, transcode e postprocess, além do tempo até o
+    primeiro byte (TTFB), da vazão do download e do tempo total.
+    """
+    
+    # Nome do pós-processador do yt-dlp → etapa registrada
+    POSTPROCESSOR_STAGES = {'Merger': 'merge', 'ExtractAudio': 'transcode', 'SinglePass': 'transcode'}
+    
+    def __init__(self, job_id=None, url='', download_type=''):
+        self.job_id = job_id or new_job_id()
         self.url = url
-        self.output_path = output_path
         self.download_type = download_type
-        self.custom_filename = custom_filename
+        self.started_at = time.time()
+        self.status = None
+        self.error_type = None
+        self.attempts = 1
+        self.stall_restarts = 0
+        # Preenchidos pela extração e pelo download (histórico)
+        self.media_id = None
+        self.title = None
+        self.checksums = {}
+        self.location = None
+        self.stages = {}
+        self.ttfb = None
+        self._start = time.monotonic()
+        self._download_start = None
+        self._download_end = None
+        self._bytes_by_file = {}
+        self._postprocessor_start = {}
+        self._total = None
+    
+    def add_stage(self, name, seconds):
+        """Soma a duração de uma etapa (etapas podem se repetir, ex: vídeo + áudio)"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    @contextmanager
+    def stage(self, name, span=None):
+        """
+        Context manager que cronometra uma etapa
         
+        Args:
+            name: Nome da etapa nas métricas
+            span: Nome do span no trace (padrão: o nome da etapa)
+        """
+        start = time.monotonic()
+        tracer = get_tracer()
+        try:
+            if tracer:
+                with tracer.span(span or name, job_id=self.job_id):
+                    yield
+            else:
+                yield
+        finally:
+            self.add_stage(name, time.monotonic() - start)
+    
+    def mark_download_start(self):
+        """Marca o início da etapa de download (após a extração)"""
+        self._download_start = time.monotonic()
+    
     def progress_hook(self, d):
-        """Callback para atualizar o progresso do download"""
-        if d['status'] == 'downloading':
-            try:
-                # Calcula a porcentagem do download
-                if 'total_bytes' in d:
+        """Hook de progresso do yt-dlp que registra TTFB, bytes e duração do download"""
+        now = time.monotonic()
+        if self._download_start is None:
+            self._download_start = now
+        if d.get('downloaded_bytes') and self.ttfb is None:
+            self.ttfb = now - self._download_start
+        if d.get('downloaded_bytes') is not None:
+            self._bytes_by_file[d.get('filename')] = d['downloaded_bytes']
+        if d['status'] == 'finished':
+            self._download_end = now
+        
+        tracer = get_tracer()
+        if tracer:
+            self._trace_download(tracer, d)
+    
+    def _trace_download(self, tracer, d):
+        """Abre/fecha spans por arquivo e por fragmento a partir do hook de progresso"""
+        file_key = (self.job_id, 'file', d.get('filename'))
+        if d['status'] == 'downloading' and tracer.open_span_args(file_key) is None:
+            tracer.begin(file_key, 'download', job_id=self.job_id, filename=os.path.basename(d.get('filename') or ''))
+        
+        # Downloads fragmentados (HLS/DASH) informam o fragmento atual
+        fragment_index = d.get('fragment_index')
+        fragment_key = (self.job_id, 'fragment', d.get('filename'))
+        if fragment_index is not None and d['status'] == 'downloading':
+            opened = tracer.open_span_args(fragment_key)
+            if opened is None or opened.get('fragment_index') != fragment_index:
+                tracer.end(fragment_key)
+                tracer.begin(fragment_key, 'fragment', job_id=self.job_id,
+                             fragment_index=fragment_index, fragment_count=d.get('fragment_count'))
+        
+        if d['status'] in ('finished', 'error'):
+            tracer.end(fragment_key)
+            tracer.end(file_key, status=d['status'], bytes=d.get('downloaded_bytes'))
+    
+    def postprocessor_hook(self, d):
+        """Hook de pós-processamento do yt-dlp que cronometra merge e transcodificação"""
+        name = d.get('postprocessor')
+        tracer = get_tracer()
+        if d['status'] == 'started':
+            self._postprocessor_start[name] = time.monotonic()
+            if tracer:
+                span = 'FFmpegExtractAudio' if name == 'ExtractAudio' else name
+                tracer.begin((self.job_id, 'pp', name), span, job_id=self.job_id)
+        elif d['status'] == 'finished' and name in self._postprocessor_start:
+            stage = self.POSTPROCESSOR_STAGES.get(name, 'postprocess')
+            self.add_stage(stage, time.monotonic() - self._postprocessor_start.pop(name))
+            if tracer:
+                tracer.end((self.job_id, 'pp', name))
+    
+    @property
+    def downloaded_bytes(self):
+        return sum(self._bytes_by_file.values())
+    
+    def finish(self, status, error=None):
+        """Encerra a medição do job ('ok', 'error', 'cancelled'...)"""
+        self.status = status
+        if error is not None:
+            self.error_type = type(error).__name__
+        self._total = time.monotonic() - self._start
+        if self._download_start is not None and self._download_end is not None:
+            self.stages['download'] = self._download_end - self._download_start
+    
+    def to_dict(self):
+        """Registro do job no formato gravado no arquivo JSON-lines"""
+        from datetime import datetime
+        download_seconds = self.stages.get('download')
+        throughput = None
+        if download_seconds:
+            throughput = self.downloaded_bytes / download_seconds
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'download_type': self.download_type,
+            'status': self.status,
+            'error_type': self.error_type,
+            'attempts': self.attempts,
+            'stall_restarts': self.stall_restarts,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'ttfb_seconds': round(self.ttfb, 4) if self.ttfb is not None else None,
+            'downloaded_bytes': self.downloaded_bytes,
+            'throughput_bytes_per_second': round(throughput, 1) if throughput else None,
+            'total_seconds': round(self._total, 4) if self._total is not None else None,
+        }
+
+
+class MetricsRecorder:
+    """
+    Grava as métricas dos jobs em JSON-lines e as agrega no formato texto do Prometheus
+    
+    O arquivo .prom é reescrito após cada job, no formato esperado pelo
+    "textfile collector" do node_exporter.
+    """
+    
+    def __init__(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._stage_sum = {}
+        self._stage_count = {}
+        self._ttfb_sum = 0.0
+        self._ttfb_count = 0
+        self._bytes = 0
+    
+    def record(self, metrics):
+        """Registra um job encerrado (JobMetrics)"""
+        data = metrics.to_dict()
+        with self._lock:
+            self._jobs[data['status']] = self._jobs.get(data['status'], 0) + 1
+            stages = dict(data['stages'])
+            if data['total_seconds'] is not None:
+                stages['total'] = data['total_seconds']
+            for name, seconds in stages.items():
+                self._stage_sum[name] = self._stage_sum.get(name, 0.0) + seconds
+                self._stage_count[name] = self._stage_count.get(name, 0) + 1
+            if data['ttfb_seconds'] is not None:
+                self._ttfb_sum += data['ttfb_seconds']
+                self._ttfb_count += 1
+            self._bytes += data['downloaded_bytes']
+            
+            try:
+                if self.jsonl_path:
+                    Path(self.jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(data, ensure_ascii=False) + '\n')
+                if self.prom_path:
+                    # Escreve em um arquivo temporário e renomeia, para nunca expor um arquivo pela metade
+                    tmp_path = f"{self.prom_path}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write(self._render())
+                    os.replace(tmp_path, self.prom_path)
+            except OSError as e:
+                print(f"Aviso: não foi possível gravar as métricas: {e}")
+    
+    def render_prometheus(self):
+        """Retorna as métricas agregadas no formato texto do Prometheus"""
+        with self._lock:
+            return self._render()
+    
+    def _render(self):
+        lines = [
+            '# HELP conversor_jobs_total Jobs encerrados, por status.',
+            '# TYPE conversor_jobs_total counter',
+        ]
+        lines += [f'conversor_jobs_total{{status="{status}"}} {count}' for status, count in sorted(self._jobs.items())]
+        lines += [
+            '# HELP conversor_stage_seconds Tempo gasto em cada etapa dos jobs.',
+            '# TYPE conversor_stage_seconds summary',
+        ]
+        for name in sorted(self._stage_sum):
+            lines.append(f'conversor_stage_seconds_sum{{stage="{name}"}} {self._stage_sum[name]:.6f}')
+            lines.append(f'conversor_stage_seconds_count{{stage="{name}"}} {self._stage_count[name]}')
+        lines += [
+            '# HELP conversor_ttfb_seconds Tempo até o primeiro byte do download.',
+            '# TYPE conversor_ttfb_seconds summary',
+            f'conversor_ttfb_seconds_sum {self._ttfb_sum:.6f}',
+            f'conversor_ttfb_seconds_count {self._ttfb_count}',
+            '# HELP conversor_downloaded_bytes_total Bytes baixados por todos os jobs.',
+            '# TYPE conversor_downloaded_bytes_total counter',
+            f'conversor_downloaded_bytes_total {self._bytes}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+_metrics_recorder = None
+
+
+def get_metrics_recorder():
+    """Retorna o MetricsRecorder global (por padrão grava em APP_DATA_DIR)"""
+    global _metrics_recorder
+    if _metrics_recorder is None:
+        configure_metrics(
+            os.environ.get('CONVERSOR_METRICS_FILE') or APP_DATA_DIR / 'metrics.jsonl',
+            os.environ.get('CONVERSOR_METRICS_PROM') or APP_DATA_DIR / 'metrics.prom',
+        )
+    return _metrics_recorder
+
+
+def configure_metrics(jsonl_path=None, prom_path=None):
+    """Substitui o MetricsRecorder global (ex: caminhos passados pela linha de comando)"""
+    global _metrics_recorder
+    _metrics_recorder = MetricsRecorder(jsonl_path, prom_path)
+    return _metrics_recorder
+
+
+# Variável de ambiente com o caminho do banco de histórico (padrão: APP_DATA_DIR/history.db)
+HISTORY_ENV_VAR = 'CONVERSOR_HISTORY_DB'
+
+
+def media_id_from_url(url):
+    """ID do vídeo do YouTube contido na URL (None para outros sites)"""
+    from yt_dlp.extractor.youtube import YoutubeIE
+    try:
+        return YoutubeIE.get_temp_id(url)
+    except Exception:
+        return None
+
+
+def parse_since(value):
+    """
+    Converte "7d", "12h", "30m", "2026-10-01" ou "2026-10-01T08:00" em timestamp
+    
+    Raises:
+        ValueError: Se o valor não for uma data nem um intervalo relativo
+    """
+    from datetime import datetime
+    value = str(value).strip()
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([dhm])', value.lower())
+    if match:
+        seconds = float(match.group(1)) * {'d': 86400, 'h': 3600, 'm': 60}[match.group(2)]
+        return time.time() - seconds
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"data inválida: {value} (use AAAA-MM-DD, AAAA-MM-DDTHH:MM ou 7d/12h/30m)")
+
+
+class HistoryStore:
+    """
+    Histórico persistente dos jobs em SQLite
+    
+    Cada job encerrado (interface, manifesto, serviço, workers) vira uma
+    linha com URL, ID do vídeo, título, status, erro e o job original, que
+    permite repeti-lo. Os índices por URL, ID, status e data mantêm buscas
+    e filtros instantâneos mesmo com dezenas de milhares de jobs.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            job_id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            media_id TEXT,
+            title TEXT,
+            download_type TEXT,
+            status TEXT NOT NULL,
+            error_type TEXT,
+            error TEXT,
+            file TEXT,
+            started_at REAL NOT NULL,
+            finished_at REAL NOT NULL,
+            total_seconds REAL,
+            downloaded_bytes INTEGER,
+            job TEXT,
+            sha256 TEXT
+        );
+        CREATE INDEX IF NOT EXISTS history_url ON history (url, finished_at);
+        CREATE INDEX IF NOT EXISTS history_media_id ON history (media_id);
+        CREATE INDEX IF NOT EXISTS history_status ON history (status, finished_at);
+        CREATE INDEX IF NOT EXISTS history_finished ON history (finished_at);
+    """
+    # Colunas acrescentadas depois da primeira versão (bancos antigos recebem ALTER TABLE)
+    MIGRATIONS = (
+        ('sha256', "ALTER TABLE history ADD COLUMN sha256 TEXT"),
+    )
+    INDEXES = "CREATE INDEX IF NOT EXISTS history_sha256 ON history (sha256);"
+    COLUMNS = ('job_id', 'url', 'media_id', 'title', 'download_type', 'status', 'error_type', 'error',
+               'file', 'started_at', 'finished_at', 'total_seconds', 'downloaded_bytes', 'sha256')
+    
+    def __init__(self, path):
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        # WAL: a interface pode buscar enquanto outro processo (CLI, serviço) grava
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(self.SCHEMA)
+        existing = {row[1] for row in self._db.execute('PRAGMA table_info(history)')}
+        for column, statement in self.MIGRATIONS:
+            if column not in existing:
+                self._db.execute(statement)
+        self._db.executescript(self.INDEXES)
+    
+    def record(self, metrics, job=None, result=None):
+        """
+        Grava um job encerrado
+        
+        Args:
+            metrics: JobMetrics já encerrado (finish)
+            job: dict do job (validate_manifest_row), guardado para repetições
+            result: Resultado do job ({'status', 'file', 'error'...})
+        """
+        result = result or {}
+        data = metrics.to_dict()
+        stored = {key: job[key] for key in MANIFEST_JOB_KEYS if key in job} if job else None
+        row = (
+            metrics.job_id, metrics.url, metrics.media_id or media_id_from_url(metrics.url), metrics.title,
+            metrics.download_type, metrics.status, metrics.error_type, result.get('error'), result.get('file'),
+            metrics.started_at, time.time(), data['total_seconds'], data['downloaded_bytes'],
+            metrics.checksums.get('sha256'), json.dumps(stored, ensure_ascii=False) if stored else None,
+        )
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO history ({', '.join(self.COLUMNS)}, job) VALUES ({', '.join('?' * len(row))})",
+                row
+            )
+    
+    def search(self, text=None, status=None, since=None, until=None, limit=200):
+        """
+        Busca jobs do mais recente para o mais antigo
+        
+        Args:
+            text: URL exata, SHA-256, ID do vídeo, ou trecho do título/URL
+            status: 'ok', 'error', 'cancelled'... (None = todos)
+            since, until: Intervalo de término (timestamps)
+            limit: Máximo de linhas devolvidas
+        
+        Returns:
+            list: dicts com as colunas do histórico
+        """
+        clauses, params = [], []
+        text = (text or '').strip()
+        if text:
+            url = clean_and_validate_url(text) if '://' in text else None
+            if url:
+                clauses.append('url = ?')
+                params.append(url)
+            elif re.fullmatch(r'[0-9a-fA-F]{64}', text):
+                clauses.append('sha256 = ?')
+                params.append(text.lower())
+            else:
+                clauses.append('(media_id = ? OR title LIKE ? OR url LIKE ?)')
+                params += [text, f"%{text}%", f"%{text}%"]
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if since is not None:
+            clauses.append('finished_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('finished_at < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._query(
+            f"SELECT {', '.join(self.COLUMNS)} FROM history {where} ORDER BY finished_at DESC LIMIT ?",
+            params + [limit]
+        )
+    
+    def failed_since(self, since):
+        """
+        Jobs cuja última execução falhou depois de `since`
+        
+        URLs que falharam e depois foram baixadas com sucesso ficam de fora;
+        cada URL aparece uma vez, na ordem em que falhou.
+        
+        Returns:
+            list: dicts prontos para validate_manifest_row (url, type, filename...)
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, download_type, job FROM history AS h "
+                "WHERE status = 'error' AND finished_at >= ? AND NOT EXISTS ("
+                "    SELECT 1 FROM history AS later WHERE later.url = h.url AND (later.finished_at > h.finished_at"
+                "    OR (later.finished_at = h.finished_at AND later.rowid > h.rowid))"
+                ") ORDER BY finished_at",
+                (since,)
+            ).fetchall()
+        jobs = []
+        for url, download_type, stored in rows:
+            job = json.loads(stored) if stored else {'url': url, 'download_type': download_type}
+            jobs.append(manifest_row_from_job(job))
+        return jobs
+    
+    def find_by_sha256(self, digest):
+        """Downloads concluídos com o mesmo conteúdo, do mais recente para o mais antigo"""
+        return self._query(
+            f"SELECT {', '.join(self.COLUMNS)} FROM history WHERE sha256 = ? AND status = 'ok' ORDER BY finished_at DESC",
+            (digest,)
+        )
+    
+    def _query(self, sql, params):
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_history = None
+
+
+def get_history():
+    """Retorna o HistoryStore global (por padrão em APP_DATA_DIR/history.db)"""
+    global _history
+    if _history is None:
+        configure_history(os.environ.get(HISTORY_ENV_VAR) or APP_DATA_DIR / 'history.db')
+    return _history
+
+
+def configure_history(path):
+    """Substitui o HistoryStore global (ex: caminho passado pela linha de comando)"""
+    global _history
+    _history = HistoryStore(path)
+    return _history
+
+
+def find_duplicate(digest, filename):
+    """Outro arquivo já baixado (e ainda existente) com o mesmo SHA-256, ou None"""
+    try:
+        entries = get_history().find_by_sha256(digest)
+    except (sqlite3.Error, OSError):
+        return None
+    for entry in entries:
+        if entry['file'] and entry['file'] != filename and os.path.isfile(entry['file']):
+            return entry['file']
+    return None
+
+
+def record_history(metrics, job=None, result=None):
+    """Grava um job encerrado no histórico; falhas de gravação só geram um aviso"""
+    try:
+        get_history().record(metrics, job, result)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Aviso: não foi possível gravar o histórico: {e}")
+
+
+# Variável de ambiente que liga o perfilamento ("1" usa a pasta padrão; outro valor é a pasta)
+PROFILE_ENV_VAR = 'CONVERSOR_PROFILE'
+
+# Quantidade de funções e linhas de alocação mostradas no resumo do log
+PROFILE_TOP_N = 15
+
+_profile_dir = None
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def enable_profiling(output_dir=None):
+    """Liga o perfilamento dos jobs (pela linha de comando ou pelo menu de depuração)"""
+    global _profile_dir
+    _profile_dir = Path(output_dir) if output_dir else APP_DATA_DIR / 'profiles'
+
+
+def disable_profiling():
+    """Desliga o perfilamento dos próximos jobs"""
+    global _profile_dir
+    _profile_dir = None
+
+
+def get_profile_dir():
+    """Pasta onde os perfis são gravados, ou None se o perfilamento estiver desligado"""
+    if _profile_dir is not None:
+        return _profile_dir
+    env_value = os.environ.get(PROFILE_ENV_VAR, '').strip()
+    if env_value and env_value.lower() not in ('0', 'false', 'no'):
+        return APP_DATA_DIR / 'profiles' if env_value.lower() in ('1', 'true', 'yes') else Path(env_value)
+    return None
+
+
+def profile_job(job_id, func, log=print, output_dir=None, top_n=PROFILE_TOP_N):
+    """
+    Executa func() sob cProfile e tracemalloc
+    
+    Grava <job_id>.prof (abra com snakeviz ou pstats) e <job_id>.tracemalloc
+    (tracemalloc.Snapshot.load) e envia ao log as funções mais caras e as
+    linhas que mais alocaram memória.
+    
+    Args:
+        job_id: Identificador usado no nome dos arquivos
+        func: Função sem argumentos que executa o job
+        log: Função que recebe o resumo
+        output_dir: Pasta dos arquivos (padrão: get_profile_dir())
+        top_n: Quantidade de itens no resumo
+    
+    Returns:
+        O retorno de func()
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+    global _tracemalloc_users
+    
+    output_dir = Path(output_dir or get_profile_dir() or APP_DATA_DIR / 'profiles')
+    
+    # tracemalloc é global ao processo: liga no primeiro job perfilado e desliga no último
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_users += 1
+    
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # A partir do Python 3.12 só um cProfile pode estar ativo por vez
+        log("⚠️ Outro job já está sendo perfilado; este terá apenas o perfil de memória")
+        profiler = None
+    
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with _tracemalloc_lock:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+        
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            snapshot_path = output_dir / f"{job_id}.tracemalloc"
+            snapshot.dump(str(snapshot_path))
+            log(f"🧠 Memória: atual {current / 1024 / 1024:.1f} MB | pico {peak / 1024 / 1024:.1f} MB")
+            for stat in snapshot.statistics('lineno')[:top_n // 3]:
+                log(f"   {stat.size / 1024:.0f} KB em {stat.traceback[0]}")
+            
+            if profiler:
+                prof_path = output_dir / f"{job_id}.prof"
+                profiler.dump_stats(str(prof_path))
+                stats = pstats.Stats(profiler).sort_stats('cumulative')
+                log(f"🔬 Funções mais caras (tempo acumulado) de {len(stats.stats)} perfiladas:")
+                for (filename, line, name), (_, calls, own, cumulative, _) in _top_stats(stats, top_n):
+                    log(f"   {cumulative:8.3f}s acum | {own:7.3f}s próprio | {calls:6d}x {name} ({os.path.basename(filename)}:{line})")
+                log(f"💾 Perfil salvo em: {prof_path}")
+            log(f"💾 Snapshot de memória salvo em: {snapshot_path}")
+        except OSError as e:
+            log(f"⚠️ Não foi possível gravar o perfil: {e}")
+
+
+def _top_stats(stats, top_n):
+    """Retorna as top_n entradas de um pstats.Stats na ordem de ordenação atual"""
+    return [(key, stats.stats[key]) for key in stats.fcn_list[:top_n]]
+
+
+# Configurações de player_client do YouTube disputadas na extração paralela
+PLAYER_CLIENT_CANDIDATES = (
+    ('android', 'ios'),
+    ('web',),
+    ('tv_embedded',),
+    ('mweb',),
+)
+HEDGE_ENV_VAR = 'CONVERSOR_HEDGED_EXTRACTION'
+# Espera pela primeira tentativa antes de disparar a próxima configuração
+HEDGE_DELAY_SECONDS = 2.0
+
+
+def hedged_extraction_enabled():
+    """A extração paralela é opcional (variável de ambiente, --hedge ou menu)"""
+    return os.environ.get(HEDGE_ENV_VAR, '') not in ('', '0')
+
+
+class PlayerClientStats:
+    """
+    Histórico de sucesso e latência de cada configuração de player_client
+    
+    Usado para decidir a ordem das próximas tentativas: primeiro a
+    configuração com menor tempo esperado (latência média / taxa de sucesso).
+    Tentativas interrompidas porque outra venceu ficam só em 'cancelled':
+    não dizem nada sobre a configuração e não contam como falha.
+    O histórico é salvo em JSON na pasta de dados da aplicação.
+    """
+    
+    # Peso das novas medições na média móvel exponencial
+    ALPHA = 0.3
+    DEFAULT_LATENCY = 5.0
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._data = {}
+        if self.path and self.path.exists():
+            try:
+                self._data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._data = {}
+    
+    @staticmethod
+    def key(client):
+        return ','.join(client)
+    
+    def expected_seconds(self, client):
+        """Tempo esperado até um resultado bom com esta configuração"""
+        entry = self._data.get(self.key(client))
+        if not entry or not entry['attempts']:
+            return self.DEFAULT_LATENCY
+        success_rate = (entry['successes'] + 1) / (entry['attempts'] + 2)
+        return entry['latency'] / success_rate
+    
+    def order(self, clients):
+        """Ordena as configurações da mais promissora para a menos (empates mantêm a ordem dada)"""
+        with self._lock:
+            return sorted(clients, key=self.expected_seconds)
+    
+    def record(self, client, ok, seconds):
+        """Registra o resultado de uma tentativa"""
+        with self._lock:
+            entry = self._data.setdefault(self.key(client), {'attempts': 0, 'successes': 0, 'latency': seconds})
+            entry['attempts'] += 1
+            entry['successes'] += int(ok)
+            entry['latency'] += self.ALPHA * (seconds - entry['latency'])
+            self._save()
+    
+    def record_cancelled(self, client):
+        """Registra uma tentativa interrompida porque outra configuração respondeu antes"""
+        with self._lock:
+            entry = self._data.setdefault(self.key(client), {'attempts': 0, 'successes': 0,
+                                                             'latency': self.DEFAULT_LATENCY})
+            entry['cancelled'] = entry.get('cancelled', 0) + 1
+            self._save()
+    
+    def _save(self):
+        """Grava o histórico (chamar com o lock)"""
+        if self.path:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(self._data, indent=2), encoding='utf-8')
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+    
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._data.items()}
+
+
+_client_stats = None
+
+
+def get_client_stats():
+    """Histórico compartilhado de player_client (carregado na primeira extração paralela)"""
+    global _client_stats
+    if _client_stats is None:
+        _client_stats = PlayerClientStats(APP_DATA_DIR / 'player_clients.json')
+    return _client_stats
+
+
+def hedged_extract_info(url, ydl_opts, clients=PLAYER_CLIENT_CANDIDATES, stats=None,
+                        hedge_delay=HEDGE_DELAY_SECONDS, log=None, ydl_class=None):
+    """
+    Extrai as informações de um vídeo do YouTube disputando várias configurações de player_client
+    
+    A configuração mais promissora começa sozinha; se não responder em
+    hedge_delay segundos (ou falhar), a próxima é disparada em paralelo, e
+    assim por diante. O primeiro resultado bom vence: as tentativas que ainda
+    não começaram são descartadas e as que estão em andamento são
+    interrompidas na próxima requisição HTTP. As interrompidas não são
+    erros: entram no histórico como canceladas e não chegam a quem chamou
+    (nem, portanto, ao circuit breaker do host).
+    
+    Args:
+        url: URL do vídeo
+        ydl_opts: Opções base do yt-dlp (o player_client é substituído em cada tentativa)
+        clients: Configurações candidatas
+        stats: PlayerClientStats (padrão: o histórico compartilhado)
+        hedge_delay: Espera antes de disparar a próxima configuração
+        log: Função que recebe mensagens de andamento (opcional)
+        ydl_class: Classe usada para extrair (padrão: yt_dlp.YoutubeDL)
+    
+    Returns:
+        tuple: (info sem processar, configuração vencedora)
+    
+    Raises:
+        Exception: O erro da última tentativa, se todas falharem
+    """
+    import queue
+    
+    log = log or (lambda message: None)
+    ydl_class = ydl_class or yt_dlp.YoutubeDL
+    stats = stats or get_client_stats()
+    pending = list(stats.order(clients))
+    results = queue.Queue()
+    done = threading.Event()
+    
+    def cancellable(urlopen):
+        def guarded(*args, **kwargs):
+            if done.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Outra configuração de player_client já respondeu")
+            return urlopen(*args, **kwargs)
+        return guarded
+    
+    def attempt(client):
+        youtube_args = dict(ydl_opts.get('extractor_args', {}).get('youtube', {}), player_client=list(client))
+        opts = dict(ydl_opts, extractor_args=dict(ydl_opts.get('extractor_args', {}), youtube=youtube_args))
+        start = time.monotonic()
+        ydl = None
+        try:
+            if done.is_set():
+                return
+            with trace_span('extract_info', player_client=stats.key(client)):
+                ydl = ydl_class(opts)
+                ydl.urlopen = cancellable(ydl.urlopen)
+                info = ydl.extract_info(url, download=False, process=False)
+        except Exception as e:
+            if done.is_set():
+                # Perdeu a disputa: o erro é só a interrupção (ou chegou tarde demais para importar)
+                stats.record_cancelled(client)
+                return
+            stats.record(client, False, time.monotonic() - start)
+            results.put((client, None, e))
+        else:
+            stats.record(client, True, time.monotonic() - start)
+            results.put((client, info, None))
+        finally:
+            if ydl is not None:
+                ydl.close()
+    
+    def launch():
+        client = pending.pop(0)
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(attempt, client),
+            name=f"hedge-{stats.key(client)}", daemon=True
+        ).start()
+    
+    launch()
+    in_flight = 1
+    last_error = None
+    while in_flight:
+        try:
+            client, info, error = results.get(timeout=hedge_delay if pending else None)
+        except queue.Empty:
+            log(f"⏳ Cliente sem resposta em {hedge_delay:.0f}s; tentando também {stats.key(pending[0])}")
+            launch()
+            in_flight += 1
+            continue
+        in_flight -= 1
+        if error is None:
+            done.set()
+            return info, client
+        last_error = error
+        if pending:
+            launch()
+            in_flight += 1
+    raise last_error
+
+
+# Vazão mínima (bytes/s) sustentada durante a janela antes de reabrir a conexão
+STALL_MIN_SPEED = 32 * 1024
+STALL_WINDOW_SECONDS = 20.0
+# Reaberturas por job: a primeira reaproveita a URL, as seguintes a resolvem de novo
+MAX_STALL_RESTARTS = 3
+# Tamanho fixo de leitura do yt-dlp: o hook de progresso precisa ser chamado mesmo
+# quando a conexão está lenta (com o buffer adaptativo, uma leitura de 4 MB a 5 KB/s
+# passaria mais de 10 minutos sem nenhuma chamada)
+STALL_READ_BLOCK_SIZE = 64 * 1024
+
+
+class StallDetected(Exception):
+    """Levantada pelo watchdog quando a vazão de um arquivo fica abaixo do mínimo pela janela toda"""
+
+
+class StallWatchdog:
+    """
+    Acompanha a vazão de cada arquivo (ou sequência de fragmentos) de um job
+    
+    Usado como progress hook do yt-dlp: mantém as amostras da última janela
+    e, se a vazão média nela ficar abaixo de min_speed, interrompe o
+    download com StallDetected. O download_media então reabre a conexão e
+    continua do ponto em que parou (o yt-dlp retoma o .part com Range).
+    
+    Uma parada total, sem nenhum bloco chegando, não chama o hook; esse caso
+    continua coberto pelo socket_timeout e pelas retentativas do yt-dlp.
+    
+    Com um BandwidthLease em lease, o job fica isento enquanto a banda
+    alocada a ele estiver abaixo de min_speed: a lentidão é proposital.
+    """
+    
+    def __init__(self, min_speed=STALL_MIN_SPEED, window=STALL_WINDOW_SECONDS):
+        from collections import deque
+        self.min_speed = min_speed
+        self.window = window
+        self.lease = None
+        self._samples = {}
+        self._deque = deque
+    
+    def reset(self):
+        """Descarta as amostras (chamado a cada nova conexão)"""
+        self._samples.clear()
+    
+    def progress_hook(self, d):
+        if d['status'] != 'downloading':
+            self._samples.pop(d.get('filename'), None)
+            return
+        
+        allocated = self.lease.allocated if self.lease else None
+        if allocated and allocated < self.min_speed:
+            # A janela recomeça quando a banda voltar a passar do mínimo
+            self._samples.pop(d.get('filename'), None)
+            return
+        
+        now = time.monotonic()
+        downloaded = d.get('downloaded_bytes') or 0
+        samples = self._samples.setdefault(d.get('filename'), self._deque())
+        samples.append((now, downloaded))
+        # Mantém uma amostra anterior ao início da janela como referência
+        while len(samples) > 2 and samples[1][0] <= now - self.window:
+            samples.popleft()
+        
+        oldest_time, oldest_bytes = samples[0]
+        elapsed = now - oldest_time
+        if elapsed >= self.window:
+            speed = (downloaded - oldest_bytes) / elapsed
+            if speed < self.min_speed:
+                samples.clear()
+                raise StallDetected(
+                    f"Vazão de {speed / 1024:.1f} KB/s por {elapsed:.0f}s "
+                    f"(mínimo {self.min_speed / 1024:.0f} KB/s)"
+                )
+
+
+def _find_stall(e):
+    """Procura um StallDetected na exceção ou nas exceções encadeadas"""
+    while e is not None:
+        if isinstance(e, StallDetected):
+            return e
+        exc_info = getattr(e, 'exc_info', None)
+        e = (exc_info[1] if exc_info else None) or e.__cause__ or e.__context__
+    return None
+
+
+# Fragmentos HLS/DASH baixados ao mesmo tempo por arquivo (também via --fragment-workers)
+FRAGMENT_WORKERS_ENV_VAR = 'CONVERSOR_FRAGMENT_WORKERS'
+DEFAULT_FRAGMENT_WORKERS = 4
+# Chave, nos parâmetros do yt-dlp, do limite de bytes de fragmentos prontos esperando a vez na memória
+FRAGMENT_BUFFER_PARAM = 'conversor_fragment_buffer'
+FRAGMENT_BUFFER_BYTES = 32 * 1024 * 1024
+
+
+def get_fragment_workers():
+    """Fragmentos simultâneos configurados em CONVERSOR_FRAGMENT_WORKERS (padrão: 4)"""
+    try:
+        return max(1, int(os.environ.get(FRAGMENT_WORKERS_ENV_VAR) or DEFAULT_FRAGMENT_WORKERS))
+    except ValueError:
+        return DEFAULT_FRAGMENT_WORKERS
+
+
+def configure_fragment_workers(workers):
+    """
+    Define quantos fragmentos de cada arquivo são baixados ao mesmo tempo (vale também para os workers filhos)
+    
+    Raises:
+        ValueError: Se workers for menor que 1
+    """
+    if workers < 1:
+        raise ValueError(f"--fragment-workers precisa ser ao menos 1 (recebido {workers})")
+    os.environ[FRAGMENT_WORKERS_ENV_VAR] = str(workers)
+
+
+def _download_fragments_in_order(fd, ctx, fragments, info_dict, is_fatal, pack_func, finish_func):
+    """
+    Baixa os fragmentos em paralelo, direto para a memória, e os grava em ordem no .part
+    
+    Substitui o caminho concorrente do yt-dlp, que grava cada fragmento em um
+    arquivo -FragN, o relê e o apaga, e que despacha a lista inteira de uma
+    vez. Aqui, no máximo concurrent_fragment_downloads fragmentos estão em
+    andamento ou prontos esperando a vez, e novos só são pedidos enquanto
+    os prontos somam menos que params[FRAGMENT_BUFFER_PARAM] bytes. O .part
+    cresce em ordem (os write taps e o limite de banda veem o arquivo final),
+    sem etapa de junção no fim, e o .ytdl registra o último fragmento
+    gravado para a retomada.
+    """
+    from collections import deque
+    from concurrent.futures import wait, FIRST_COMPLETED
+    from yt_dlp.networking import Request
+    from yt_dlp.networking.exceptions import RequestError
+    from yt_dlp.utils import RetryManager
+    from yt_dlp.utils.networking import HTTPHeaderDict
+    from yt_dlp.utils.progress import ProgressCalculator
+    
+    workers = max(1, int(fd.params.get('concurrent_fragment_downloads') or 1))
+    buffer_limit = fd.params.get(FRAGMENT_BUFFER_PARAM) or FRAGMENT_BUFFER_BYTES
+    block_size = fd.params.get('buffersize') or STALL_READ_BLOCK_SIZE
+    if not fd.params.get('skip_unavailable_fragments', True):
+        is_fatal = lambda _: True
+    decrypt_fragment = fd.decrypter(info_dict)
+    total_frags = ctx['total_frags']
+    stop = threading.Event()
+    progress = ProgressCalculator(ctx['complete_frags_downloaded_bytes'])
+    progress_lock = threading.Lock()
+    state = {
+        'status': 'downloading',
+        'downloaded_bytes': progress.downloaded,
+        'fragment_index': ctx['fragment_index'],
+        'fragment_count': total_frags,
+        'filename': ctx['filename'],
+        'tmpfilename': ctx['tmpfilename'],
+    }
+    
+    def report(size, finished=False):
+        with progress_lock:
+            progress.update(size)
+            if finished:
+                state['fragment_index'] += 1
+                progress.thread_reset()
+            if total_frags and state['fragment_index']:
+                progress.total = progress.downloaded / state['fragment_index'] * total_frags
+                state['total_bytes_estimate'] = progress.total
+            state.update(downloaded_bytes=progress.downloaded, elapsed=progress.elapsed,
+                         speed=progress.speed.smooth, eta=progress.eta.smooth)
+            fd._hook_progress(dict(state), info_dict)
+    
+    def fetch(fragment):
+        """Conteúdo do fragmento, ou None se ele não existir e puder ser pulado"""
+        frag_index = fragment['frag_index']
+        fatal = is_fatal(fragment.get('index') or (frag_index - 1))
+        headers = HTTPHeaderDict(info_dict.get('http_headers'))
+        byte_range = fragment.get('byte_range')
+        if byte_range:
+            headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
+        
+        def error_callback(err, count, retries):
+            fd.report_retry(err, count, retries, frag_index, fatal)
+        
+        for retry in RetryManager(fd.params.get('fragment_retries'), error_callback):
+            chunks, size = [], 0
+            try:
+                with fd.ydl.urlopen(Request(fragment['url'], data=info_dict.get('request_data'),
+                                            headers=headers)) as response:
+                    while not stop.is_set():
+                        block = response.read(block_size)
+                        if not block:
+                            break
+                        chunks.append(block)
+                        size += len(block)
+                        report(size)
+            except (RequestError, OSError) as err:
+                retry.error = err
+                continue
+            if stop.is_set():
+                return None
+            report(size, finished=True)
+            return b''.join(chunks)
+        return None
+    
+    def append(fragment, content):
+        frag_index = fragment['frag_index']
+        if content:
+            content = pack_func(decrypt_fragment(fragment, content), frag_index)
+            ctx['dest_stream'].write(content)
+            ctx['dest_stream'].flush()
+            ctx['fragment_index'] = frag_index
+            if fd._FragmentFD__do_ytdl_file(ctx):
+                fd._write_ytdl_file(ctx)
+        elif not is_fatal(frag_index - 1):
+            fd.report_skip_fragment(frag_index, 'fragment not found')
+        else:
+            ctx['dest_stream'].close()
+            fd.report_error(f'fragment {frag_index} not found, unable to continue')
+            return False
+        return True
+    
+    def buffered(window):
+        return sum(len(future.result() or b'') for _, future in window
+                   if future.done() and not future.exception())
+    
+    pending = iter(fragments)
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fragment') as pool:
+        try:
+            while True:
+                while len(window) < workers and (not window or buffered(window) < buffer_limit):
+                    fragment = next(pending, None)
+                    if fragment is None:
+                        break
+                    window.append((fragment, pool.submit(contextvars.copy_context().run, fetch, fragment)))
+                if not window:
+                    break
+                # Um erro em qualquer fragmento (StallDetected, fragmento obrigatório) interrompe já
+                head_fragment, head = window[0]
+                while not head.done():
+                    failed = next((f for _, f in window if f.done() and f.exception()), None)
+                    if failed:
+                        failed.result()
+                    wait([f for _, f in window if not f.done()], return_when=FIRST_COMPLETED)
+                window.popleft()
+                if not append(head_fragment, head.result()):
+                    return False
+        finally:
+            stop.set()
+            for _, future in window:
+                future.cancel()
+    
+    if finish_func is not None:
+        ctx['dest_stream'].write(finish_func())
+        ctx['dest_stream'].flush()
+    return fd._finish_frag_download(ctx, info_dict)
+
+
+def _install_fragment_downloader():
+    """
+    Faz os downloaders de fragmentos do yt-dlp (HLS e DASH nativos) usarem _download_fragments_in_order
+    
+    Só vale quando params[FRAGMENT_BUFFER_PARAM] está definido e há mais de
+    um fragmento simultâneo; transmissões ao vivo e downloads de vários
+    formatos em paralelo continuam no caminho original.
+    """
+    from yt_dlp.downloader.fragment import FragmentFD
+    original = FragmentFD.download_and_append_fragments
+    if getattr(original, 'in_order', False):
+        return
+    
+    def download_and_append_fragments(self, ctx, fragments, info_dict, *, is_fatal=(lambda idx: False),
+                                      pack_func=(lambda content, idx: content), finish_func=None,
+                                      tpe=None, interrupt_trigger=(True, )):
+        workers = self.params.get('concurrent_fragment_downloads') or 1
+        if (not self.params.get(FRAGMENT_BUFFER_PARAM) or workers < 2 or tpe is not None
+                or ctx.get('live') or ctx.get('max_progress', 1) > 1):
+            return original(self, ctx, fragments, info_dict, is_fatal=is_fatal, pack_func=pack_func,
+                            finish_func=finish_func, tpe=tpe, interrupt_trigger=interrupt_trigger)
+        return _download_fragments_in_order(self, ctx, fragments, info_dict, is_fatal, pack_func, finish_func)
+    
+    download_and_append_fragments.in_order = True
+    FragmentFD.download_and_append_fragments = download_and_append_fragments
+
+
+# Variável de ambiente com os algoritmos de checksum ("sha256", "sha256,xxh64" ou "none")
+CHECKSUM_ENV_VAR = 'CONVERSOR_CHECKSUMS'
+DEFAULT_CHECKSUMS = ('sha256',)
+CHECKSUM_LABELS = {'sha256': 'SHA-256', 'xxh64': 'XXH64'}
+# Chave, nos parâmetros do yt-dlp, dos objetos que acompanham cada bloco gravado (checksums, upload)
+WRITE_TAPS_PARAM = 'conversor_write_taps'
+# Tamanho dos blocos lidos quando um arquivo precisa ser relido (retomada ou pós-processamento)
+CHECKSUM_READ_BLOCK = 1024 * 1024
+
+
+def checksum_algorithms():
+    """
+    Algoritmos configurados em CONVERSOR_CHECKSUMS
+    
+    O xxh64 é opcional: sem o módulo xxhash ele é ignorado (e o SHA-256 é usado).
+    
+    Raises:
+        ValueError: Algoritmo desconhecido
+    """
+    value = os.environ.get(CHECKSUM_ENV_VAR)
+    if value is None:
+        return DEFAULT_CHECKSUMS
+    algorithms = [name.strip().lower() for name in value.split(',') if name.strip()]
+    if algorithms == ['none']:
+        return ()
+    for name in algorithms:
+        if name not in ('sha256', 'xxh64'):
+            raise ValueError(f"algoritmo de checksum desconhecido: {name} (use sha256, xxh64 ou none)")
+    if 'xxh64' in algorithms:
+        try:
+            import xxhash  # noqa: F401
+        except ImportError:
+            algorithms = [name for name in algorithms if name != 'xxh64'] or ['sha256']
+    return tuple(algorithms)
+
+
+def new_hashers(algorithms):
+    """Cria um objeto de hash para cada algoritmo"""
+    import hashlib
+    hashers = {}
+    for name in algorithms:
+        if name == 'xxh64':
+            import xxhash
+            hashers[name] = xxhash.xxh64()
+        else:
+            hashers[name] = hashlib.new(name)
+    return hashers
+
+
+def hash_file(path, algorithms):
+    """Calcula os digests relendo um arquivo inteiro (só quando não há digest calculado no download)"""
+    hashers = new_hashers(algorithms)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_READ_BLOCK), b''):
+            for hasher in hashers.values():
+                hasher.update(block)
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+class TeeStream:
+    """Arquivo de destino do yt-dlp que repassa cada bloco gravado a um callback"""
+    
+    def __init__(self, stream, on_write):
+        self._stream = stream
+        self._on_write = on_write
+    
+    def write(self, data):
+        self._on_write(data)
+        return self._stream.write(data)
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ChecksumRecorder:
+    """
+    Calcula os checksums dos arquivos enquanto o yt-dlp os grava
+    
+    O arquivo de destino aberto pelo downloader (HTTP ou de fragmentos) é
+    embrulhado em um TeeStream; ao retomar um .part, só o trecho já
+    existente é relido. Quando o download termina, o digest fica associado
+    ao arquivo final junto com seu tamanho e data. Se um pós-processador
+    (junção de formatos, conversão para MP3) gerar outro arquivo, digest_for
+    relê o resultado uma vez.
+    """
+    
+    def __init__(self, algorithms=None):
+        self.algorithms = tuple(algorithms) if algorithms is not None else checksum_algorithms()
+        self._lock = threading.Lock()
+        self._open = {}
+        self._finished = {}
+    
+    def wrap(self, stream, filename, open_mode):
+        """Embrulha o arquivo aberto pelo downloader (modo 'wb' ou 'ab')"""
+        hashers = new_hashers(self.algorithms)
+        if 'a' in open_mode:
+            # Retomada: os hashes precisam do trecho que já estava no .part
+            with open(filename, 'rb') as f:
+                for block in iter(lambda: f.read(CHECKSUM_READ_BLOCK), b''):
+                    for hasher in hashers.values():
+                        hasher.update(block)
+        with self._lock:
+            self._open[os.path.abspath(filename)] = hashers
+        return TeeStream(stream, lambda data: [hasher.update(data) for hasher in hashers.values()])
+    
+    def progress_hook(self, d):
+        """Hook de progresso: associa os hashes ao arquivo final quando o download termina"""
+        if d['status'] != 'finished' or not d.get('filename'):
+            return
+        filename = os.path.abspath(d['filename'])
+        with self._lock:
+            for candidate in (d.get('tmpfilename'), f"{d['filename']}.part", d['filename']):
+                hashers = self._open.pop(os.path.abspath(candidate), None) if candidate else None
+                if hashers is not None:
+                    stat = os.stat(filename)
+                    self._finished[filename] = ({name: h.hexdigest() for name, h in hashers.items()},
+                                                (stat.st_size, stat.st_mtime_ns))
+                    return
+    
+    def digest_for(self, filename):
+        """
+        Digests do arquivo final
+        
+        Returns:
+            tuple: (dict algoritmo → hex, True se calculado durante o download)
+        """
+        entry = self._finished.get(os.path.abspath(filename))
+        stat = os.stat(filename)
+        if entry and entry[1] == (stat.st_size, stat.st_mtime_ns):
+            return entry[0], True
+        return hash_file(filename, self.algorithms), False
+
+
+def _install_write_taps():
+    """
+    Faz o sanitize_open dos downloaders do yt-dlp embrulhar o destino com os taps do download
+    
+    Cada tap (ChecksumRecorder, S3UploadSession) tem wrap(stream, filename,
+    open_mode) e devolve um objeto com write(); eles são aplicados em ordem.
+    """
+    from yt_dlp.downloader.common import FileDownloader
+    original = FileDownloader.sanitize_open
+    if getattr(original, 'write_taps', False):
+        return
+    
+    def sanitize_open(self, filename, open_mode):
+        stream, filename = original(self, filename, open_mode)
+        taps = self.params.get(WRITE_TAPS_PARAM)
+        if (taps and filename != '-' and ('w' in open_mode or 'a' in open_mode)
+                and not filename.endswith('.ytdl')):
+            for tap in taps:
+                stream = tap.wrap(stream, filename, open_mode)
+        return stream, filename
+    
+    sanitize_open.write_taps = True
+    FileDownloader.sanitize_open = sanitize_open
+
+
+def write_checksum_sidecars(filename, digests):
+    """Grava <arquivo>.sha256 (e .xxh64) no formato de sha256sum/xxhsum, para conferência com -c"""
+    for name, digest in digests.items():
+        with open(f"{filename}.{name}", 'w', encoding='utf-8') as f:
+            f.write(f"{digest}  {os.path.basename(filename)}\n")
+
+
+# Destino dos arquivos finais no formato s3://bucket/prefixo (também via --sink)
+SINK_ENV_VAR = 'CONVERSOR_SINK'
+# Tamanho de cada parte do upload multipart (o S3 exige ao menos 5 MiB em todas, exceto na última)
+S3_PART_SIZE = 8 * 1024 * 1024
+# Partes na memória aguardando envio, por arquivo; acima disso o download espera o upload
+S3_MAX_PENDING_PARTS = 4
+# Partes enviadas em paralelo por download
+S3_UPLOAD_WORKERS = 2
+
+
+def sign_v4(method, url, headers, payload_hash, access_key, secret_key, region, amz_date, service='s3'):
+    """
+    Assinatura AWS Signature Version 4 de uma requisição
+    
+    Args:
+        url: URL completa, com o caminho e a query já codificados
+        headers: Cabeçalhos assinados (o Host é acrescentado a partir da URL)
+        payload_hash: SHA-256 do corpo em hexadecimal
+        amz_date: Data no formato AAAAMMDDTHHMMSSZ (a mesma do cabeçalho x-amz-date)
+    
+    Returns:
+        str: Valor do cabeçalho Authorization
+    """
+    import hashlib
+    import hmac
+    from urllib.parse import urlsplit, parse_qsl, quote
+    
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    canonical_query = '&'.join(f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in query)
+    signed = {name.lower(): ' '.join(str(value).split()) for name, value in headers.items()}
+    signed['host'] = parts.netloc
+    names = sorted(signed)
+    canonical_request = '\n'.join([
+        method, parts.path or '/', canonical_query,
+        ''.join(f"{name}:{signed[name]}\n" for name in names), ';'.join(names), payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = f"AWS4{secret_key}".encode()
+    for part in (amz_date[:8], region, service, 'aws4_request'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    return (f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}")
+
+
+class S3Client:
+    """
+    Cliente mínimo da API S3 (AWS, MinIO, R2...) com URLs no estilo de caminho
+    
+    Só as operações usadas pelo S3Sink: PUT de objeto e o ciclo do upload
+    multipart (criar, enviar parte, concluir, abortar).
+    """
+    
+    def __init__(self, endpoint, bucket, access_key, secret_key, region='us-east-1'):
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.endpoint = endpoint.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.session = requests.Session()
+        self.session.mount(self.endpoint, HTTPAdapter(pool_maxsize=S3_UPLOAD_WORKERS * 4))
+    
+    def request(self, method, key, query=None, data=b''):
+        """Envia uma requisição assinada; respostas de erro viram SinkError"""
+        import hashlib
+        import requests
+        from datetime import datetime, timezone
+        from urllib.parse import quote, urlencode
+        
+        url = f"{self.endpoint}/{quote(self.bucket)}/{quote(key, safe='/-_.~')}"
+        if query:
+            url += '?' + urlencode(query, quote_via=quote, safe='-_.~')
+        payload_hash = hashlib.sha256(data).hexdigest()
+        amz_date = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        headers = {'x-amz-date': amz_date, 'x-amz-content-sha256': payload_hash}
+        headers['Authorization'] = sign_v4(method, url, headers, payload_hash, self.access_key,
+                                           self.secret_key, self.region, amz_date)
+        try:
+            response = self.session.request(method, url, data=data, headers=headers, timeout=120)
+        except requests.RequestException as e:
+            raise SinkError(f"{method} s3://{self.bucket}/{key}: {e}") from e
+        # O CompleteMultipartUpload pode responder 200 com um <Error> no corpo
+        if response.status_code >= 300 or b'<Error>' in response.content[:256]:
+            raise SinkError(f"{method} s3://{self.bucket}/{key}: HTTP {response.status_code} "
+                            f"{_xml_text(response.content, 'Code') or ''}".rstrip())
+        return response
+    
+    def put_object(self, key, data):
+        self.request('PUT', key, data=data)
+    
+    def create_multipart_upload(self, key):
+        """Inicia um upload multipart e devolve o UploadId"""
+        response = self.request('POST', key, {'uploads': ''})
+        upload_id = _xml_text(response.content, 'UploadId')
+        if not upload_id:
+            raise SinkError(f"resposta sem UploadId ao iniciar o upload de s3://{self.bucket}/{key}")
+        return upload_id
+    
+    def upload_part(self, key, upload_id, number, data):
+        """Envia uma parte e devolve seu ETag"""
+        response = self.request('PUT', key, {'partNumber': str(number), 'uploadId': upload_id}, data)
+        return response.headers.get('ETag', '')
+    
+    def complete_multipart_upload(self, key, upload_id, etags):
+        from xml.sax.saxutils import escape
+        body = ''.join(f"<Part><PartNumber>{number}</PartNumber><ETag>{escape(etag)}</ETag></Part>"
+                       for number, etag in enumerate(etags, 1))
+        self.request('POST', key, {'uploadId': upload_id},
+                     f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode())
+    
+    def abort_multipart_upload(self, key, upload_id):
+        self.request('DELETE', key, {'uploadId': upload_id})
+
+
+def _xml_text(content, tag):
+    """Texto do primeiro elemento com o nome (sem namespace) em uma resposta XML do S3"""
+    import xml.etree.ElementTree as ET
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag.rsplit('}', 1)[-1] == tag:
+            return element.text
+    return None
+
+
+class StreamingUpload:
+    """
+    Upload multipart de um arquivo, alimentado à medida que o download grava
+    
+    Os blocos se acumulam até formar uma parte, que é enviada em segundo plano
+    enquanto o download continua. No máximo S3_MAX_PENDING_PARTS partes ficam
+    na memória: se o envio for mais lento que o download, feed() espera.
+    Arquivos menores que uma parte viram um único PUT.
+    """
+    
+    def __init__(self, client, key, executor, part_size=S3_PART_SIZE, max_pending=S3_MAX_PENDING_PARTS):
+        self.client = client
+        self.key = key
+        self.part_size = part_size
+        self.size = 0
+        self._executor = executor
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._slots = threading.Semaphore(max_pending)
+    
+    def feed(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._send(part)
+    
+    def _send(self, data):
+        # Uma parte que já falhou interrompe o download em vez de esperar o fim
+        for future in self._parts:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(self.key)
+        self._slots.acquire()
+        self._parts.append(self._executor.submit(self._upload_part, len(self._parts) + 1, data))
+    
+    def _upload_part(self, number, data):
+        try:
+            return self.client.upload_part(self.key, self._upload_id, number, data)
+        finally:
+            self._slots.release()
+    
+    def complete(self):
+        """Envia o que falta e conclui o upload (em caso de erro, aborta)"""
+        try:
+            if self._upload_id is None:
+                self.client.put_object(self.key, bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._send(bytes(self._buffer))
+                etags = [future.result() for future in self._parts]
+                self.client.complete_multipart_upload(self.key, self._upload_id, etags)
+        except BaseException:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+    
+    def abort(self):
+        """Descarta as partes já enviadas (o objeto não chega a existir)"""
+        from concurrent.futures import wait
+        for future in self._parts:
+            future.cancel()
+        wait(self._parts)
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(self.key, self._upload_id)
+            except SinkError:
+                pass  # o bucket pode expirar uploads incompletos por regra de ciclo de vida
+            self._upload_id = None
+
+
+class S3UploadSession:
+    """
+    Uploads de um download para um S3Sink
+    
+    É um tap de escrita (ver _install_write_taps): cada arquivo aberto pelo
+    downloader ganha um StreamingUpload com a chave do arquivo final. Se o
+    yt-dlp reabrir o .part do zero o upload recomeça; numa retomada ('ab')
+    ele continua quando o tamanho já enviado bate com o do arquivo. Em
+    publish(), o upload só é aproveitado se o arquivo final for exatamente o
+    que foi gravado; se um pós-processador o substituiu, o resultado é
+    enviado do disco. As chaves repetem a subpasta do layout (subdir).
+    """
+    
+    def __init__(self, sink):
+        self.sink = sink
+        self.subdir = ''
+        self._executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix='s3-upload')
+        self._lock = threading.Lock()
+        self._uploads = {}
+        self._finished = {}
+    
+    def wrap(self, stream, filename, open_mode):
+        """Embrulha o arquivo aberto pelo downloader (modo 'wb' ou 'ab')"""
+        final = os.path.abspath(filename[:-len('.part')] if filename.endswith('.part') else filename)
+        existing = os.path.getsize(filename) if 'a' in open_mode else 0
+        with self._lock:
+            upload = self._uploads.get(final)
+            if upload is None or upload.size != existing:
+                if upload is not None:
+                    upload.abort()
+                upload = StreamingUpload(self.sink.client, self.sink.key_for(final, self.subdir), self._executor,
+                                         self.sink.part_size)
+                self._uploads[final] = upload
+                if existing:
+                    with open(filename, 'rb') as f:
+                        for block in iter(lambda: f.read(CHECKSUM_READ_BLOCK), b''):
+                            upload.feed(block)
+        return TeeStream(stream, upload.feed)
+    
+    def progress_hook(self, d):
+        """Hook de progresso: guarda tamanho e data do arquivo final quando o download termina"""
+        if d['status'] == 'finished' and d.get('filename') and os.path.isfile(d['filename']):
+            stat = os.stat(d['filename'])
+            with self._lock:
+                self._finished[os.path.abspath(d['filename'])] = (stat.st_size, stat.st_mtime_ns)
+    
+    def publish(self, filename, extra_files=()):
+        """
+        Conclui o envio do arquivo final (e dos arquivos auxiliares, como os .sha256)
+        
+        Returns:
+            tuple: (s3://bucket/chave, True se o conteúdo foi enviado durante o download)
+        """
+        final = os.path.abspath(filename)
+        stat = os.stat(final)
+        with self._lock:
+            upload = self._uploads.pop(final, None)
+            leftovers = list(self._uploads.values())
+            self._uploads.clear()
+        # Formatos intermediários (vídeo e áudio antes da junção) não ficam no bucket
+        for other in leftovers:
+            other.abort()
+        
+        streamed = (upload is not None and upload.size == stat.st_size
+                    and self._finished.get(final) == (stat.st_size, stat.st_mtime_ns))
+        if streamed:
+            upload.complete()
+        else:
+            if upload is not None:
+                upload.abort()
+            self.sink.upload_file(final, self._executor, self.subdir)
+        for path in extra_files:
+            self.sink.upload_file(path, self._executor, self.subdir)
+        
+        if not self.sink.keep_local:
+            for path in (final, *extra_files):
+                os.remove(path)
+        return self.sink.location(self.sink.key_for(final, self.subdir)), streamed
+    
+    def publish_file(self, path, extra_files=(), subdir=''):
+        """Envia um arquivo gerado depois do download (ex: um capítulo), numa subpasta da chave do job"""
+        for name in (path, *extra_files):
+            self.sink.upload_file(name, self._executor, os.path.join(self.subdir, subdir))
+        if not self.sink.keep_local:
+            for name in (path, *extra_files):
+                os.remove(name)
+    
+    def abort(self):
+        with self._lock:
+            uploads = list(self._uploads.values())
+            self._uploads.clear()
+        for upload in uploads:
+            upload.abort()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        self._executor.shutdown(wait=True)
+
+
+class LocalSink:
+    """Destino padrão: os arquivos ficam apenas na pasta de destino"""
+    keep_local = True
+    
+    def session(self):
+        return None
+
+
+class S3Sink:
+    """
+    Destino S3 (AWS, MinIO, R2...) para os arquivos baixados
+    
+    O upload multipart começa junto com o download, então arquivos grandes
+    chegam ao bucket quase ao mesmo tempo em que terminam de baixar.
+    
+    Args:
+        url: s3://bucket/prefixo
+        endpoint: URL do serviço (padrão: AWS_ENDPOINT_URL ou o endpoint regional da AWS)
+        access_key, secret_key: Credenciais (padrão: AWS_ACCESS_KEY_ID e AWS_SECRET_ACCESS_KEY)
+        region: Região da assinatura (padrão: AWS_REGION, AWS_DEFAULT_REGION ou us-east-1)
+        keep_local: Mantém a cópia na pasta de destino depois do envio
+        part_size: Tamanho das partes do upload multipart
+    
+    Raises:
+        ValueError: URL inválida ou credenciais ausentes
+    """
+    
+    def __init__(self, url, endpoint=None, access_key=None, secret_key=None, region=None,
+                 keep_local=True, part_size=S3_PART_SIZE):
+        from urllib.parse import urlsplit
+        
+        parts = urlsplit(url)
+        if parts.scheme != 's3' or not parts.netloc:
+            raise ValueError(f"destino inválido: {url} (use s3://bucket/prefixo)")
+        self.bucket = parts.netloc
+        self.prefix = parts.path.strip('/')
+        region = region or os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+        endpoint = endpoint or os.environ.get('AWS_ENDPOINT_URL') or f"https://s3.{region}.amazonaws.com"
+        access_key = access_key or os.environ.get('AWS_ACCESS_KEY_ID')
+        secret_key = secret_key or os.environ.get('AWS_SECRET_ACCESS_KEY')
+        if not (access_key and secret_key):
+            raise ValueError("credenciais do S3 ausentes: defina AWS_ACCESS_KEY_ID e AWS_SECRET_ACCESS_KEY")
+        self.client = S3Client(endpoint, self.bucket, access_key, secret_key, region)
+        self.keep_local = keep_local
+        self.part_size = part_size
+    
+    def key_for(self, path, subdir=''):
+        return '/'.join(filter(None, [self.prefix, subdir.replace(os.sep, '/'), os.path.basename(path)]))
+    
+    def location(self, key):
+        return f"s3://{self.bucket}/{key}"
+    
+    def session(self):
+        return S3UploadSession(self)
+    
+    def upload_file(self, path, executor, subdir=''):
+        """Envia um arquivo já pronto, lendo-o do disco"""
+        upload = StreamingUpload(self.client, self.key_for(path, subdir), executor, self.part_size)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.part_size), b''):
+                upload.feed(block)
+        upload.complete()
+
+
+_output_sink = LocalSink()
+
+
+def get_output_sink():
+    """Destino dos arquivos baixados (pasta local ou bucket S3)"""
+    return _output_sink
+
+
+def configure_output_sink(sink=None):
+    """Substitui o destino dos próximos downloads (None = só a pasta local)"""
+    global _output_sink
+    _output_sink = sink or LocalSink()
+    return _output_sink
+
+
+# Pasta rápida (SSD local, tmpfs) para .part, fragmentos, junções e conversões (também via --scratch)
+SCRATCH_ENV_VAR = 'CONVERSOR_SCRATCH_DIR'
+# Blocos da cópia para o destino quando ele está em outro sistema de arquivos (ex: compartilhamento de rede)
+PUBLISH_COPY_BLOCK = 8 * 1024 * 1024
+
+
+def get_scratch_dir():
+    """Pasta temporária configurada em CONVERSOR_SCRATCH_DIR, ou None (grava direto no destino)"""
+    return os.environ.get(SCRATCH_ENV_VAR) or None
+
+
+def scratch_dir_for(job_id):
+    """
+    Pasta temporária de um job (criada se preciso), ou None sem pasta rápida configurada
+    
+    O nome depende só do job: as retentativas e reaberturas do mesmo job
+    encontram o .part anterior e continuam de onde pararam.
+    """
+    scratch = get_scratch_dir()
+    if not scratch:
+        return None
+    path = os.path.join(scratch, f"job-{job_id}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def configure_scratch_dir(path):
+    """
+    Define a pasta temporária dos próximos downloads (vale também para os workers filhos)
+    
+    Raises:
+        ValueError: Se a pasta não puder ser criada ou não aceitar escrita
+    """
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        raise ValueError(f"pasta temporária inválida: {path} ({e.strerror})") from e
+    if not os.access(path, os.W_OK):
+        raise ValueError(f"sem permissão de escrita na pasta temporária: {path}")
+    os.environ[SCRATCH_ENV_VAR] = os.path.abspath(path)
+
+
+def discard_scratch(job_id):
+    """Apaga a pasta temporária do job (no fim do job, com ou sem sucesso)"""
+    import shutil
+    if get_scratch_dir():
+        shutil.rmtree(os.path.join(get_scratch_dir(), f"job-{job_id}"), ignore_errors=True)
+
+
+def publish_output(path, dest_dir, extra_files=()):
+    """
+    Move os arquivos prontos da pasta temporária para o destino
+    
+    No mesmo sistema de arquivos basta um os.replace. Em outro, cada arquivo
+    é copiado com o espaço pré-alocado para um nome oculto no destino e só
+    então renomeado: quem observa a pasta nunca vê um arquivo pela metade.
+    
+    Returns:
+        str: Caminho final do arquivo principal
+    """
+    import errno
+    
+    os.makedirs(dest_dir, exist_ok=True)
+    published = []
+    for source in (path, *extra_files):
+        target = os.path.join(dest_dir, os.path.basename(source))
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            _copy_preallocated(source, target)
+            os.remove(source)
+        published.append(target)
+    return published[0]
+
+
+def _copy_preallocated(source, target):
+    """Cópia atômica entre sistemas de arquivos: pré-aloca, copia, fsync e renomeia"""
+    import shutil
+    
+    temp = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.{os.getpid()}.tmp")
+    size = os.path.getsize(source)
+    try:
+        with open(source, 'rb') as src, open(temp, 'wb') as dst:
+            if size and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(dst.fileno(), 0, size)
+                except OSError:
+                    pass  # sistemas de arquivos sem suporte (alguns SMB/NFS) copiam sem pré-alocar
+            shutil.copyfileobj(src, dst, PUBLISH_COPY_BLOCK)
+            dst.flush()
+            os.fsync(dst.fileno())
+        try:
+            # Mantém a data de modificação que o yt-dlp aplicou (Last-Modified)
+            shutil.copystat(source, temp)
+        except OSError:
+            pass
+        os.replace(temp, target)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+
+# Organização da pasta de destino: "flat", "hash", "date" ou "uploader" (também via --layout)
+LAYOUT_ENV_VAR = 'CONVERSOR_LAYOUT'
+OUTPUT_LAYOUTS = ('flat', 'hash', 'date', 'uploader')
+# Índice dos caminhos já atribuídos, gravado na raiz da pasta de destino
+PATH_INDEX_FILENAME = '.conversor-index.db'
+# Sufixos (-2, -3...) tentados para um nome ocupado antes de desistir
+MAX_NAME_SUFFIX = 1000
+
+
+def get_output_layout():
+    """Layout configurado em CONVERSOR_LAYOUT, ou None (pasta única com os nomes do yt-dlp)"""
+    return (os.environ.get(LAYOUT_ENV_VAR) or '').strip().lower() or None
+
+
+def configure_output_layout(layout):
+    """
+    Define o layout da pasta de destino dos próximos downloads (vale também para os workers filhos)
+    
+    Raises:
+        ValueError: Se o layout não existir
+    """
+    if layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"layout inválido: {layout!r} (use {', '.join(OUTPUT_LAYOUTS)})")
+    os.environ[LAYOUT_ENV_VAR] = layout
+
+
+def media_key(info, url):
+    """Identidade da mídia no índice: extrator e id do vídeo, ou a URL quando não há id"""
+    if info.get('id'):
+        return f"{info.get('extractor_key') or info.get('ie_key') or 'Generic'}:{info['id']}"
+    return url
+
+
+def layout_subdir(layout, info, key):
+    """
+    Subpasta (relativa à raiz do destino) de uma mídia no layout
+    
+    hash: dois níveis com o início do SHA-1 da chave (ab/cd), o que mantém
+    cada pasta com poucas centenas de arquivos mesmo com milhões no total;
+    date: ano/mês da publicação (ou de hoje); uploader: nome do canal.
+    """
+    import hashlib
+    if layout == 'hash':
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(digest[:2], digest[2:4])
+    if layout == 'date':
+        date = str(info.get('upload_date') or info.get('release_date') or '')
+        if not re.fullmatch(r'\d{8}', date):
+            date = time.strftime('%Y%m%d')
+        return os.path.join(date[:4], date[4:6])
+    if layout == 'uploader':
+        name = info.get('uploader') or info.get('channel') or info.get('uploader_id')
+        return yt_dlp.utils.sanitize_filename(name or '') or 'desconhecido'
+    return ''
+
+
+class PathIndex:
+    """
+    Caminhos atribuídos na pasta de destino, por mídia
+    
+    Um SQLite na raiz do destino guarda, para cada chave (mídia, tipo e nome
+    pedido), o caminho relativo que ela recebeu. Procurar onde uma mídia
+    está ou se um nome está livre é uma consulta pela chave, sem listar
+    pastas com centenas de milhares de arquivos. O mesmo job repetido
+    recebe o mesmo caminho; uma mídia diferente com o mesmo nome recebe
+    "-2", "-3"... A restrição UNIQUE no caminho resolve disputas entre
+    threads e processos que gravam no mesmo destino.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS paths (
+            key TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            created_at REAL NOT NULL
+        );
+    """
+    
+    def __init__(self, root):
+        self.root = str(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, PATH_INDEX_FILENAME), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(self.SCHEMA)
+    
+    def lookup(self, key):
+        """Caminho absoluto atribuído à chave, ou None"""
+        with self._lock:
+            row = self._db.execute("SELECT path FROM paths WHERE key = ?", (key,)).fetchone()
+        return os.path.join(self.root, row[0]) if row else None
+    
+    def claim(self, key, subdir, stem, ext):
+        """
+        Atribui à chave um caminho livre na subpasta (ou devolve o que ela já tem)
+        
+        Returns:
+            str: Caminho relativo à raiz ("ab/cd/nome.mp4")
+        
+        Raises:
+            FileExistsError: Se nenhum dos MAX_NAME_SUFFIX nomes estiver livre
+        """
+        with self._lock:
+            for suffix in range(1, MAX_NAME_SUFFIX + 1):
+                row = self._db.execute("SELECT path FROM paths WHERE key = ?", (key,)).fetchone()
+                if row:
+                    return row[0]
+                relative = os.path.join(subdir, f"{stem}.{ext}" if suffix == 1 else f"{stem}-{suffix}.{ext}")
+                if os.path.exists(os.path.join(self.root, relative)):
+                    continue  # arquivo gravado antes do índice ou fora dele
+                try:
+                    self._db.execute("INSERT INTO paths (key, path, created_at) VALUES (?, ?, ?)",
+                                     (key, relative, time.time()))
+                    return relative
+                except sqlite3.IntegrityError:
+                    continue  # outro processo levou o nome (ou a própria chave) agora
+        raise FileExistsError(f"nenhum nome livre para {stem}.{ext} em {os.path.join(self.root, subdir)}")
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_path_indexes = {}
+_path_indexes_lock = threading.Lock()
+
+
+def get_path_index(root):
+    """Índice compartilhado de uma pasta de destino"""
+    root = os.path.abspath(root)
+    with _path_indexes_lock:
+        if root not in _path_indexes:
+            _path_indexes[root] = PathIndex(root)
+        return _path_indexes[root]
+
+
+def parse_rate(value):
+    """Converte '2M', '500K' ou '100000' em bytes/s ('0' ou vazio = sem limite)"""
+    if value in (None, ''):
+        return None
+    rate = yt_dlp.utils.parse_bytes(str(value).strip())
+    if rate is None:
+        raise ValueError(f"Taxa inválida: {value!r}")
+    return rate or None
+
+
+def parse_size(value):
+    """Converte '2G', '500M' ou '100000' em bytes"""
+    size = yt_dlp.utils.parse_bytes(str(value).strip())
+    if size is None:
+        raise ValueError(f"Tamanho inválido: {value!r}")
+    return size
+
+
+def parse_bandwidth_schedule(text):
+    """
+    Lê uma agenda de limites globais no formato "HH:MM-HH:MM=taxa,..."
+    
+    Exemplo: "08:00-18:00=2M,18:00-08:00=0" (0 = sem limite). Faixas que
+    passam da meia-noite são aceitas; fora das faixas vale o limite global.
+    
+    Returns:
+        list: Tuplas (início, fim, taxa) com início e fim em minutos do dia
+    """
+    schedule = []
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        match = re.fullmatch(r'(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})=(\S+)', item)
+        if not match:
+            raise ValueError(f"Faixa de horário inválida: {item!r}")
+        h1, m1, h2, m2 = (int(group) for group in match.groups()[:4])
+        if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59:
+            raise ValueError(f"Faixa de horário inválida: {item!r}")
+        schedule.append((h1 * 60 + m1, h2 * 60 + m2, parse_rate(match.group(5))))
+    return schedule
+
+
+# Rajada máxima (em segundos da taxa alocada) que um download pode gravar sem esperar
+BANDWIDTH_BURST_SECONDS = 0.5
+
+
+class BandwidthLease:
+    """
+    Participação de um download no orçamento de banda (devolvida ao fim do download)
+    
+    É um tap de escrita (ver _install_write_taps): cada bloco gravado passa
+    por um token bucket com a taxa alocada, e a espera segura a leitura do
+    socket. Diferente do 'ratelimit' do yt-dlp, que compara o limite com a
+    média desde o início do arquivo, uma taxa nova vale a partir do bloco
+    seguinte, sem compensar o que foi baixado antes dela.
+    """
+    
+    def __init__(self, allocator, job_id, params, priority, limit):
+        self.allocator = allocator
+        self.job_id = job_id
+        self.params = params
+        self.priority = max(1, priority)
+        self.limit = limit
+        self.allocated = None
+        self.speed = None
+        self.started = time.monotonic()
+        self._bucket_lock = threading.Lock()
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+    
+    def apply(self, rate):
+        """Troca a taxa do token bucket (vale para o próximo bloco gravado)"""
+        self.allocated = rate
+    
+    def wrap(self, stream, filename, open_mode):
+        return TeeStream(stream, self.throttle)
+    
+    def throttle(self, data):
+        """Espera até o bucket ter fichas para o bloco (a dívida de um bloco é paga com sleep)"""
+        rate = self.allocated
+        if not rate:
+            return
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(rate * BANDWIDTH_BURST_SECONDS, self._tokens + (now - self._refilled) * rate)
+            self._refilled = now
+            self._tokens -= len(data)
+            delay = -self._tokens / rate if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+    
+    def progress_hook(self, d):
+        if d['status'] == 'downloading' and d.get('speed'):
+            self.speed = d['speed']
+        self.allocator.tick()
+
+
+class BandwidthAllocator:
+    """
+    Divide a banda entre todos os downloads em andamento
+    
+    O limite global (ou o da faixa de horário atual) é repartido em
+    proporção à prioridade de cada job, respeitando o limite por job. A
+    parte que um job não consegue usar (limite próprio ou origem lenta) é
+    redistribuída aos outros. A divisão é refeita quando um download começa
+    ou termina, quando muda a faixa de horário e periodicamente durante os
+    downloads.
+    """
+    
+    # Intervalo mínimo entre redistribuições disparadas pelo progresso
+    REALLOCATE_INTERVAL = 5.0
+    # Tempo de download antes de a vazão medida ser usada como demanda do job
+    DEMAND_WARMUP_SECONDS = 10.0
+    
+    def __init__(self, global_limit=None, job_limit=None, schedule=None, clock=None):
+        self.global_limit = global_limit
+        self.job_limit = job_limit
+        self.schedule = schedule or []
+        self._clock = clock
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._last_reallocation = 0.0
+    
+    def current_limit(self):
+        """Limite global em vigor agora (None = sem limite)"""
+        from datetime import datetime
+        now = self._clock() if self._clock else datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            inside = start <= minute < end if start < end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self.global_limit
+    
+    @contextmanager
+    def lease(self, job_id, params, priority=1, limit=None):
+        """
+        Context manager que inscreve um download na divisão de banda
+        
+        Args:
+            job_id: Id do job
+            params: Dicionário params do YoutubeDL do job (o lease entra nos seus taps de escrita)
+            priority: Peso do job na divisão (1 = normal)
+            limit: Limite próprio do job em bytes/s (padrão: o limite por job)
+        """
+        lease = BandwidthLease(self, job_id, params, priority, limit or self.job_limit)
+        taps = params.setdefault(WRITE_TAPS_PARAM, [])
+        taps.append(lease)
+        _install_write_taps()
+        with self._lock:
+            self._leases[job_id] = lease
+            self._reallocate()
+        try:
+            yield lease
+        finally:
+            taps.remove(lease)
+            with self._lock:
+                self._leases.pop(job_id, None)
+                self._reallocate()
+    
+    def tick(self):
+        """Redistribui se o último ajuste foi há mais de REALLOCATE_INTERVAL"""
+        if time.monotonic() - self._last_reallocation < self.REALLOCATE_INTERVAL:
+            return
+        with self._lock:
+            self._reallocate()
+    
+    def allocations(self):
+        with self._lock:
+            return {job_id: lease.allocated for job_id, lease in self._leases.items()}
+    
+    def _demand(self, lease):
+        """Quanto o job consegue usar: seu limite ou, com origem lenta, pouco acima da vazão medida"""
+        demand = lease.limit or float('inf')
+        warmed_up = time.monotonic() - lease.started >= self.DEMAND_WARMUP_SECONDS
+        if warmed_up and lease.speed and lease.allocated and lease.speed < lease.allocated * 0.8:
+            demand = min(demand, lease.speed * 1.2)
+        return demand
+    
+    def _reallocate(self):
+        """Water-filling ponderado pela prioridade (chamar com o lock)"""
+        self._last_reallocation = time.monotonic()
+        total = self.current_limit()
+        leases = list(self._leases.values())
+        if total is None:
+            for lease in leases:
+                lease.apply(lease.limit)
+            return
+        
+        remaining = float(total)
+        open_leases = leases
+        while open_leases:
+            weights = sum(lease.priority for lease in open_leases)
+            capped = [lease for lease in open_leases
+                      if self._demand(lease) <= remaining * lease.priority / weights]
+            if not capped:
+                for lease in open_leases:
+                    lease.apply(remaining * lease.priority / weights)
+                return
+            for lease in capped:
+                demand = self._demand(lease)
+                lease.apply(demand)
+                remaining -= demand
+            open_leases = [lease for lease in open_leases if lease not in capped]
+
+
+_bandwidth_allocator = BandwidthAllocator()
+
+
+def get_bandwidth_allocator():
+    """Alocador de banda compartilhado por todos os downloads do processo"""
+    return _bandwidth_allocator
+
+
+def configure_bandwidth(global_limit=None, job_limit=None, schedule=None):
+    """Substitui os limites de banda (vale para os próximos downloads)"""
+    global _bandwidth_allocator
+    _bandwidth_allocator = BandwidthAllocator(global_limit, job_limit, schedule)
+    return _bandwidth_allocator
+
+
+# Políticas de formato para vídeos MP4 (chave usada no manifesto e na linha de comando)
+FORMAT_POLICIES = {
+    'best': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+    'single': 'best[ext=mp4]/best',
+    '1080p': 'bestvideo[ext=mp4][height<=1080]+bestaudio[ext=m4a]/best[ext=mp4][height<=1080]/best[height<=1080]/best',
+    '720p': 'bestvideo[ext=mp4][height<=720]+bestaudio[ext=m4a]/best[ext=mp4][height<=720]/best[height<=720]/best',
+    '480p': 'bestvideo[ext=mp4][height<=480]+bestaudio[ext=m4a]/best[ext=mp4][height<=480]/best[height<=480]/best',
+}
+
+
+def download_media(url, output_path, download_type, custom_filename=None,
+                   progress_hook=None, log=None, format_policy='best', clip_range=None,
+                   metrics=None, watchdog=None, priority=1):
+    """
+    Baixa um vídeo (MP4) ou extrai o áudio (MP3) de uma URL já limpa
+    
+    Args:
+        url: URL do vídeo (páginas do Streamyard são resolvidas automaticamente)
+        output_path: Pasta de destino (com CONVERSOR_SCRATCH_DIR, só recebe o arquivo pronto;
+            com CONVERSOR_LAYOUT, é a raiz das subpastas)
+        download_type: 'mp4' ou 'mp3'
+        custom_filename: Nome do arquivo sem extensão (opcional)
+        progress_hook: Callback de progresso do yt-dlp (opcional)
+        log: Função que recebe mensagens de andamento (opcional)
+        format_policy: Chave de FORMAT_POLICIES usada para vídeos MP4
+        clip_range: Tupla (início, fim) em segundos para baixar só um trecho (opcional)
+        metrics: JobMetrics que recebe os tempos de cada etapa (opcional)
+        watchdog: StallWatchdog que reabre conexões lentas (padrão: limites globais)
+        priority: Peso do job na divisão de banda entre downloads simultâneos
+    
+    Returns:
+        str: Caminho do arquivo final (ou s3://bucket/chave, se o destino não mantém cópia local)
+    
+    Raises:
+        StreamyardExtractionError: Se o link do Streamyard não puder ser extraído
+        SinkError: Se o envio para o destino S3 falhar
+        Exception: Erros do yt-dlp são repassados sem tratamento
+    """
+    log = log or (lambda message: None)
+    metrics = metrics or JobMetrics(url=url, download_type=download_type)
+    watchdog = watchdog or StallWatchdog()
+    # Com uma pasta rápida, tudo é gravado nela e só o resultado vai para o destino
+    final_dir = output_path
+    work_dir = scratch_dir_for(metrics.job_id)
+    if work_dir:
+        output_path = work_dir
+    algorithms = checksum_algorithms()
+    checksums = ChecksumRecorder(algorithms) if algorithms else None
+    sink = get_output_sink()
+    upload = sink.session()
+    reservation = get_disk_space().reservation(metrics.job_id)
+    taps = [tap for tap in (checksums, upload) if tap is not None]
+    # Vaga do host só na extração e no início das transferências (ver run_with_retry)
+    limiter = get_host_limiter(host_key(url))
+    
+    # Verifica se é um link do Streamyard e extrai o .mp4 automaticamente
+    url_to_download = url
+    is_streamyard = 'streamyard.com' in url.lower()
+    
+    if is_streamyard and '.mp4' not in url.lower():
+        log("🔍 Detectado link do Streamyard! Extraindo URL do vídeo...")
+        with metrics.stage('streamyard_resolve', span='extract_streamyard_url'), limiter.slot():
+            extracted_url = extract_streamyard_url(url)
+        
+        if not extracted_url:
+            raise StreamyardExtractionError()
+        
+        url_to_download = extracted_url
+        log(f"✅ URL do vídeo extraída com sucesso!")
+        log(f"📡 Vídeo: {extracted_url[:80]}...")
+    
+    # Configurações base do yt-dlp com melhor compatibilidade
+    ydl_opts = {
+        'progress_hooks': [metrics.progress_hook] + ([progress_hook] if progress_hook else [])
+                          + ([checksums.progress_hook] if checksums else [])
+                          + ([upload.progress_hook] if upload else [])
+                          + ([reservation.progress_hook] if reservation else []) + [watchdog.progress_hook],
+        'postprocessor_hooks': [metrics.postprocessor_hook],
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,  # O progresso é reportado pelos hooks, não pelo console
+        'noplaylist': True,  # --no-playlist
+        'socket_timeout': 30,
+        'retries': 3,
+        'fragment_retries': 5,
+        # HLS/DASH: fragmentos em paralelo, gravados em ordem (ver _install_fragment_downloader)
+        'concurrent_fragment_downloads': get_fragment_workers(),
+        FRAGMENT_BUFFER_PARAM: FRAGMENT_BUFFER_BYTES,
+        'buffersize': STALL_READ_BLOCK_SIZE,
+        'noresizebuffer': True,
+        # Os downloaders calculam os checksums e enviam ao destino enquanto gravam (ver _install_write_taps)
+        WRITE_TAPS_PARAM: taps,
+        # Configurações para evitar bloqueio de bot e erro 403
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android', 'ios'],  # Usa clientes móveis mais confiáveis
+            }
+        },
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Linux; Android 11; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.120 Mobile Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Cache-Control': 'max-age=0',
+        },
+        # Configurações de cookies para contornar detecção
+        'cookiefile': None,
+        'nocheckcertificate': True,
+    }
+    
+    # Baixa apenas um trecho do vídeo (ex: --download-sections "*10-70")
+    if clip_range:
+        ydl_opts.update({
+            'download_ranges': yt_dlp.utils.download_range_func(None, [clip_range]),
+            'force_keyframes_at_cuts': True,
+        })
+    
+    # Nome do arquivo sem extensão, decidido uma única vez (None = título do vídeo)
+    if custom_filename:
+        stem = custom_filename
+    elif is_streamyard:
+        # Para Streamyard, usa um nome genérico se não tiver custom
+        from datetime import datetime
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = f"streamyard_audio_{timestamp}" if download_type == 'mp3' else f"streamyard_{timestamp}"
+    else:
+        stem = None
+    output_template = os.path.join(output_path, f"{stem}.%(ext)s" if stem else '%(title)s.%(ext)s')
+    
+    # Configurações específicas por tipo de download
+    if download_type == 'mp4':
+        # Parâmetros: -f "bv*[ext=mp4]+ba[ext=m4a]/mp4" --merge-output-format mp4 --no-playlist
+        ydl_opts.update({
+            'format': FORMAT_POLICIES.get(format_policy or 'best', FORMAT_POLICIES['best']),
+            'outtmpl': output_template,
+            'merge_output_format': 'mp4',
+        })
+        log("Iniciando download do vídeo em MP4...")
+        
+    elif download_type == 'mp3':
+        # Parâmetros: -f bestaudio --no-playlist; a conversão, as tags e a capa ficam com o SinglePassPP
+        ydl_opts.update({
+            'format': 'bestaudio',
+            'outtmpl': output_template,
+        })
+        log("Iniciando extração de áudio em MP3...")
+    
+    # Extração do MP3, tags, capa e loudness numa única execução do FFmpeg (ver SinglePassPP)
+    loudness_target = get_loudness_target()
+    single_pass = download_type == 'mp3' or loudness_target is not None
+    if single_pass:
+        ydl_opts['writethumbnail'] = True
+    
+    if taps:
+        _install_write_taps()
+    _install_fragment_downloader()
+    
+    # Executa o download (extração e download separados para medir cada etapa);
+    # se algo falhar, a sessão de upload aborta os envios em andamento
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl, (upload or nullcontext()):
+        if single_pass:
+            ydl.add_post_processor(SinglePassPP(ydl, download_type, loudness_target, get_loudness_cache()))
+        if hedged_extraction_enabled() and host_key(url_to_download) == 'youtube.com':
+            with metrics.stage('extraction', span='hedged_extract_info'), limiter.slot():
+                info, client = hedged_extract_info(url_to_download, ydl_opts, log=log)
+            log(f"⚡ Extração concluída com o player_client {','.join(client)}")
+        else:
+            with metrics.stage('extraction', span='extract_info'), limiter.slot():
+                info = ydl.extract_info(url_to_download, download=False, process=False)
+        metrics.media_id = info.get('id')
+        metrics.title = info.get('title')
+        
+        # Com um layout, a subpasta e um nome livre saem do índice do destino
+        layout = get_output_layout()
+        if layout:
+            key = media_key(info, url)
+            name = stem or yt_dlp.utils.sanitize_filename(info.get('title') or info.get('id') or 'video')
+            relative = get_path_index(final_dir).claim(f"{key}|{download_type}|{custom_filename or ''}",
+                                                       layout_subdir(layout, info, key), name, download_type)
+            subdir, stem = os.path.dirname(relative), os.path.splitext(os.path.basename(relative))[0]
+            if work_dir:
+                final_dir = os.path.join(final_dir, subdir)
+            else:
+                output_path = os.path.join(output_path, subdir)
+            if upload:
+                upload.subdir = subdir
+            ydl.params['outtmpl'] = {'default': os.path.join(output_path, f"{stem.replace('%', '%%')}.%(ext)s")}
+        
+        metrics.mark_download_start()
+        with get_bandwidth_allocator().lease(metrics.job_id, ydl.params, priority) as lease:
+            ydl.add_progress_hook(lease.progress_hook)
+            watchdog.lease = lease
+            try:
+                info = _download_with_stall_restarts(ydl, info, url_to_download, watchdog, metrics, log, limiter)
+            finally:
+                watchdog.lease = None
+        
+        # Determina o nome do arquivo final
+        if stem:
+            filename = os.path.join(output_path, f"{stem}.{download_type}")
+        else:
+            # Usa o nome que o yt-dlp gerou
+            filename = ydl.prepare_filename(info)
+            # Para MP3, o nome do arquivo muda após a conversão
+            if download_type == 'mp3':
+                filename = os.path.splitext(filename)[0] + '.mp3'
+        
+        if checksums and os.path.isfile(filename):
+            digests, streamed = checksums.digest_for(filename)
+            metrics.checksums = digests
+            write_checksum_sidecars(filename, digests)
+            source = "calculado durante o download" if streamed else "calculado após o pós-processamento"
+            log(f"🔐 {', '.join(f'{CHECKSUM_LABELS[name]}: {digest}' for name, digest in digests.items())} ({source})")
+        
+        # Um arquivo por capítulo em <nome>/, ao lado do arquivo completo
+        chapter_files = []
+        if chapter_split_enabled() and info.get('chapters') and os.path.isfile(filename):
+            ffmpeg = FFmpegPostProcessor(ydl)
+            if not ffmpeg.available:
+                log("⚠️ FFmpeg não encontrado: o arquivo não foi separado por capítulos")
+            else:
+                with metrics.stage('chapters', span='split_chapters'):
+                    chapter_files = split_chapters(
+                        filename, info['chapters'], download_type, ffmpeg.executable,
+                        ffmpeg.probe_executable if ffmpeg.probe_available else None,
+                        duration=info.get('duration'), log=log)
+                for chapter_file in chapter_files:
+                    if algorithms:
+                        write_checksum_sidecars(chapter_file, hash_file(chapter_file, algorithms))
+                log(f"📑 {len(chapter_files)} capítulos em {os.path.basename(os.path.splitext(filename)[0])}/")
+        chapter_dir = os.path.basename(os.path.splitext(filename)[0])
+        
+        sidecars = [f"{filename}.{name}" for name in metrics.checksums]
+        if upload and os.path.isfile(filename):
+            with metrics.stage('upload', span='publish_to_sink'):
+                metrics.location, streamed = upload.publish(filename, sidecars)
+                for chapter_file in chapter_files:
+                    upload.publish_file(chapter_file, [f"{chapter_file}.{name}" for name in algorithms],
+                                        subdir=chapter_dir)
+            source = "durante o download" if streamed else "após o pós-processamento"
+            log(f"☁️ Enviado para {metrics.location} ({source})")
+            if not sink.keep_local:
+                filename = metrics.location
+                if chapter_files:
+                    os.rmdir(os.path.dirname(chapter_files[0]))
+        
+        if work_dir and filename != metrics.location:
+            if not os.path.isfile(filename):
+                # Sem isso o job terminaria "ok" apontando para a pasta temporária, que será apagada
+                raise FileNotFoundError(f"arquivo final não encontrado na pasta temporária: {filename}")
+            with metrics.stage('publish', span='publish_output'):
+                filename = publish_output(filename, final_dir, sidecars)
+                for chapter_file in chapter_files:
+                    publish_output(chapter_file, os.path.join(final_dir, chapter_dir),
+                                   [f"{chapter_file}.{name}" for name in algorithms])
+            discard_scratch(metrics.job_id)
+        
+        return filename
+
+
+def _download_with_stall_restarts(ydl, info, url, watchdog, metrics, log, limiter):
+    """
+    Executa o download do info extraído, reabrindo a conexão quando o watchdog detecta lentidão
+    
+    A primeira reabertura reaproveita as URLs já extraídas (nova conexão,
+    possivelmente outro servidor da CDN); as seguintes extraem tudo de novo,
+    o que renova URLs assinadas. Em todos os casos o yt-dlp continua o
+    arquivo .part a partir do tamanho já gravado. Cada tentativa espera a
+    vez no limitador do host antes de começar, e cada nova extração ocupa
+    uma vaga.
+    """
+    import copy
+    import gc
+    
+    while True:
+        try:
+            limiter.start()
+            # process_ie_result altera o dicionário; cada tentativa usa uma cópia
+            return ydl.process_ie_result(copy.deepcopy(info), download=True)
+        except Exception as e:
+            stall = _find_stall(e)
+            if stall is None or metrics.stall_restarts >= MAX_STALL_RESTARTS:
+                raise
+            reason = str(stall)
+            metrics.stall_restarts += 1
+        
+        # Sem o traceback, o .part interrompido pode ser fechado (e descarregado) antes de retomar
+        stall = None
+        gc.collect()
+        watchdog.reset()
+        if metrics.stall_restarts == 1:
+            log(f"🐢 Download travado ({reason}); reabrindo a conexão...")
+        else:
+            log(f"🐢 Download travado ({reason}); resolvendo a URL de novo...")
+            with metrics.stage('extraction', span='extract_info'), limiter.slot():
+                info = ydl.extract_info(url, download=False, process=False)
+
+
+# Normalização de loudness (EBU R128) no pós-processamento: alvo em LUFS (também via --loudnorm)
+LOUDNORM_ENV_VAR = 'CONVERSOR_LOUDNORM'
+LOUDNORM_TRUE_PEAK = -1.5
+LOUDNORM_RANGE = 11
+# Taxa de amostragem de saída (o filtro loudnorm trabalha internamente a 192 kHz)
+LOUDNORM_SAMPLE_RATE = 48000
+
+
+def get_loudness_target():
+    """Alvo em LUFS configurado em CONVERSOR_LOUDNORM, ou None (sem normalização)"""
+    value = (os.environ.get(LOUDNORM_ENV_VAR) or '').strip()
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def configure_loudness_target(lufs):
+    """
+    Liga a normalização de loudness dos próximos downloads (vale também para os workers filhos)
+    
+    Raises:
+        ValueError: Se o alvo estiver fora da faixa aceita pelo FFmpeg (-70 a -5 LUFS)
+    """
+    if not -70 <= lufs <= -5:
+        raise ValueError(f"alvo de loudness inválido: {lufs} LUFS (use de -70 a -5, ex: -16)")
+    os.environ[LOUDNORM_ENV_VAR] = str(lufs)
+
+
+def loudnorm_filter(target, measured=None):
+    """
+    Filtro loudnorm do FFmpeg
+    
+    Sem medição, o filtro normaliza dinamicamente numa passada e mede a
+    entrada; com a medição de uma exportação anterior (LoudnessCache), ele
+    aplica um ganho linear exato, também numa passada só.
+    """
+    params = [f"I={target}", f"TP={LOUDNORM_TRUE_PEAK}", f"LRA={LOUDNORM_RANGE}"]
+    if measured:
+        params += [f"measured_I={measured['input_i']}", f"measured_TP={measured['input_tp']}",
+                   f"measured_LRA={measured['input_lra']}", f"measured_thresh={measured['input_thresh']}",
+                   'linear=true']
+    return 'loudnorm=' + ':'.join(params + ['print_format=json'])
+
+
+def parse_loudnorm_stats(stderr):
+    """Medição da entrada (input_i, input_tp, input_lra, input_thresh) no JSON que o loudnorm imprime no fim"""
+    start, end = stderr.rfind('{'), stderr.rfind('}')
+    if start < 0 or end < start:
+        return None
+    try:
+        stats = json.loads(stderr[start:end + 1])
+        return {key: float(stats[key]) for key in ('input_i', 'input_tp', 'input_lra', 'input_thresh')}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class LoudnessCache:
+    """
+    Medições de loudness por mídia, para reexportações normalizarem em uma passada com ganho linear
+    
+    Salvo em JSON na pasta de dados da aplicação, com a chave
+    "<extrator>:<id>|<formato>" (ver media_key).
+    """
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._data = {}
+        if self.path and self.path.exists():
+            try:
+                self._data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._data = {}
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return dict(entry) if entry else None
+    
+    def store(self, key, measured):
+        with self._lock:
+            self._data[key] = dict(measured)
+            if self.path:
+                try:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = self.path.with_suffix('.tmp')
+                    tmp_path.write_text(json.dumps(self._data, indent=2), encoding='utf-8')
+                    os.replace(tmp_path, self.path)
+                except OSError:
+                    pass
+
+
+_loudness_cache = None
+
+
+def get_loudness_cache():
+    """Cache compartilhado das medições de loudness (carregado na primeira normalização)"""
+    global _loudness_cache
+    if _loudness_cache is None:
+        _loudness_cache = LoudnessCache(APP_DATA_DIR / 'loudness.json')
+    return _loudness_cache
+
+
+def single_pass_args(download_type, info, has_thumbnail, loudnorm=None):
+    """
+    Opções de saída do FFmpeg para extrair, marcar, embutir a capa e normalizar numa única execução
+    
+    A entrada 0 é a mídia baixada e a 1, se houver, a miniatura (convertida
+    para JPEG, que MP3 e MP4 aceitam como capa).
+    """
+    if download_type == 'mp3':
+        args = ['-map', '0:a:0', '-c:a', 'libmp3lame', '-q:a', '0', '-id3v2_version', '3']
+        if has_thumbnail:
+            args += ['-map', '1:0', '-c:v', 'mjpeg', '-disposition:v', 'attached_pic',
+                     '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)']
+    else:
+        args = ['-map', '0:v:0', '-map', '0:a?', '-c:v:0', 'copy',
+                '-c:a', 'aac' if loudnorm else 'copy']
+        if loudnorm:
+            args += ['-b:a', '192k']
+        if has_thumbnail:
+            args += ['-map', '1:0', '-c:v:1', 'mjpeg', '-disposition:v:1', 'attached_pic']
+    if loudnorm:
+        args += ['-af', loudnorm, '-ar', str(LOUDNORM_SAMPLE_RATE)]
+    date = str(info.get('upload_date') or '')
+    tags = {
+        'title': info.get('title'),
+        'artist': info.get('uploader') or info.get('channel'),
+        'date': date[:4] if re.fullmatch(r'\d{8}', date) else None,
+        'comment': info.get('webpage_url'),
+    }
+    for name, value in tags.items():
+        if value:
+            args += ['-metadata', f"{name}={value}"]
+    return args
+
+
+class SinglePassPP(FFmpegPostProcessor):
+    """
+    Pós-processamento do download numa única execução do FFmpeg
+    
+    Substitui as passadas separadas de FFmpegExtractAudio, FFmpegMetadata,
+    EmbedThumbnail e da normalização: no MP3, extrai o áudio, grava as tags
+    ID3, embute a miniatura como capa e (com loudness_target) normaliza o
+    volume; no MP4, faz tags, capa e normalização sem recodificar o vídeo.
+    A medição de loudness de cada mídia fica no LoudnessCache, e uma
+    reexportação aplica o ganho exato em vez da normalização dinâmica.
+    """
+    
+    def __init__(self, downloader, download_type, loudness_target=None, cache=None):
+        super().__init__(downloader)
+        self.download_type = download_type
+        self.loudness_target = loudness_target
+        self.cache = cache
+    
+    def run(self, info):
+        source = info['filepath']
+        thumbnail = next((thumb['filepath'] for thumb in reversed(info.get('thumbnails') or [])
+                          if thumb.get('filepath') and os.path.isfile(thumb['filepath'])), None)
+        key = f"{media_key(info, info.get('webpage_url') or source)}|{info.get('format_id')}"
+        measured = self.cache.get(key) if self.cache and self.loudness_target is not None else None
+        loudnorm = (loudnorm_filter(self.loudness_target, measured)
+                    if self.loudness_target is not None else None)
+        final = os.path.splitext(source)[0] + '.mp3' if self.download_type == 'mp3' else source
+        # Quando o arquivo final substitui a entrada, a saída vai para um .temp e depois é renomeada
+        target = yt_dlp.utils.prepend_extension(final, 'temp') if final == source else final
+        
+        inputs = [(source, [])] + ([(thumbnail, [])] if thumbnail else [])
+        self.to_screen(f'Extraindo, marcando{", embutindo a capa" if thumbnail else ""}'
+                       f'{" e normalizando" if loudnorm else ""} em uma passada: "{target}"')
+        stderr = self.real_run_ffmpeg(
+            inputs, [(target, single_pass_args(self.download_type, info, bool(thumbnail), loudnorm))])
+        if loudnorm and not measured and self.cache:
+            stats = parse_loudnorm_stats(stderr)
+            if stats:
+                self.cache.store(key, stats)
+        
+        to_delete = [thumbnail] if thumbnail else []
+        if final == source:
+            os.replace(target, source)
+        else:
+            to_delete.append(source)
+        info['filepath'] = final
+        info['ext'] = os.path.splitext(final)[1][1:]
+        return to_delete, info
+
+
+# Um arquivo por capítulo, além do arquivo completo (também via --split-chapters)
+CHAPTER_SPLIT_ENV_VAR = 'CONVERSOR_SPLIT_CHAPTERS'
+# Distância máxima entre o início do capítulo e um quadro-chave para copiar o vídeo sem recodificar
+KEYFRAME_TOLERANCE_SECONDS = 0.05
+# Processos do FFmpeg rodando ao mesmo tempo na separação dos capítulos
+CHAPTER_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+
+def chapter_split_enabled():
+    """A separação por capítulos é opcional (variável de ambiente ou --split-chapters)"""
+    return os.environ.get(CHAPTER_SPLIT_ENV_VAR, '') not in ('', '0')
+
+
+def plan_chapters(chapters, download_type, keyframes=None, duration=None):
+    """
+    Decide o arquivo e a forma de exportação de cada capítulo
+    
+    O MP3 é sempre copiado (qualquer quadro de áudio serve de corte). No
+    MP4, o capítulo é copiado sem recodificar quando começa em um
+    quadro-chave (keyframes, em segundos); senão, o vídeo é recodificado
+    para o corte cair no ponto exato.
+    
+    Returns:
+        list: Dicionários com index, title, start, end, name e copy
+    """
+    import bisect
+    keyframes = sorted(keyframes or [])
+    plan = []
+    for index, chapter in enumerate(chapters, 1):
+        start = float(chapter.get('start_time') or 0)
+        end = chapter.get('end_time') or duration
+        if end is not None and float(end) <= start:
+            continue
+        title = chapter.get('title') or f"Capítulo {index}"
+        if download_type == 'mp3':
+            copy = True
+        else:
+            position = bisect.bisect_left(keyframes, start - KEYFRAME_TOLERANCE_SECONDS)
+            copy = position < len(keyframes) and keyframes[position] <= start + KEYFRAME_TOLERANCE_SECONDS
+        plan.append({
+            'index': index,
+            'title': title,
+            'start': start,
+            'end': float(end) if end is not None else None,
+            'name': f"{index:02d} - {yt_dlp.utils.sanitize_filename(title)}.{download_type}",
+            'copy': copy,
+        })
+    return plan
+
+
+def probe_keyframes(ffprobe, path):
+    """Instantes (segundos) dos quadros-chave do primeiro stream de vídeo, lidos dos pacotes sem decodificar"""
+    import subprocess
+    output = subprocess.run(
+        [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+         '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True).stdout
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append(float(pts_time))
+    return keyframes
+
+
+def export_chapter(ffmpeg, source, target, chapter, total):
+    """Exporta um capítulo com um processo do FFmpeg (cópia dos streams ou recodificação do vídeo)"""
+    import subprocess
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-ss', f"{chapter['start']:.3f}", '-i', source]
+    if chapter['end'] is not None:
+        command += ['-t', f"{chapter['end'] - chapter['start']:.3f}"]
+    command += ['-map', '0:v?', '-map', '0:a?', '-map_metadata', '0',
+                '-metadata', f"title={chapter['title']}", '-metadata', f"track={chapter['index']}/{total}"]
+    if chapter['copy']:
+        command += ['-c', 'copy', '-avoid_negative_ts', 'make_zero']
+    else:
+        command += ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-c:a', 'copy']
+    subprocess.run(command + [target], capture_output=True, check=True)
+    return target
+
+
+def split_chapters(path, chapters, download_type, ffmpeg, ffprobe=None, duration=None, log=None,
+                   workers=CHAPTER_WORKERS):
+    """
+    Gera um arquivo por capítulo em <nome>/, ao lado do arquivo completo
+    
+    Cada capítulo é um processo do FFmpeg, e até `workers` rodam ao mesmo
+    tempo: uma palestra de 40 capítulos é separada em paralelo, não um
+    capítulo depois do outro.
+    
+    Args:
+        path: Arquivo completo já baixado (e convertido, no MP3)
+        chapters: Lista 'chapters' do info do yt-dlp (start_time, end_time, title)
+        download_type: 'mp4' ou 'mp3'
+        ffmpeg: Caminho do executável do FFmpeg
+        ffprobe: Caminho do ffprobe (sem ele, todo capítulo de vídeo é recodificado)
+        duration: Duração total, usada quando o último capítulo não tem end_time
+        log: Função que recebe mensagens de andamento
+        workers: Processos do FFmpeg simultâneos
+    
+    Returns:
+        list: Caminhos dos arquivos dos capítulos, na ordem
+    """
+    log = log or (lambda message: None)
+    keyframes = probe_keyframes(ffprobe, path) if download_type == 'mp4' and ffprobe else []
+    plan = plan_chapters(chapters, download_type, keyframes, duration)
+    folder = os.path.splitext(path)[0]
+    os.makedirs(folder, exist_ok=True)
+    copied = sum(1 for chapter in plan if chapter['copy'])
+    log(f"📑 Separando {len(plan)} capítulos ({copied} por cópia, {len(plan) - copied} recodificados)...")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(plan) or 1)),
+                            thread_name_prefix='chapter') as executor:
+        futures = [executor.submit(contextvars.copy_context().run, export_chapter, ffmpeg, path,
+                                   os.path.join(folder, chapter['name']), chapter, len(plan))
+                   for chapter in plan]
+        return [future.result() for future in futures]
+
+
+# Gravação de transmissões ao vivo (--record): duração de cada segmento gravado
+LIVE_SEGMENT_SECONDS = 600
+# Formatos HLS usados na gravação, por tipo (o áudio é extraído de cada segmento fechado)
+LIVE_FORMATS = {
+    'mp4': 'best[protocol^=m3u8]',
+    'mp3': 'bestaudio[protocol^=m3u8]/best[protocol^=m3u8]',
+}
+# Falhas seguidas ao ler a playlist ao vivo antes de desistir da gravação
+LIVE_MAX_PLAYLIST_ERRORS = 5
+# Tentativas de baixar um fragmento antes de pulá-lo (contado como perdido)
+LIVE_FRAGMENT_ATTEMPTS = 3
+
+
+def parse_live_playlist(text, base_url):
+    """
+    Lê uma playlist HLS de mídia (não a master)
+    
+    Returns:
+        dict: segments (lista de (sequência, duração, url)), target_duration,
+            init (url do EXT-X-MAP ou None) e ended (EXT-X-ENDLIST presente)
+    
+    Raises:
+        ValueError: Se não for uma playlist HLS ou se os fragmentos forem criptografados
+    """
+    from urllib.parse import urljoin
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or lines[0] != '#EXTM3U':
+        raise ValueError("a resposta não é uma playlist HLS")
+    playlist = {'segments': [], 'target_duration': None, 'init': None, 'ended': False}
+    sequence, duration = 0, None
+    for line in lines[1:]:
+        tag, _, value = line.partition(':')
+        if tag == '#EXT-X-MEDIA-SEQUENCE':
+            sequence = int(value)
+        elif tag == '#EXT-X-TARGETDURATION':
+            playlist['target_duration'] = float(value)
+        elif tag == '#EXTINF':
+            duration = float(value.split(',')[0])
+        elif tag == '#EXT-X-ENDLIST':
+            playlist['ended'] = True
+        elif tag == '#EXT-X-MAP':
+            uri = re.search(r'URI="([^"]+)"', value)
+            playlist['init'] = urljoin(base_url, uri.group(1)) if uri else None
+        elif tag == '#EXT-X-KEY' and 'METHOD=NONE' not in value:
+            raise ValueError("transmissões com fragmentos criptografados não podem ser gravadas")
+        elif not line.startswith('#'):
+            playlist['segments'].append(
+                (sequence + len(playlist['segments']), duration or playlist['target_duration'] or 0,
+                 urljoin(base_url, line)))
+            duration = None
+    return playlist
+
+
+class LiveRecorder:
+    """
+    Grava uma transmissão ao vivo em segmentos de duração fixa
+    
+    Lê a playlist HLS periodicamente e acrescenta cada fragmento novo ao
+    segmento aberto (<nome>-001.ts.part); ao completar segment_seconds, o
+    segmento é fechado, renomeado e entregue a on_segment, enquanto a
+    gravação continua no próximo. Só um fragmento fica na memória por vez.
+    Com retain, apenas os últimos segmentos entregues ficam no disco.
+    """
+    
+    def __init__(self, ydl, playlist_url, output_dir, stem, segment_seconds=LIVE_SEGMENT_SECONDS,
+                 http_headers=None, on_segment=None, log=None, stop_event=None, poll_interval=None,
+                 sleep=time.sleep):
+        """
+        Args:
+            ydl: YoutubeDL usado nas requisições (cookies, proxy e cabeçalhos da extração)
+            playlist_url: URL da playlist de mídia do formato escolhido
+            output_dir: Pasta dos segmentos
+            stem: Nome dos arquivos sem o número do segmento e a extensão
+            segment_seconds: Duração de cada segmento (fechado na divisa do fragmento seguinte)
+            http_headers: Cabeçalhos do formato extraído
+            on_segment: Função chamada com o caminho de cada segmento fechado
+            log: Função que recebe mensagens de andamento
+            stop_event: threading.Event que encerra a gravação (o segmento aberto é fechado)
+            poll_interval: Intervalo entre leituras da playlist (padrão: metade do EXT-X-TARGETDURATION)
+            sleep: Função de espera (pode ser trocada nos testes)
+        """
+        self.ydl = ydl
+        self.playlist_url = playlist_url
+        self.output_dir = output_dir
+        self.stem = stem
+        self.segment_seconds = segment_seconds
+        self.http_headers = http_headers or {}
+        self.on_segment = on_segment or (lambda path: None)
+        self.log = log or (lambda message: None)
+        self.stop_event = stop_event or threading.Event()
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self.last_sequence = None
+        self.segments = 0
+        self.lost_fragments = 0
+        self._stream = None
+        self._path = None
+        self._duration = 0.0
+        self._init = None
+    
+    def fetch(self, url):
+        from yt_dlp.networking import Request
+        with self.ydl.urlopen(Request(url, headers=self.http_headers)) as response:
+            return response.read()
+    
+    def fetch_fragment(self, sequence, url):
+        """Baixa um fragmento com algumas tentativas; devolve None se ele teve de ser pulado"""
+        for attempt in range(1, LIVE_FRAGMENT_ATTEMPTS + 1):
+            try:
+                return self.fetch(url)
+            except Exception as e:
+                if attempt == LIVE_FRAGMENT_ATTEMPTS or self.stop_event.is_set():
+                    self.lost_fragments += 1
+                    self.log(f"⚠️ Fragmento {sequence} pulado depois de {attempt} tentativa(s): {e}")
+                    return None
+                self.sleep(min(1.0, self.poll_interval or 1.0))
+    
+    def run(self):
+        """Grava até a transmissão terminar (EXT-X-ENDLIST), o stop_event ou Ctrl+C"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        errors = 0
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    playlist = parse_live_playlist(self.fetch(self.playlist_url).decode('utf-8', 'replace'),
+                                                   self.playlist_url)
+                    errors = 0
+                except Exception as e:
+                    if isinstance(e, ValueError) or errors + 1 >= LIVE_MAX_PLAYLIST_ERRORS:
+                        raise
+                    errors += 1
+                    self.log(f"⚠️ Falha ao ler a playlist ao vivo ({e}); tentando de novo...")
+                    self.sleep(self.poll_interval or 1.0)
+                    continue
+                
+                new = [segment for segment in playlist['segments']
+                       if self.last_sequence is None or segment[0] > self.last_sequence]
+                if new and self.last_sequence is not None and new[0][0] > self.last_sequence + 1:
+                    # A janela da playlist andou mais rápido que a gravação
+                    lost = new[0][0] - self.last_sequence - 1
+                    self.lost_fragments += lost
+                    self.log(f"⚠️ {lost} fragmento(s) saíram da playlist antes de serem gravados")
+                if playlist['init'] and self._init is None:
+                    self._init = self.fetch(playlist['init'])
+                for sequence, duration, url in new:
+                    if self.stop_event.is_set():
+                        break
+                    data = self.fetch_fragment(sequence, url)
+                    if data is not None:
+                        self.append(data, duration)
+                    self.last_sequence = sequence
+                if playlist['ended']:
+                    break
+                if not new:
+                    self.sleep(self.poll_interval or max(0.5, (playlist['target_duration'] or 2) / 2))
+        except KeyboardInterrupt:
+            self.log("\n⏹️ Encerrando a gravação...")
+        finally:
+            self.close_segment()
+        return self.segments
+    
+    def append(self, data, duration):
+        if self._stream is None:
+            self.segments += 1
+            self._path = os.path.join(self.output_dir, f"{self.stem}-{self.segments:03d}.ts")
+            self._stream = open(f"{self._path}.part", 'wb')
+            self._duration = 0.0
+            if self._init:
+                self._stream.write(self._init)
+        self._stream.write(data)
+        self._duration += duration
+        if self._duration >= self.segment_seconds:
+            self.close_segment()
+    
+    def close_segment(self):
+        """Fecha o segmento aberto e o entrega a on_segment"""
+        if self._stream is None:
+            return
+        self._stream.close()
+        self._stream = None
+        os.replace(f"{self._path}.part", self._path)
+        self.log(f"🎞️ Segmento {self.segments} fechado ({self._duration:.0f}s): {os.path.basename(self._path)}")
+        self.on_segment(self._path)
+
+
+def record_live(url, output_path, download_type, custom_filename=None, segment_seconds=LIVE_SEGMENT_SECONDS,
+                retain=0, log=None, stop_event=None, poll_interval=None):
+    """
+    Grava uma transmissão ao vivo em segmentos, convertendo cada um para MP3 assim que fecha
+    
+    O MP3 (e o .sha256) de cada segmento é gerado em segundo plano enquanto
+    a gravação segue, então uma transmissão de 10 horas termina com no
+    máximo um segmento por converter. No MP3, o .ts do segmento é apagado
+    depois da conversão. Com retain, só os últimos segmentos prontos ficam
+    na pasta, o que limita o disco usado por gravações longas. Um segmento
+    que falha na conversão fica de fora da lista e é registrado no log,
+    sem interromper a gravação.
+    
+    Args:
+        url: URL da transmissão (YouTube, Twitch ou uma playlist .m3u8)
+        output_path: Pasta de destino dos segmentos
+        download_type: 'mp4' (segmentos .ts) ou 'mp3'
+        custom_filename: Nome dos arquivos sem número e extensão (padrão: título da transmissão)
+        segment_seconds: Duração de cada segmento
+        retain: Segmentos prontos mantidos na pasta (0 = todos)
+        log: Função que recebe mensagens de andamento
+        stop_event: threading.Event que encerra a gravação
+        poll_interval: Intervalo entre leituras da playlist (padrão: metade da duração dos fragmentos)
+    
+    Returns:
+        list: Caminhos dos segmentos prontos que ficaram na pasta
+    
+    Raises:
+        ValueError: Se a transmissão não tiver um formato HLS
+        FileNotFoundError: Se o MP3 for pedido sem o FFmpeg instalado
+    """
+    from collections import deque
+    
+    log = log or (lambda message: None)
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'socket_timeout': 30,
+        'format': LIVE_FORMATS[download_type],
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ffmpeg = FFmpegPostProcessor(ydl)
+        if download_type == 'mp3' and not ffmpeg.available:
+            raise FileNotFoundError("FFmpeg não encontrado: necessário para extrair o MP3 de cada segmento")
+        info = ydl.extract_info(url, download=False)
+        if not str(info.get('protocol', '')).startswith('m3u8'):
+            raise ValueError("a transmissão não tem um formato HLS para gravar")
+        if not info.get('is_live'):
+            log("⚠️ O vídeo não está marcado como ao vivo; gravando a playlist até o fim")
+        stem = custom_filename or yt_dlp.utils.sanitize_filename(info.get('title') or info.get('id') or 'live')
+        algorithms = checksum_algorithms()
+        kept = deque()
+        
+        def finish(segment):
+            path = segment
+            if download_type == 'mp3':
+                path = os.path.splitext(segment)[0] + '.mp3'
+                ffmpeg.run_ffmpeg(segment, path, ['-vn', '-acodec', 'libmp3lame', '-q:a', '0'])
+                os.remove(segment)
+            if algorithms:
+                write_checksum_sidecars(path, hash_file(path, algorithms))
+            kept.append(path)
+            while retain and len(kept) > retain:
+                old = kept.popleft()
+                for name in [old] + [f"{old}.{algorithm}" for algorithm in algorithms]:
+                    if os.path.exists(name):
+                        os.remove(name)
+            log(f"✅ Pronto: {os.path.basename(path)}")
+        
+        # Um segmento é convertido por vez, em paralelo com a gravação do seguinte
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='live-segment') as converter:
+            futures = {}
+            failed = []
+            
+            def collect(wait=False):
+                # Uma conversão que falhou é registrada sem interromper a gravação nem os outros segmentos
+                for future, segment in list(futures.items()):
+                    if not (wait or future.done()):
+                        continue
+                    del futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed.append(segment)
+                        log(f"❌ Falha ao finalizar {os.path.basename(segment)}: {e}")
+            
+            def on_segment(path):
+                collect()
+                futures[converter.submit(contextvars.copy_context().run, finish, path)] = path
+            
+            recorder = LiveRecorder(
+                ydl, info['url'], output_path, stem, segment_seconds, http_headers=info.get('http_headers'),
+                on_segment=on_segment, log=log, stop_event=stop_event, poll_interval=poll_interval)
+            log(f"🔴 Gravando {info.get('title') or url} em segmentos de {segment_seconds:.0f}s")
+            recorder.run()
+            collect(wait=True)
+    if failed:
+        log(f"⚠️ {len(failed)} segmento(s) não foram finalizados")
+    if recorder.lost_fragments:
+        log(f"⚠️ {recorder.lost_fragments} fragmento(s) perdidos durante a gravação")
+    return list(kept)
+
+
+def describe_download_error(e):
+    """Converte uma exceção do download em uma mensagem detalhada para o usuário"""
+    return classify_error(e).describe()
+
+
+# Colunas aceitas no manifesto de jobs (.csv com cabeçalho ou .jsonl com um objeto por linha)
+MANIFEST_FIELDS = ('url', 'type', 'filename', 'format', 'start', 'end', 'priority')
+# Campos do job validado (validate_manifest_row) guardados na fila compartilhada e no histórico
+MANIFEST_JOB_KEYS = ('url', 'download_type', 'custom_filename', 'format_policy', 'clip_range', 'priority')
+
+# Quantidade máxima de jobs aguardando um worker antes de o leitor do manifesto esperar
+MAX_PENDING_JOBS = 32
+
+
+def parse_timestamp(value):
+    """
+    Converte "90", "1:30" ou "01:01:30" em segundos
+    
+    Returns:
+        float: Segundos ou None se o valor estiver vazio
+    
+    Raises:
+        ValueError: Se o valor não for um tempo válido
+    """
+    if value is None or str(value).strip() == '':
+        return None
+    seconds = 0.0
+    for part in str(value).strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"tempo negativo: {value}")
+    return seconds
+
+
+def iter_manifest(path):
+    """
+    Lê um manifesto linha a linha, sem carregá-lo inteiro na memória
+    
+    Args:
+        path: Caminho de um arquivo .csv (com cabeçalho) ou .jsonl
+    
+    Yields:
+        tuple: (número da linha, dict da linha) ou (número da linha, mensagem de erro)
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if str(path).lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, f"JSON inválido: {e}"
+                    continue
+                yield line_no, row if isinstance(row, dict) else "a linha não é um objeto JSON"
+
+
+def validate_manifest_row(row, default_type='mp4'):
+    """
+    Valida uma linha do manifesto e a converte em um job
+    
+    Args:
+        row: dict lido do manifesto
+        default_type: Tipo usado quando a linha não informa 'type'
+    
+    Returns:
+        dict: Job com url, download_type, custom_filename, format_policy, clip_range e priority
+    
+    Raises:
+        ValueError: Com a descrição do problema encontrado na linha
+    """
+    if not isinstance(row, dict):
+        raise ValueError(row)
+    
+    url = clean_and_validate_url(str(row.get('url') or ''))
+    if not url:
+        raise ValueError("URL ausente ou inválida")
+    
+    download_type = str(row.get('type') or default_type).strip().lower()
+    download_type = {'video': 'mp4', 'audio': 'mp3'}.get(download_type, download_type)
+    if download_type not in ('mp4', 'mp3'):
+        raise ValueError(f"tipo desconhecido: {row.get('type')}")
+    
+    format_policy = str(row.get('format') or 'best').strip()
+    if format_policy not in FORMAT_POLICIES:
+        raise ValueError(f"formato desconhecido: {format_policy}")
+    
+    try:
+        start = parse_timestamp(row.get('start'))
+        end = parse_timestamp(row.get('end'))
+    except ValueError:
+        raise ValueError(f"trecho inválido: {row.get('start')}-{row.get('end')}")
+    clip_range = None
+    if start is not None or end is not None:
+        clip_range = (start or 0.0, end if end is not None else float('inf'))
+        if clip_range[1] <= clip_range[0]:
+            raise ValueError("o fim do trecho deve ser maior que o início")
+    
+    custom_filename = suggest_filename(str(row.get('filename') or '')) or None
+    
+    try:
+        priority = int(row.get('priority') or 1)
+    except (TypeError, ValueError):
+        priority = 0
+    if priority < 1:
+        raise ValueError(f"prioridade inválida: {row.get('priority')} (use um inteiro ≥ 1)")
+    
+    return {
+        'url': url,
+        'download_type': download_type,
+        'custom_filename': custom_filename,
+        'format_policy': format_policy,
+        'clip_range': clip_range,
+        'priority': priority,
+    }
+
+
+def manifest_row_from_job(job):
+    """Inverso de validate_manifest_row: devolve o job como uma linha de manifesto"""
+    clip_range = job.get('clip_range')
+    start = end = None
+    if clip_range:
+        start = clip_range[0]
+        end = clip_range[1] if clip_range[1] != float('inf') else None
+    row = {
+        'url': job['url'],
+        'type': job.get('download_type'),
+        'filename': job.get('custom_filename'),
+        'format': job.get('format_policy'),
+        'start': start,
+        'end': end,
+        'priority': job.get('priority'),
+    }
+    return {key: value for key, value in row.items() if value is not None}
+
+
+class ResultsWriter:
+    """Escreve o manifesto de resultados linha a linha (.jsonl ou .csv), de forma segura entre threads"""
+    
+    CSV_FIELDS = ('line', 'job_id', 'url', 'status', 'file', 'location', 'sha256', 'error_type', 'error')
+    
+    def __init__(self, path):
+        self.path = str(path)
+        self.is_csv = self.path.lower().endswith('.csv')
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=self.CSV_FIELDS, extrasaction='ignore')
+            self._csv.writeheader()
+    
+    def write(self, result):
+        """Grava um resultado e descarrega o buffer imediatamente"""
+        with self._lock:
+            if self.is_csv:
+                self._csv.writerow(result)
+            else:
+                self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+            self._file.flush()
+    
+    def close(self):
+        """Fecha o arquivo de resultados"""
+        with self._lock:
+            self._file.close()
+
+
+# Custo (segundos de mídia) assumido para jobs sem metadados
+DEFAULT_JOB_COST = 1800.0
+# Bitrate usado para converter o tamanho estimado em segundos de mídia (bytes/s)
+ASSUMED_BYTES_PER_SECOND = 500 * 1024
+# Segundos de mídia descontados do custo de um job a cada segundo de espera na fila
+SCHEDULER_AGING_RATE = 10.0
+
+
+def estimate_job_cost(job):
+    """
+    Estima o custo de um job em segundos de mídia, dividido pela prioridade
+    
+    Usa, nesta ordem, o trecho pedido (clip_range), a duração extraída e o
+    tamanho estimado; sem nenhum deles, assume DEFAULT_JOB_COST.
+    """
+    duration = job.get('duration') or None
+    if not duration and job.get('filesize'):
+        duration = job['filesize'] / ASSUMED_BYTES_PER_SECOND
+    
+    clip_range = job.get('clip_range')
+    if clip_range and clip_range[1] != float('inf'):
+        clip_length = clip_range[1] - clip_range[0]
+        duration = min(duration, clip_length) if duration else clip_length
+    elif clip_range and duration:
+        duration = max(0.0, duration - clip_range[0])
+    
+    cost = duration if duration else DEFAULT_JOB_COST
+    return cost / max(1, job.get('priority') or 1)
+
+
+# Espaço livre mantido em cada volume, além das reservas dos jobs (também via --min-free)
+DISK_FREE_MARGIN = 512 * 1024 * 1024
+# Pico de ocupação, em múltiplos do tamanho estimado, no volume onde o download acontece
+# (MP4: formatos separados + arquivo juntado; MP3: áudio original + MP3 a 320 kbps)
+WORK_SPACE_FACTOR = {'mp4': 2.0, 'mp3': 2.5}
+# Ocupação do arquivo final no destino, quando ele fica em outro volume (pasta rápida configurada)
+OUTPUT_SPACE_FACTOR = {'mp4': 1.0, 'mp3': 1.5}
+# Intervalo para reler o espaço livre enquanto há jobs esperando
+DISK_RECHECK_SECONDS = 2.0
+# Jobs examinados, em ordem de prioridade, ao procurar um que caiba no disco
+ADMISSION_SCAN_LIMIT = 32
+
+
+def estimate_job_bytes(job):
+    """
+    Estima o tamanho do download de um job em bytes
+    
+    Usa o filesize/filesize_approx extraído ou, na falta dele, a duração
+    (ou DEFAULT_JOB_COST) a ASSUMED_BYTES_PER_SECOND; um trecho (clip_range)
+    reduz a estimativa na proporção da duração.
+    
+    Returns:
+        tuple: (bytes, True se a estimativa veio dos metadados do vídeo)
+    """
+    size = job.get('filesize') or None
+    duration = job.get('duration') or None
+    known = bool(size or duration)
+    if not size:
+        size = (duration or DEFAULT_JOB_COST) * ASSUMED_BYTES_PER_SECOND
+    clip_range = job.get('clip_range')
+    if clip_range and duration:
+        size *= max(0.0, min(clip_range[1], duration) - clip_range[0]) / duration
+    return int(size), known
+
+
+def _format_size(size):
+    return f"{size / 1024 ** 3:.1f} GB" if size >= 1024 ** 3 else f"{size / 1024 ** 2:.0f} MB"
+
+
+def _volume_of(path):
+    """Pasta existente mais próxima de path e o dispositivo (st_dev) em que ela está"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path, os.stat(path).st_dev
+
+
+class SpaceReservation:
+    """Espaço reservado por um job em cada volume; a parte do volume de trabalho encolhe com os bytes gravados"""
+    
+    def __init__(self, job_id, needs, work_device):
+        self.job_id = job_id
+        self.needs = needs
+        self.work_device = work_device
+        self._written = {}
+    
+    def progress_hook(self, d):
+        """Hook de progresso: bytes já gravados já aparecem como ocupados no disco"""
+        if d.get('filename') and d.get('downloaded_bytes') is not None:
+            self._written[d['filename']] = d['downloaded_bytes']
+    
+    def outstanding(self, device):
+        """Bytes que o job ainda deve ocupar no volume"""
+        need = self.needs.get(device, 0)
+        if device == self.work_device:
+            need -= sum(self._written.values())
+        return max(0, need)
+
+
+class DiskSpaceManager:
+    """
+    Controle de admissão de jobs pelo espaço em disco
+    
+    Antes de começar, cada job reserva o pico estimado de ocupação no volume
+    de trabalho (pasta rápida ou destino) e, se o destino for outro volume,
+    o tamanho do arquivo final nele. Um job só é admitido se o espaço livre,
+    menos o que os jobs em andamento ainda vão gravar e menos a margem,
+    comportar o que ele precisa; senão, espera na fila. A reserva é liberada
+    quando o job termina e sua pasta temporária é apagada.
+    
+    Um job que não cabe mesmo sem nenhum outro em andamento falha logo com
+    InsufficientSpaceError (se o tamanho for só um palpite, ele é tentado).
+    """
+    
+    def __init__(self, margin=DISK_FREE_MARGIN, usage=None):
+        import shutil
+        self.margin = margin
+        self._usage = usage or shutil.disk_usage
+        self._lock = threading.Lock()
+        self._reservations = {}
+        self._listeners = []
+    
+    def add_listener(self, callback):
+        """Registra uma função chamada sempre que uma reserva é liberada"""
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def requirements(self, job):
+        """Espaço necessário por volume: {st_dev: (pasta, bytes)}, o volume de trabalho e se o tamanho é conhecido"""
+        size, known = estimate_job_bytes(job)
+        download_type = job.get('download_type') or 'mp4'
+        work_path, work_device = _volume_of(get_scratch_dir() or job['output_path'])
+        needs = {work_device: (work_path, int(size * WORK_SPACE_FACTOR.get(download_type, 2.0)))}
+        output_path, output_device = _volume_of(job['output_path'])
+        if output_device != work_device:
+            needs[output_device] = (output_path, int(size * OUTPUT_SPACE_FACTOR.get(download_type, 1.0)))
+        return needs, work_device, known
+    
+    def try_reserve(self, job):
+        """
+        Reserva o espaço do job, se couber agora
+        
+        Returns:
+            SpaceReservation, ou None se o job precisa esperar outros terminarem
+        
+        Raises:
+            InsufficientSpaceError: O job não cabe e nenhum job em andamento vai liberar espaço
+        """
+        metrics = job.get('metrics') or job.setdefault('metrics', JobMetrics(url=job.get('url')))
+        needs, work_device, known = self.requirements(job)
+        with self._lock:
+            if metrics.job_id in self._reservations:
+                return self._reservations[metrics.job_id]
+            for device, (path, need) in needs.items():
+                active = [r for r in self._reservations.values() if device in r.needs]
+                available = self._usage(path).free - sum(r.outstanding(device) for r in active) - self.margin
+                if available >= need:
+                    continue
+                if active:
+                    return None
+                if known:
+                    raise InsufficientSpaceError(
+                        f"{_format_size(need)} necessários em {path}, "
+                        f"{_format_size(max(0, available))} disponíveis além da margem de {_format_size(self.margin)}"
+                    )
+            reservation = SpaceReservation(metrics.job_id, {device: need for device, (_, need) in needs.items()},
+                                           work_device)
+            self._reservations[metrics.job_id] = reservation
+            return reservation
+    
+    def admit(self, job):
+        """
+        Diz se o job pode começar agora (reservando seu espaço)
+        
+        Jobs cancelados ou sem pasta de destino passam direto. Um job sem
+        espaço e sem ter por quem esperar também passa, com o erro em
+        job['space_error'], para falhar com uma mensagem clara em vez de
+        encher o disco pela metade. Se o espaço não puder ser medido (pasta
+        inacessível), o job passa sem reserva e o download relata o erro real.
+        """
+        cancel_event = job.get('cancel_event')
+        if (cancel_event is not None and cancel_event.is_set()) or not job.get('output_path'):
+            return True
+        try:
+            return self.try_reserve(job) is not None
+        except InsufficientSpaceError as e:
+            job['space_error'] = e
+            return True
+        except Exception:
+            return True
+    
+    def wait(self, job, log=None, stop_event=None):
+        """
+        Espera o job ser admitido (interface gráfica e workers da fila compartilhada)
+        
+        Returns:
+            bool: False se stop_event foi sinalizado antes
+        """
+        stop_event = stop_event or threading.Event()
+        while not self.admit(job):
+            if log and not job.get('space_held'):
+                log("⏸️ Aguardando espaço em disco (outros downloads precisam terminar)")
+            job['space_held'] = True
+            if stop_event.wait(DISK_RECHECK_SECONDS):
+                return False
+        return True
+    
+    def reservation(self, job_id):
+        with self._lock:
+            return self._reservations.get(job_id)
+    
+    def release(self, job_id):
+        """Libera a reserva do job (chamado depois de apagar a pasta temporária dele)"""
+        with self._lock:
+            released = self._reservations.pop(job_id, None)
+        if released is not None:
+            for callback in list(self._listeners):
+                callback()
+
+
+_disk_space = DiskSpaceManager()
+
+
+def get_disk_space():
+    """Controle de espaço em disco compartilhado por todos os downloads do processo"""
+    return _disk_space
+
+
+def configure_disk_space(margin=DISK_FREE_MARGIN):
+    """Substitui o controle de espaço (vale para as próximas filas de download)"""
+    global _disk_space
+    _disk_space = DiskSpaceManager(margin)
+    return _disk_space
+
+
+class JobScheduler:
+    """
+    Fila de jobs limitada que entrega primeiro o job mais curto, com envelhecimento
+    
+    Política 'sjf': o custo efetivo de um job é custo - aging_rate × espera.
+    Como a espera cresce igual para todos, a ordem relativa só depende de
+    custo + aging_rate × momento_de_entrada, e um heap resolve cada
+    operação em O(log n). Jobs longos nunca esperam para sempre: cada
+    segundo na fila vale aging_rate segundos de mídia.
+    
+    Política 'fifo': ordem de chegada, como uma queue.Queue.
+    
+    A interface imita queue.Queue (put/get bloqueantes, maxsize e get_nowait),
+    então a fila continua segurando o leitor do manifesto quando está cheia.
+    
+    Com admit, get() entrega o primeiro job (na ordem da política) que admit
+    aceitar; os recusados continuam na fila e são reavaliados a cada
+    DISK_RECHECK_SECONDS ou quando wake() é chamado.
+    """
+    
+    POLICIES = ('sjf', 'fifo')
+    
+    def __init__(self, maxsize=0, policy='sjf', aging_rate=SCHEDULER_AGING_RATE, cost=estimate_job_cost,
+                 admit=None):
+        import itertools
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de fila desconhecida: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.aging_rate = aging_rate
+        self.cost = cost
+        self.admit = admit
+        self._stops = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+    
+    def __len__(self):
+        with self._condition:
+            return len(self._heap)
+    
+    def _key(self, item, cost):
+        if item is None:
+            return float('inf')
+        if self.policy == 'fifo':
+            return 0.0
+        if cost is None:
+            cost = self.cost(item)
+        return cost + self.aging_rate * time.monotonic()
+    
+    def put(self, item, cost=None):
+        """Enfileira um item (None é o sinal de parada e sai por último), esperando se a fila estiver cheia"""
+        import heapq
+        key = self._key(item, cost)
+        with self._condition:
+            while self.maxsize and len(self._heap) >= self.maxsize:
+                self._condition.wait()
+            heapq.heappush(self._heap, (key, next(self._counter), item))
+            self._stops += item is None
+            self._condition.notify_all()
+    
+    def get(self, block=True):
+        """Retira o item de menor custo efetivo (entre os aceitos por admit)"""
+        import heapq
+        import queue
+        with self._condition:
+            while True:
+                if self._heap and self.admit is None:
+                    _, _, item = heapq.heappop(self._heap)
+                    self._stops -= item is None
+                    self._condition.notify_all()
+                    return item
+                entry = self._next_admitted() if self._heap else None
+                if entry is not None:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                    self._stops -= entry[2] is None
+                    self._condition.notify_all()
+                    return entry[2]
+                if not block:
+                    raise queue.Empty
+                self._condition.wait(DISK_RECHECK_SECONDS if self._heap else None)
+    
+    def _next_admitted(self):
+        """Primeira entrada que pode sair agora; o sinal de parada só sai quando não restam jobs"""
+        import heapq
+        for entry in heapq.nsmallest(ADMISSION_SCAN_LIMIT, self._heap):
+            if entry[2] is None:
+                if len(self._heap) == self._stops:
+                    return entry
+            elif self._admitted(entry[2]):
+                return entry
+        return None
+    
+    def _admitted(self, item):
+        # Roda na thread do worker: um erro aqui não pode derrubá-la (a fila pararia de vez)
+        try:
+            return self.admit(item)
+        except Exception:
+            return True
+    
+    def wake(self):
+        """Reavalia os jobs recusados (ex: uma reserva de espaço foi liberada)"""
+        with self._condition:
+            self._condition.notify_all()
+    
+    def get_nowait(self):
+        return self.get(block=False)
+
+
+class DownloadEngine:
+    """
+    Executa jobs de download com um número fixo de workers
+    
+    A fila interna é limitada: submit() bloqueia quando há max_pending jobs
+    esperando, o que segura quem está produzindo os jobs (backpressure).
+    Entre os jobs que esperam, o JobScheduler escolhe o próximo pela
+    política configurada (padrão: mais curto primeiro, com envelhecimento),
+    pulando os que ainda não cabem no disco (ver DiskSpaceManager).
+    """
+    
+    def __init__(self, runner, workers=2, max_pending=MAX_PENDING_JOBS, on_result=None, policy='sjf',
+                 on_hold=None):
+        self.runner = runner
+        self.on_result = on_result or (lambda job, result: None)
+        self.on_hold = on_hold or (lambda job: None)
+        self.space = get_disk_space()
+        self._queue = JobScheduler(maxsize=max_pending, policy=policy, admit=self._admit)
+        self.space.add_listener(self._queue.wake)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"download-worker-{i + 1}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, job):
+        """Enfileira um job, esperando se a fila estiver cheia"""
+        self._queue.put(job)
+    
+    def close(self):
+        """Sinaliza que não haverá novos jobs e espera os workers terminarem"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.space.remove_listener(self._queue.wake)
+    
+    def _admit(self, job):
+        """Admissão pelo espaço em disco; avisa (uma vez) quando o job fica esperando"""
+        if self.space.admit(job):
+            return True
+        if not job.get('space_held'):
+            job['space_held'] = True
+            self.on_hold(job)
+        return False
+    
+    def _worker(self):
+        """Laço de cada worker: executa jobs até receber o sinal de parada"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                result = self.runner(job)
+            except Exception as e:
+                result = {'status': 'error', 'error': str(e)}
+            finally:
+                # Garante a liberação mesmo se o runner não chegou a executar o download
+                if job.get('metrics') is not None:
+                    self.space.release(job['metrics'].job_id)
+            self.on_result(job, result)
+
+
+def run_job(job, log=None):
+    """
+    Executa um job de download e devolve o resultado em formato de manifesto
+    
+    Returns:
+        dict: {'status': 'ok', 'file': ...} ou {'status': 'error', 'error': ...}
+    """
+    metrics = job.get('metrics') or JobMetrics(url=job['url'])
+    metrics.download_type = job['download_type']
+    
+    if get_profile_dir():
+        return profile_job(
+            metrics.job_id, lambda: _run_job(job, metrics, log),
+            log=lambda message: print(f"[{metrics.job_id}] {message}")
+        )
+    return _run_job(job, metrics, log)
+
+
+def _run_job(job, metrics, log):
+    """Executa o download de um job e registra as métricas"""
+    with job_context(metrics.job_id):
+        try:
+            if job.get('space_error'):
+                raise job['space_error']
+            with trace_span('job', url=job['url'], download_type=job['download_type']):
+                filename = run_with_retry(
+                    lambda: download_media(
+                        job['url'], job['output_path'], job['download_type'], job.get('custom_filename'),
+                        progress_hook=job.get('progress_hook'), log=log, format_policy=job.get('format_policy'),
+                        clip_range=job.get('clip_range'), metrics=metrics, priority=job.get('priority', 1)
+                    ),
+                    job['url'], log=log, on_retry=lambda attempt: setattr(metrics, 'attempts', attempt)
+                )
+            result = {'status': 'ok', 'file': filename}
+            if metrics.location:
+                result['location'] = metrics.location
+            digest = metrics.checksums.get('sha256')
+            if digest:
+                result['sha256'] = digest
+                duplicate = find_duplicate(digest, filename)
+                if duplicate:
+                    result['duplicate_of'] = duplicate
+                    (log or print)(f"♻️ Conteúdo idêntico a um download anterior: {duplicate}")
+            error = None
+        except Exception as e:
+            error = classify_error(e)
+            if job.get('cancel_event') is not None and job['cancel_event'].is_set():
+                result = {'status': 'cancelled'}
+            else:
+                # Apenas a primeira linha da mensagem vai para o manifesto de resultados
+                result = {'status': 'error', 'error_type': type(error).__name__,
+                          'error': error.describe().splitlines()[0] + f" ({e})"}
+        finally:
+            discard_scratch(metrics.job_id)
+            get_disk_space().release(metrics.job_id)
+            if get_tracer():
+                get_tracer().close_job(metrics.job_id)
+    metrics.finish(result['status'], error)
+    get_metrics_recorder().record(metrics)
+    record_history(metrics, job, result)
+    result['job_id'] = metrics.job_id
+    return result
+
+
+def run_manifest(manifest_path, output_path, results_path, workers=2, default_type='mp4',
+                 log=print, stop_event=None, policy='sjf', rows=None):
+    """
+    Processa um manifesto de jobs em streaming
+    
+    As linhas são lidas e validadas uma a uma, enviadas ao DownloadEngine
+    (que segura a leitura quando os workers estão ocupados) e cada resultado
+    é escrito no manifesto de resultados assim que fica pronto.
+    
+    Com a política 'sjf', a duração e o tamanho de cada job são buscados
+    antes de ele entrar na fila (em paralelo, respeitando o limite do host),
+    para que o JobScheduler adiante os jobs curtos.
+    
+    Args:
+        manifest_path: Arquivo .csv ou .jsonl com os jobs
+        output_path: Pasta de destino padrão dos downloads
+        results_path: Arquivo .jsonl ou .csv de resultados
+        workers: Número de downloads simultâneos
+        default_type: Tipo usado quando a linha não informa 'type'
+        log: Função que recebe mensagens de andamento
+        stop_event: threading.Event opcional para interromper a leitura
+        policy: Política da fila ('sjf' = mais curto primeiro, 'fifo' = ordem do manifesto)
+        rows: Pares (número, linha) já prontos, usados no lugar do arquivo (ex: falhas do histórico)
+    
+    Returns:
+        dict: Contagem de jobs por status (ok, error, invalid)
+    """
+    counts = {'ok': 0, 'error': 0, 'invalid': 0}
+    counts_lock = threading.Lock()
+    writer = ResultsWriter(results_path)
+    
+    def on_result(job, result):
+        with counts_lock:
+            counts[result['status']] += 1
+            done = counts['ok'] + counts['error']
+        writer.write({'line': job['line'], 'url': job['url'], **result})
+        if result['status'] == 'ok':
+            log(f"✅ Linha {job['line']}: {result['file']}")
+        else:
+            log(f"❌ Linha {job['line']}: {result['error']}")
+        if done % 100 == 0:
+            log(f"📊 {done} jobs concluídos ({counts['error']} com erro)")
+    
+    engine = DownloadEngine(run_job, workers=workers, on_result=on_result, policy=policy,
+                            on_hold=lambda job: log(f"⏸️ Linha {job['line']} aguardando espaço em disco"))
+    prefetcher = ThreadPoolExecutor(max_workers=MAX_ANALYSIS_WORKERS) if policy == 'sjf' else None
+    # Limita os jobs em análise para que o leitor continue sendo segurado pela fila cheia
+    prefetch_slots = threading.BoundedSemaphore(MAX_PENDING_JOBS)
+    
+    def prefetch_and_submit(job):
+        try:
+            with job['metrics'].stage('metadata'), get_host_limiter(host_key(job['url'])).slot():
+                info = fetch_video_info(job['url'])
+            job['duration'] = info.get('duration')
+            job['filesize'] = info.get('filesize_approx')
+        except Exception:
+            # Sem metadados o job entra com o custo padrão; o download relata o erro, se houver
+            pass
+        try:
+            engine.submit(job)
+        finally:
+            prefetch_slots.release()
+    
+    try:
+        for line_no, row in (iter_manifest(manifest_path) if rows is None else rows):
+            if stop_event is not None and stop_event.is_set():
+                log("⏹️ Leitura do manifesto interrompida")
+                break
+            metrics = JobMetrics()
+            try:
+                with metrics.stage('url_cleaning', span='clean_and_validate_url'):
+                    job = validate_manifest_row(row, default_type)
+            except ValueError as e:
+                with counts_lock:
+                    counts['invalid'] += 1
+                url = row.get('url', '') if isinstance(row, dict) else ''
+                writer.write({'line': line_no, 'url': url, 'status': 'invalid', 'error': str(e)})
+                log(f"⚠️ Linha {line_no} ignorada: {e}")
+                continue
+            metrics.url = job['url']
+            job.update({'line': line_no, 'output_path': output_path, 'metrics': metrics})
+            if prefetcher is None:
+                engine.submit(job)
+            else:
+                prefetch_slots.acquire()
+                prefetcher.submit(contextvars.copy_context().run, prefetch_and_submit, job)
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown(wait=True)
+        engine.close()
+        writer.close()
+    
+    return counts
+
+
+# Extensões das listas de URLs aceitas pela pasta monitorada
+WATCH_SUFFIXES = ('.txt', '.csv', '.jsonl')
+# Intervalo de varredura quando o inotify não está disponível
+WATCH_POLL_SECONDS = 0.25
+# Com inotify, varredura de segurança para eventos perdidos (fila estourada, pasta recriada)
+WATCH_RESCAN_SECONDS = 30.0
+# Sistemas de arquivos (tipo em /proc/mounts) em que o inotify não vê arquivos gravados por outras máquinas
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'ceph', 'glusterfs',
+                       'lustre', 'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs')
+
+
+def filesystem_type(path):
+    """Tipo do sistema de arquivos que contém path, segundo /proc/mounts (None fora do Linux)"""
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    try:
+        with open('/proc/mounts', 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Espaços e outros caracteres especiais vêm como \040 etc.
+                mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+                if inside and len(mount_point) >= len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:
+        return None
+    return fstype
+
+
+class FolderWatcher:
+    """
+    Espera arquivos novos em uma pasta
+    
+    No Linux usa o inotify (via ctypes) e só acorda quando um arquivo termina
+    de ser escrito (IN_CLOSE_WRITE) ou é movido para a pasta (IN_MOVED_TO).
+    Nos demais sistemas, varre a pasta a cada WATCH_POLL_SECONDS e considera
+    pronto o arquivo cujo tamanho e data não mudaram entre duas varreduras.
+    Arquivos ocultos ou temporários (".x", "~x") são ignorados.
+    
+    O inotify só vê o que o próprio kernel grava: numa pasta NFS/SMB os
+    arquivos deixados por outras máquinas não geram eventos, então nesses
+    sistemas de arquivos (NETWORK_FILESYSTEMS) a pasta é varrida. Com o
+    inotify, uma varredura a cada rescan_interval pega o que se perdeu.
+    """
+    
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    def __init__(self, folder, suffixes=WATCH_SUFFIXES, poll_interval=WATCH_POLL_SECONDS, use_inotify=True,
+                 rescan_interval=WATCH_RESCAN_SECONDS):
+        self.folder = str(folder)
+        self.suffixes = suffixes
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        fstype = filesystem_type(self.folder) if use_inotify else None
+        self.network_fs = fstype if fstype in NETWORK_FILESYSTEMS else None
+        self._fd = self._init_inotify() if use_inotify and not self.network_fs else None
+        self._next_rescan = time.monotonic() + rescan_interval
+        # Arquivos que já estavam na pasta são entregues na primeira espera
+        self._ready = set(self._scan())
+        self._seen = {}
+        # Varredura: estado dos arquivos já entregues, para não entregá-los de novo enquanto não mudarem
+        self._delivered = {name: self._state(name) for name in self._ready}
+    
+    @property
+    def backend(self):
+        return 'inotify' if self._fd is not None else 'polling'
+    
+    def _init_inotify(self):
+        """Abre um descritor inotify para a pasta ou devolve None se não for possível"""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd < 0:
+                return None
+            if libc.inotify_add_watch(fd, os.fsencode(self.folder), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+    
+    def _accepts(self, name):
+        return (not name.startswith(('.', '~')) and name.lower().endswith(self.suffixes)
+                and os.path.isfile(os.path.join(self.folder, name)))
+    
+    def _scan(self):
+        return [entry.name for entry in os.scandir(self.folder) if self._accepts(entry.name)]
+    
+    def wait(self, timeout=None):
+        """
+        Espera arquivos prontos
+        
+        Returns:
+            list: Caminhos dos arquivos prontos, em ordem de nome (vazia se o tempo acabar)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ready, self._ready = self._ready, set()
+            if self._fd is None:
+                ready |= self._poll()
+            else:
+                ready |= self._read_events(deadline if deadline is not None and deadline < self._next_rescan
+                                           else self._next_rescan)
+                if time.monotonic() >= self._next_rescan:
+                    self._next_rescan = time.monotonic() + self.rescan_interval
+                    ready |= self._poll()
+            ready = sorted(name for name in ready if self._accepts(name))
+            if ready:
+                # Entregues pelo inotify também contam, para a varredura não entregá-los de novo
+                self._delivered.update((name, self._state(name)) for name in ready)
+                return [os.path.join(self.folder, name) for name in ready]
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+            if self._fd is None:
+                time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+    
+    def _read_events(self, deadline):
+        """Bloqueia no descritor inotify até haver eventos e devolve os nomes dos arquivos"""
+        import select
+        import struct
+        
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not select.select([self._fd], [], [], remaining)[0]:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = struct.unpack_from('iIII', data, offset)
+            offset += 16
+            if mask & self.IN_Q_OVERFLOW:
+                names.update(self._scan())
+            elif length:
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+    
+    def _state(self, name):
+        try:
+            stat = os.stat(os.path.join(self.folder, name))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+    
+    def _poll(self):
+        """Uma varredura: devolve os arquivos que não mudaram desde a anterior"""
+        states = {name: self._state(name) for name in self._scan()}
+        self._delivered = {name: state for name, state in self._delivered.items() if name in states}
+        current = {name: state for name, state in states.items()
+                   if state is not None and self._delivered.get(name) != state}
+        ready = {name for name, state in current.items() if self._seen.get(name) == state}
+        self._delivered.update((name, current[name]) for name in ready)
+        self._seen = {name: state for name, state in current.items() if name not in ready}
+        return ready
+    
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def iter_dropped_file(path):
+    """
+    Lê uma lista de URLs deixada na pasta monitorada, linha a linha
+    
+    Arquivos .txt têm uma ou mais URLs por linha; .csv e .jsonl seguem o
+    formato dos manifestos (e podem informar type, filename etc.).
+    
+    Yields:
+        tuple: (número da linha, dict da linha) ou (número da linha, mensagem de erro)
+    """
+    if not str(path).lower().endswith('.txt'):
+        yield from iter_manifest(path)
+        return
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip().startswith('#'):
+                continue
+            for token in split_url_text(line):
+                yield line_no, {'url': token}
+
+
+def _move_unique(path, folder):
+    """Move um arquivo para a pasta sem sobrescrever outro de mesmo nome"""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(folder, stem + ext)
+    if os.path.exists(target):
+        target = os.path.join(folder, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{new_job_id()[:4]}{ext}")
+    os.replace(path, target)
+    return target
+
+
+def watch_folder(folder, output_path, workers=2, default_type='mp4', log=print, stop_event=None,
+                 watcher=None):
+    """
+    Monitora uma pasta e baixa as URLs dos arquivos deixados nela
+    
+    Cada arquivo novo é movido para processing/ e suas linhas vão para o
+    DownloadEngine à medida que são lidas. Quando o último job do arquivo
+    termina, ele vai para done/ (tudo ok) ou failed/ (algum erro ou linha
+    inválida), acompanhado de <nome>.results.jsonl. Arquivos deixados em
+    processing/ por uma execução interrompida são processados de novo.
+    
+    Args:
+        folder: Pasta monitorada
+        output_path: Pasta de destino dos downloads
+        workers: Downloads simultâneos
+        default_type: Tipo usado quando a linha não informa 'type'
+        log: Função que recebe mensagens de andamento
+        stop_event: threading.Event que encerra o monitoramento (os jobs em andamento terminam)
+        watcher: FolderWatcher a usar (padrão: um novo para a pasta)
+    
+    Returns:
+        dict: Contagem de arquivos por destino (done, failed)
+    """
+    folders = {name: os.path.join(folder, name) for name in ('processing', 'done', 'failed')}
+    for path in folders.values():
+        os.makedirs(path, exist_ok=True)
+    for name in os.listdir(folders['processing']):
+        os.replace(os.path.join(folders['processing'], name), os.path.join(folder, name))
+    
+    stop_event = stop_event or threading.Event()
+    watcher = watcher or FolderWatcher(folder)
+    counts = {'done': 0, 'failed': 0}
+    lock = threading.Lock()
+    
+    def finish(batch):
+        failed = any(result['status'] != 'ok' for result in batch['results'])
+        target = folders['failed' if failed else 'done']
+        moved = _move_unique(batch['path'], target)
+        writer = ResultsWriter(os.path.splitext(moved)[0] + '.results.jsonl')
+        for result in sorted(batch['results'], key=lambda result: result['line']):
+            writer.write(result)
+        writer.close()
+        with lock:
+            counts['failed' if failed else 'done'] += 1
+        ok = sum(1 for result in batch['results'] if result['status'] == 'ok')
+        log(f"{'⚠️' if failed else '✅'} {batch['name']}: {ok}/{len(batch['results'])} ok → {os.path.basename(target)}/")
+    
+    def release(batch, result=None):
+        with lock:
+            if result is not None:
+                batch['results'].append(result)
+            batch['pending'] -= 1
+            last = batch['pending'] == 0
+        if last:
+            finish(batch)
+    
+    def on_result(job, result):
+        release(job['batch'], {'line': job['line'], 'url': job['url'], **result})
+    
+    def ingest(path):
+        name = os.path.basename(path)
+        batch = {'name': name, 'path': _move_unique(path, folders['processing']), 'results': [], 'pending': 1}
+        log(f"📥 {name}: lendo URLs")
+        seen = set()
+        try:
+            for line_no, row in iter_dropped_file(batch['path']):
+                try:
+                    job = validate_manifest_row(row, default_type)
+                except ValueError as e:
+                    url = row.get('url', '') if isinstance(row, dict) else ''
+                    with lock:
+                        batch['results'].append({'line': line_no, 'url': url, 'status': 'invalid', 'error': str(e)})
+                    continue
+                if job['url'] in seen:
+                    continue
+                seen.add(job['url'])
+                job.update({'line': line_no, 'output_path': output_path, 'batch': batch,
+                            'metrics': JobMetrics(url=job['url'])})
+                with lock:
+                    batch['pending'] += 1
+                engine.submit(job)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            with lock:
+                batch['results'].append({'line': 0, 'url': '', 'status': 'invalid', 'error': f"arquivo ilegível: {e}"})
+        release(batch)
+    
+    engine = DownloadEngine(run_job, workers=workers, on_result=on_result, policy='fifo',
+                            on_hold=lambda job: log(f"⏸️ Aguardando espaço em disco: {job['url']}"))
+    network = f", pasta em {watcher.network_fs}" if getattr(watcher, 'network_fs', None) else ""
+    log(f"👀 Monitorando {folder} ({watcher.backend}{network})")
+    try:
+        while not stop_event.is_set():
+            for path in watcher.wait(timeout=1.0):
+                ingest(path)
+    except KeyboardInterrupt:
+        log("\n⏹️ Encerrando: aguardando os downloads em andamento...")
+    finally:
+        watcher.close()
+        engine.close()
+    return counts
+
+
+# Validade do lease de um job no armazenamento compartilhado; o worker o renova a cada terço desse tempo
+STORE_LEASE_SECONDS = 60.0
+# Vezes que um job pode ser reivindicado (worker morto = lease vencido) antes de ser dado como erro
+STORE_MAX_CLAIMS = 3
+# Espera entre consultas de um worker ocioso ao armazenamento
+WORKER_POLL_SECONDS = 2.0
+
+
+class JobStore:
+    """
+    Fila de jobs em um banco SQLite compartilhado entre processos e máquinas
+    
+    Cada worker reivindica um job por vez com um lease (prazo) que ele renova
+    enquanto o download anda. Se o worker morrer, o lease vence e o job volta
+    para a fila na próxima reivindicação de qualquer outro worker. A ordem
+    segue a mesma chave do JobScheduler (custo + envelhecimento, ou chegada).
+    
+    O arquivo pode ficar em um volume compartilhado desde que ele respeite
+    locks de arquivo (NFSv4, SMB); por isso o modo de journal padrão é
+    mantido em vez do WAL, que exige memória compartilhada na mesma máquina.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            line INTEGER,
+            url TEXT NOT NULL,
+            job TEXT NOT NULL,
+            sort_key REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            lease_until REAL,
+            claims INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            enqueued_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, sort_key);
+    """
+    
+    def __init__(self, path, lease_seconds=STORE_LEASE_SECONDS, max_claims=STORE_MAX_CLAIMS, clock=time.time):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_claims = max_claims
+        # Relógio de parede: os leases são comparados entre máquinas diferentes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.executescript(self.SCHEMA)
+    
+    @contextmanager
+    def _transaction(self):
+        """Transação com lock de escrita desde o início, para que duas reivindicações não peguem o mesmo job"""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+    
+    def enqueue(self, job, line=None, policy='sjf'):
+        """Grava um job validado (validate_manifest_row) na fila e devolve seu job_id"""
+        now = self.clock()
+        job_id = job.get('job_id') or new_job_id()
+        if policy == 'fifo':
+            sort_key = now
+        else:
+            sort_key = estimate_job_cost(job) + SCHEDULER_AGING_RATE * now
+        stored = {key: job[key] for key in MANIFEST_JOB_KEYS if key in job}
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (job_id, line, url, job, sort_key, enqueued_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, line, job['url'], json.dumps(stored), sort_key, now, now)
+            )
+        return job_id
+    
+    def claim(self, worker):
+        """
+        Reivindica o próximo job da fila para um worker
+        
+        Antes, devolve à fila os jobs cujo lease venceu (ou os dá como erro
+        depois de max_claims reivindicações).
+        
+        Returns:
+            dict: Job com 'job_id' e 'line', ou None se a fila estiver vazia
+        """
+        now = self.clock()
+        with self._transaction() as db:
+            lost = json.dumps({'status': 'error', 'error_type': 'WorkerLostError',
+                               'error': f"o worker parou de responder {self.max_claims} vezes"})
+            db.execute(
+                "UPDATE jobs SET status = 'error', worker = NULL, lease_until = NULL, result = ?, updated_at = ? "
+                "WHERE status = 'running' AND lease_until < ? AND claims >= ?",
+                (lost, now, now, self.max_claims)
+            )
+            db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = 'running' AND lease_until < ?",
+                (now, now)
+            )
+            row = db.execute(
+                "SELECT job_id, line, job FROM jobs WHERE status = 'queued' ORDER BY sort_key LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, claims = claims + 1, updated_at = ? "
+                "WHERE job_id = ?",
+                (worker, now + self.lease_seconds, now, row[0])
+            )
+        job = json.loads(row[2])
+        if job.get('clip_range'):
+            job['clip_range'] = tuple(job['clip_range'])
+        job.update(job_id=row[0], line=row[1])
+        return job
+    
+    def heartbeat(self, job_id, worker):
+        """Renova o lease; False se o job não pertence mais ao worker (lease vencido e reivindicado)"""
+        now = self.clock()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, worker)
+            )
+        return cursor.rowcount == 1
+    
+    def complete(self, job_id, worker, result):
+        """
+        Grava o resultado de um job do worker
+        
+        Um job cancelado (ex: worker encerrado com Ctrl+C) volta para a fila.
+        
+        Returns:
+            bool: False se o job não pertence mais ao worker (o resultado é descartado)
+        """
+        now = self.clock()
+        with self._transaction() as db:
+            if result['status'] == 'cancelled':
+                cursor = db.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, claims = claims - 1, "
+                    "updated_at = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+                    (now, job_id, worker)
+                )
+            else:
+                cursor = db.execute(
+                    "UPDATE jobs SET status = ?, lease_until = NULL, result = ?, updated_at = ? "
+                    "WHERE job_id = ? AND worker = ? AND status = 'running'",
+                    (result['status'], json.dumps(result, ensure_ascii=False), now, job_id, worker)
+                )
+        return cursor.rowcount == 1
+    
+    def counts(self):
+        """Quantidade de jobs por status"""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    
+    def is_drained(self):
+        """True quando não há jobs na fila nem em andamento em nenhum worker"""
+        counts = self.counts()
+        return not counts.get('queued') and not counts.get('running')
+    
+    def results(self):
+        """Resultados dos jobs terminados, na ordem do manifesto"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, line, url, worker, result FROM jobs WHERE result IS NOT NULL ORDER BY line, enqueued_at"
+            ).fetchall()
+        for job_id, line, url, worker, result in rows:
+            yield {'line': line, 'url': url, **json.loads(result), 'job_id': job_id, 'worker': worker}
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def enqueue_manifest(store, manifest_path, default_type='mp4', policy='sjf', log=print):
+    """
+    Grava as linhas válidas de um manifesto no armazenamento compartilhado
+    
+    Returns:
+        dict: Contagem de linhas enfileiradas e inválidas
+    """
+    counts = {'queued': 0, 'invalid': 0}
+    for line_no, row in iter_manifest(manifest_path):
+        try:
+            job = validate_manifest_row(row, default_type)
+        except ValueError as e:
+            counts['invalid'] += 1
+            log(f"⚠️ Linha {line_no} ignorada: {e}")
+            continue
+        store.enqueue(job, line=line_no, policy=policy)
+        counts['queued'] += 1
+    return counts
+
+
+def default_worker_id():
+    """Identificador do worker: máquina e processo"""
+    import socket
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(store, output_path, workers=2, worker_id=None, log=print, stop_event=None,
+               exit_when_idle=False, poll_interval=WORKER_POLL_SECONDS):
+    """
+    Executa jobs reivindicados do armazenamento compartilhado
+    
+    Cada uma das `workers` threads reivindica um job por vez; uma thread
+    separada renova os leases dos jobs em andamento. Se um lease for perdido
+    (ex: o processo ficou parado mais que o prazo e outro worker assumiu o
+    job), o download é cancelado e o resultado descartado.
+    
+    Args:
+        store: JobStore compartilhado
+        output_path: Pasta de destino (a mesma pasta compartilhada permite retomar .part de outro worker)
+        workers: Downloads simultâneos deste processo
+        worker_id: Nome do worker no armazenamento (padrão: máquina-pid)
+        log: Função que recebe mensagens de andamento
+        stop_event: threading.Event que encerra o worker; jobs em andamento voltam para a fila
+        exit_when_idle: Sai quando não houver jobs na fila nem em andamento em nenhum worker
+        poll_interval: Espera entre consultas quando a fila está vazia
+    
+    Returns:
+        dict: Contagem dos jobs executados por este worker, por status
+    """
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    counts = {'ok': 0, 'error': 0, 'cancelled': 0, 'lost': 0}
+    held = {}
+    lock = threading.Lock()
+    
+    def renew_leases():
+        while not stop_event.wait(store.lease_seconds / 3):
+            with lock:
+                current = list(held.items())
+            for job_id, cancel_event in current:
+                if not store.heartbeat(job_id, worker_id):
+                    log(f"⚠️ Lease do job {job_id} perdido; cancelando o download")
+                    cancel_event.set()
+    
+    def cancellable_hook(cancel_event):
+        def hook(d):
+            if cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Lease perdido ou worker encerrado")
+        return hook
+    
+    def work():
+        while not stop_event.is_set():
+            job = store.claim(worker_id)
+            if job is None:
+                if exit_when_idle and store.is_drained():
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            
+            job_id = job['job_id']
+            cancel_event = threading.Event()
+            with lock:
+                held[job_id] = cancel_event
+            job.update({
+                'output_path': output_path,
+                'metrics': JobMetrics(job_id=job_id, url=job['url']),
+                'cancel_event': cancel_event,
+                'progress_hook': cancellable_hook(cancel_event),
+            })
+            try:
+                if get_disk_space().wait(job, log=lambda message: log(f"{message}: job {job_id}"),
+                                         stop_event=cancel_event):
+                    log(f"▶️ Job {job_id} (linha {job['line']}): {job['url']}")
+                    result = run_job(job)
+                else:
+                    result = {'status': 'cancelled'}
+            except Exception as e:
+                result = {'status': 'error', 'error': str(e)}
+            finally:
+                with lock:
+                    held.pop(job_id, None)
+            
+            kept = store.complete(job_id, worker_id, result)
+            with lock:
+                counts[result['status'] if kept else 'lost'] += 1
+            if not kept:
+                log(f"⚠️ Job {job_id} foi assumido por outro worker; resultado descartado")
+            elif result['status'] == 'ok':
+                log(f"✅ Job {job_id}: {result['file']}")
+            elif result['status'] == 'error':
+                log(f"❌ Job {job_id}: {result['error']}")
+    
+    def stop_all():
+        stop_event.set()
+        with lock:
+            for cancel_event in held.values():
+                cancel_event.set()
+    
+    heartbeat = threading.Thread(target=renew_leases, name='lease-heartbeat', daemon=True)
+    heartbeat.start()
+    threads = [threading.Thread(target=work, name=f"store-worker-{i + 1}", daemon=True)
+               for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        log("\n⏹️ Encerrando: devolvendo os jobs em andamento para a fila...")
+        stop_all()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_event.set()
+        heartbeat.join()
+    return counts
+
+
+class DownloadThread(QThread):
+    """Thread para executar o download sem bloquear a interface"""
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+    download_progress = pyqtSignal(int)
+    
+    def __init__(self, url, output_path, download_type, custom_filename=None, metrics=None, expected_size=None):
+        super().__init__()
+        self.url = url
+        self.output_path = output_path
+        self.download_type = download_type
+        self.custom_filename = custom_filename
+        self.expected_size = expected_size
+        self.metrics = metrics or JobMetrics()
+        self.metrics.url = url
+        self.metrics.download_type = download_type
+        
+    def progress_hook(self, d):
+        """Callback para atualizar o progresso do download"""
+        if d['status'] == 'downloading':
+            try:
+                # Calcula a porcentagem do download
+                if 'total_bytes' in d:
                     percent = (d['downloaded_bytes'] / d['total_bytes']) * 100
                 elif 'total_bytes_estimate' in d:
                     percent = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
@@ -304,218 +5505,216 @@ class DownloadThread(QThread):
             self.download_progress.emit(100)
     
     def run(self):
-        """Executa o download"""
-        try:
-            # Verifica se é um link do Streamyard e extrai o .mp4 automaticamente
-            url_to_download = self.url
-            is_streamyard = 'streamyard.com' in self.url.lower()
-            
-            if is_streamyard and '.mp4' not in self.url.lower():
-                self.progress.emit("🔍 Detectado link do Streamyard! Extraindo URL do vídeo...")
-                extracted_url = extract_streamyard_url(self.url)
-                
-                if extracted_url:
-                    url_to_download = extracted_url
-                    self.progress.emit(f"✅ URL do vídeo extraída com sucesso!")
-                    self.progress.emit(f"📡 Vídeo: {extracted_url[:80]}...")
-                else:
-                    self.finished.emit(False, 
-                        "❌ Não foi possível extrair o link do vídeo do Streamyard.\n\n"
-                        "Possíveis causas:\n"
-                        "1. O vídeo não está mais disponível\n"
-                        "2. Problemas de conexão\n"
-                        "3. Streamyard mudou a estrutura da página\n\n"
-                        "Tente:\n"
-                        "• Verificar se o vídeo está disponível no navegador\n"
-                        "• Tentar novamente em alguns instantes\n"
-                        "• Copiar manualmente o link .mp4 usando F12 → Rede"
+        """Executa o download (sob cProfile/tracemalloc se o perfilamento estiver ligado)"""
+        if get_profile_dir():
+            self.progress.emit("🔬 Perfilamento ligado para este download")
+            profile_job(self.metrics.job_id, self.run_download, log=self.progress.emit)
+        else:
+            self.run_download()
+    
+    def run_download(self):
+        """Executa o download e emite o resultado"""
+        job_id = self.metrics.job_id
+        with job_context(job_id):
+            try:
+                job = {'url': self.url, 'output_path': self.output_path, 'download_type': self.download_type,
+                       'filesize': self.expected_size, 'metrics': self.metrics}
+                get_disk_space().wait(job, log=self.progress.emit)
+                if job.get('space_error'):
+                    raise job['space_error']
+                with trace_span('job', url=self.url, download_type=self.download_type):
+                    filename = run_with_retry(
+                        lambda: download_media(
+                            self.url, self.output_path, self.download_type, self.custom_filename,
+                            progress_hook=self.progress_hook, log=self.progress.emit, metrics=self.metrics
+                        ),
+                        self.url, log=self.progress.emit,
+                        on_retry=lambda attempt: setattr(self.metrics, 'attempts', attempt)
                     )
-                    return
-            
-            # Configurações base do yt-dlp com melhor compatibilidade
-            ydl_opts = {
-                'progress_hooks': [self.progress_hook],
-                'quiet': True,
-                'no_warnings': True,
-                'noplaylist': True,  # --no-playlist
-                'socket_timeout': 30,
-                'retries': 3,
-                'fragment_retries': 5,
-                # Configurações para evitar bloqueio de bot e erro 403
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android', 'ios'],  # Usa clientes móveis mais confiáveis
-                        'skip': ['hls'],  # Pula HLS quando possível
-                    }
-                },
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Linux; Android 11; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.120 Mobile Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Cache-Control': 'max-age=0',
-                },
-                # Configurações de cookies para contornar detecção
-                'cookiefile': None,
-                'nocheckcertificate': True,
-            }
-            
-            # Configurações específicas por tipo de download
-            if self.download_type == 'mp4':
-                # Define o nome do arquivo
-                if self.custom_filename:
-                    output_template = os.path.join(self.output_path, f"{self.custom_filename}.%(ext)s")
-                elif is_streamyard:
-                    # Para Streamyard, usa um nome genérico se não tiver custom
-                    from datetime import datetime
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    output_template = os.path.join(self.output_path, f"streamyard_{timestamp}.%(ext)s")
-                else:
-                    output_template = os.path.join(self.output_path, '%(title)s.%(ext)s')
-                
-                # Parâmetros: -f "bv*[ext=mp4]+ba[ext=m4a]/mp4" --merge-output-format mp4 --no-playlist
-                ydl_opts.update({
-                    'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                    'outtmpl': output_template,
-                    'merge_output_format': 'mp4',
-                })
-                self.progress.emit("Iniciando download do vídeo em MP4...")
-                
-            elif self.download_type == 'mp3':
-                # Define o nome do arquivo
-                if self.custom_filename:
-                    output_template = os.path.join(self.output_path, f"{self.custom_filename}.%(ext)s")
-                elif is_streamyard:
-                    # Para Streamyard, usa um nome genérico se não tiver custom
-                    from datetime import datetime
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    output_template = os.path.join(self.output_path, f"streamyard_audio_{timestamp}.%(ext)s")
-                else:
-                    output_template = os.path.join(self.output_path, '%(title)s.%(ext)s')
-                
-                # Parâmetros: -f bestaudio -x --audio-format mp3 --audio-quality 0 --no-playlist
-                ydl_opts.update({
-                    'format': 'bestaudio',
-                    'outtmpl': output_template,
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '0',  # 0 = melhor qualidade
-                    }],
-                    'extractaudio': True,  # -x
-                })
-                self.progress.emit("Iniciando extração de áudio em MP3...")
-            
-            # Executa o download
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url_to_download, download=True)
-                
-                # Determina o nome do arquivo final
-                if self.custom_filename:
-                    # Se há nome customizado
-                    if self.download_type == 'mp3':
-                        filename = os.path.join(self.output_path, f"{self.custom_filename}.mp3")
-                    else:
-                        filename = os.path.join(self.output_path, f"{self.custom_filename}.mp4")
-                elif is_streamyard:
-                    # Se é Streamyard sem nome customizado
-                    from datetime import datetime
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    if self.download_type == 'mp3':
-                        filename = os.path.join(self.output_path, f"streamyard_audio_{timestamp}.mp3")
-                    else:
-                        filename = os.path.join(self.output_path, f"streamyard_{timestamp}.mp4")
-                else:
-                    # Usa o nome que o yt-dlp gerou
-                    filename = ydl.prepare_filename(info)
-                    # Para MP3, o nome do arquivo muda após a conversão
-                    if self.download_type == 'mp3':
-                        filename = os.path.splitext(filename)[0] + '.mp3'
-                
+                self.record_metrics('ok', file=filename)
                 self.finished.emit(True, f"✅ Download concluído!\n\n📁 Arquivo salvo em:\n{filename}")
-                
-        except Exception as e:
-            import traceback
-            error_str = str(e).lower()
-            
-            # Tratamento específico para erros comuns
-            if any(phrase in error_str for phrase in ['sign in to confirm', 'not a bot', 'captcha']):
-                error_message = (
-                    "❌ YouTube detectou atividade automatizada\n\n"
-                    "💡 Soluções recomendadas:\n"
-                    "1. Aguarde alguns minutos e tente novamente\n"
-                    "2. Use uma conexão VPN diferente\n"
-                    "3. Tente acessar o vídeo no navegador primeiro\n"
-                    "4. Se persistir, o vídeo pode ter restrições regionais\n\n"
-                    f"Erro técnico: {str(e)}"
-                )
-            elif any(phrase in error_str for phrase in ['private video', 'unavailable', 'removed']):
-                error_message = (
-                    "❌ Vídeo não disponível\n\n"
-                    "Possíveis causas:\n"
-                    "• Vídeo foi removido ou tornado privado\n"
-                    "• Restrições regionais ou de idade\n"
-                    "• Link expirado ou inválido\n\n"
-                    f"Erro técnico: {str(e)}"
-                )
-            elif any(phrase in error_str for phrase in ['network', 'connection', 'timeout', 'resolve']):
-                error_message = (
-                    "❌ Problema de conexão\n\n"
-                    "💡 Soluções:\n"
-                    "1. Verifique sua conexão com a internet\n"
-                    "2. Tente novamente em alguns instantes\n"
-                    "3. Verifique se não há bloqueio de firewall\n"
-                    "4. Se usar VPN, tente desconectar temporariamente\n\n"
-                    f"Erro técnico: {str(e)}"
-                )
-            elif 'http error 403' in error_str or 'forbidden' in error_str:
-                error_message = (
-                    "❌ Acesso negado (Erro 403)\n\n"
-                    "💡 Soluções:\n"
-                    "1. Aguarde alguns minutos e tente novamente\n"
-                    "2. O vídeo pode ter restrições geográficas\n"
-                    "3. Tente usar uma VPN de outro país\n"
-                    "4. Verifique se o vídeo ainda está disponível\n\n"
-                    f"Erro técnico: {str(e)}"
-                )
-            elif 'http error 429' in error_str or 'too many requests' in error_str:
-                error_message = (
-                    "❌ Muitas requisições (Erro 429)\n\n"
-                    "💡 Solução:\n"
-                    "• Aguarde 15-30 minutos antes de tentar novamente\n"
-                    "• O servidor está limitando o número de downloads\n\n"
-                    f"Erro técnico: {str(e)}"
-                )
-            else:
-                # Erro genérico com mais detalhes
-                error_details = traceback.format_exc()
-                error_message = (
-                    f"❌ Erro durante o download:\n\n{str(e)}\n\n"
-                    "💡 Sugestões gerais:\n"
-                    "1. Verifique se a URL está correta\n"
-                    "2. Tente novamente em alguns minutos\n"
-                    "3. Verifique sua conexão com a internet\n"
-                    "4. Se persistir, o vídeo pode ter restrições\n\n"
-                    f"Detalhes técnicos:\n{error_details}"
-                )
-            
-            self.finished.emit(False, error_message)
+            except Exception as e:
+                error = classify_error(e)
+                self.record_metrics('error', error)
+                self.finished.emit(False, error.describe())
+            finally:
+                discard_scratch(job_id)
+                get_disk_space().release(job_id)
+                if get_tracer():
+                    get_tracer().close_job(job_id)
+    
+    def record_metrics(self, status, error=None, file=None):
+        """Encerra e grava as métricas e o histórico do job"""
+        self.metrics.finish(status, error)
+        get_metrics_recorder().record(self.metrics)
+        job = {'url': self.url, 'download_type': self.download_type, 'custom_filename': self.custom_filename}
+        record_history(self.metrics, job, {'file': file, 'error': str(error) if error else None})
+        total = self.metrics.to_dict()['total_seconds']
+        self.progress.emit(f"⏱️ Tempo total do job: {total:.1f}s")
+
+
+class ManifestThread(QThread):
+    """Thread que processa um manifesto de jobs sem bloquear a interface"""
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(dict)
+    
+    def __init__(self, manifest_path, output_path, results_path, default_type='mp4', workers=2):
+        super().__init__()
+        self.manifest_path = manifest_path
+        self.output_path = output_path
+        self.results_path = results_path
+        self.default_type = default_type
+        self.workers = workers
+        self.stop_event = threading.Event()
+    
+    def stop(self):
+        """Para de ler novas linhas (os jobs já enviados terminam normalmente)"""
+        self.stop_event.set()
+    
+    def run(self):
+        """Processa o manifesto"""
+        try:
+            counts = run_manifest(
+                self.manifest_path, self.output_path, self.results_path,
+                workers=self.workers, default_type=self.default_type,
+                log=self.progress.emit, stop_event=self.stop_event
+            )
+        except (OSError, csv.Error) as e:
+            self.progress.emit(f"❌ Erro ao ler o manifesto: {e}")
+            counts = {}
+        self.finished.emit(counts)
+
+
+class UrlLineEdit(QLineEdit):
+    """Campo de URL que desvia colagens com várias URLs para o lote"""
+    multiline_pasted = pyqtSignal(str)
+    
+    def keyPressEvent(self, event):
+        """Intercepta Ctrl+V quando a área de transferência tem mais de uma URL"""
+        if event.matches(QKeySequence.StandardKey.Paste):
+            text = QApplication.clipboard().text()
+            if len(split_url_text(text)) > 1:
+                self.multiline_pasted.emit(text)
+                return
+        super().keyPressEvent(event)
+
+
+class HistoryDialog(QDialog):
+    """Janela de busca no histórico de jobs, com repetição em lote das falhas"""
+    retry_requested = pyqtSignal(list)
+    
+    STATUS_FILTERS = (("Todos", None), ("✅ Concluídos", 'ok'), ("❌ Com erro", 'error'), ("⏹️ Cancelados", 'cancelled'))
+    STATUS_LABELS = {'ok': "✅ Concluído", 'error': "❌ Erro", 'cancelled': "⏹️ Cancelado"}
+    # Linhas mostradas por busca (as mais recentes)
+    MAX_ROWS = 500
+    
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("📜 Histórico de Jobs")
+        self.resize(950, 520)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Buscar por URL, ID do vídeo ou trecho do título...")
+        self.status_combo = QComboBox()
+        for label, _ in self.STATUS_FILTERS:
+            self.status_combo.addItem(label)
+        self.since_input = QDateTimeEdit(QDateTime.currentDateTime().addDays(-7))
+        self.since_input.setCalendarPopup(True)
+        self.since_input.setDisplayFormat("dd/MM/yyyy HH:mm")
+        
+        filters = QHBoxLayout()
+        filters.addWidget(self.search_input, 1)
+        filters.addWidget(self.status_combo)
+        filters.addWidget(QLabel("Desde:"))
+        filters.addWidget(self.since_input)
+        
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Data", "Status", "Título", "URL", "Erro"])
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        
+        self.count_label = QLabel()
+        self.retry_button = QPushButton("🔁 Repetir falhas desde a data")
+        self.retry_button.setToolTip("Adiciona à fila as URLs cuja última tentativa desde a data falhou")
+        self.retry_button.clicked.connect(self.retry_failed)
+        footer = QHBoxLayout()
+        footer.addWidget(self.count_label, 1)
+        footer.addWidget(self.retry_button)
+        
+        layout = QVBoxLayout()
+        layout.addLayout(filters)
+        layout.addWidget(self.table)
+        layout.addLayout(footer)
+        self.setLayout(layout)
+        
+        # Busca enquanto digita, sem consultar o banco a cada tecla
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.refresh)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.status_combo.currentIndexChanged.connect(self.refresh)
+        self.since_input.dateTimeChanged.connect(self.search_timer.start)
+        self.refresh()
+    
+    def since(self):
+        return self.since_input.dateTime().toSecsSinceEpoch()
+    
+    def refresh(self):
+        """Refaz a busca com os filtros atuais"""
+        from datetime import datetime
+        status = self.STATUS_FILTERS[self.status_combo.currentIndex()][1]
+        entries = self.history.search(self.search_input.text(), status=status, since=self.since(), limit=self.MAX_ROWS)
+        self.table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            values = (
+                datetime.fromtimestamp(entry['finished_at']).strftime('%d/%m/%Y %H:%M'),
+                self.STATUS_LABELS.get(entry['status'], entry['status']),
+                entry['title'] or '',
+                entry['url'],
+                entry['error'] or entry['error_type'] or '',
+            )
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        more = " (mostrando os mais recentes)" if len(entries) == self.MAX_ROWS else ""
+        self.count_label.setText(f"{len(entries)} jobs{more}")
+    
+    def retry_failed(self):
+        """Envia para a fila da janela principal as falhas desde a data escolhida"""
+        rows = self.history.failed_since(self.since())
+        if not rows:
+            QMessageBox.information(self, "Histórico", "Nenhuma falha para repetir desde a data escolhida.")
+            return
+        self.retry_requested.emit(rows)
 
 
 class YouTubeDownloaderGUI(QMainWindow):
     """Interface gráfica principal do YouTube Downloader"""
     
-    def __init__(self):
+    def __init__(self, output_path=None, default_type='mp4', workers=2):
+        """
+        Args:
+            output_path: Pasta de destino inicial (padrão: ~/Downloads)
+            default_type: Tipo marcado ao abrir ('mp4' ou 'mp3')
+            workers: Downloads simultâneos ao processar um manifesto
+        """
         super().__init__()
+        self.initial_output_path = output_path or str(Path.home() / "Downloads")
+        self.default_type = default_type
+        self.workers = workers
         self.download_thread = None
         self.video_info_thread = None
+        self.batch_info_thread = None
+        self.manifest_thread = None
         self.suggested_filename = ""
+        # Fila de downloads em lote (cada item corresponde a uma linha da tabela)
+        self.jobs = []
+        self.batch_rows = []
+        self.queue_pending = []
+        self.queue_current_row = None
         self.init_ui()
         
     def init_ui(self):
@@ -618,6 +5817,33 @@ class YouTubeDownloaderGUI(QMainWindow):
                     stop:0 #4a9eff, stop:1 #64b5f6);
                 border-radius: 5px;
             }
+            QPlainTextEdit {
+                background-color: #2d2d2d;
+                border: 3px solid #4a4a4a;
+                border-radius: 8px;
+                padding: 10px;
+                color: #ffffff;
+                font-size: 12pt;
+            }
+            QPlainTextEdit:focus {
+                border: 3px solid #4a9eff;
+            }
+            QTableWidget {
+                background-color: #2d2d2d;
+                border: 3px solid #4a4a4a;
+                border-radius: 8px;
+                color: #ffffff;
+                font-size: 11pt;
+                gridline-color: #3d3d3d;
+                selection-background-color: #4a9eff;
+            }
+            QHeaderView::section {
+                background-color: #353535;
+                color: #4a9eff;
+                font-weight: bold;
+                border: none;
+                padding: 6px;
+            }
             QTextEdit {
                 background-color: #2d2d2d;
                 border: 3px solid #4a4a4a;
@@ -701,10 +5927,11 @@ class YouTubeDownloaderGUI(QMainWindow):
         url_layout = QVBoxLayout()
         url_layout.setSpacing(10)
         
-        self.url_input = QLineEdit()
+        self.url_input = UrlLineEdit()
         self.url_input.setPlaceholderText("Cole aqui o link do vídeo...")
         self.url_input.setMinimumHeight(50)
         self.url_input.textChanged.connect(self.on_url_changed)
+        self.url_input.multiline_pasted.connect(self.on_multiline_paste)
         
         # Botões para analisar vídeo e download direto
         analyze_layout = QHBoxLayout()
@@ -831,7 +6058,7 @@ class YouTubeDownloaderGUI(QMainWindow):
         path_layout = QHBoxLayout()
         
         self.path_input = QLineEdit()
-        self.path_input.setText(str(Path.home() / "Downloads"))
+        self.path_input.setText(self.initial_output_path)
         self.path_input.setMinimumHeight(50)
         
         browse_button = QPushButton("Procurar")
@@ -868,9 +6095,10 @@ class YouTubeDownloaderGUI(QMainWindow):
         self.button_group = QButtonGroup()
         
         self.radio_mp4 = QRadioButton("🎥 Vídeo MP4 (melhor qualidade disponível)")
-        self.radio_mp4.setChecked(True)
+        self.radio_mp4.setChecked(self.default_type != 'mp3')
         
         self.radio_mp3 = QRadioButton("🎵 Áudio MP3 (apenas áudio, alta qualidade)")
+        self.radio_mp3.setChecked(self.default_type == 'mp3')
         
         self.button_group.addButton(self.radio_mp4)
         self.button_group.addButton(self.radio_mp3)
@@ -880,6 +6108,78 @@ class YouTubeDownloaderGUI(QMainWindow):
         type_group.setLayout(type_layout)
         main_layout.addWidget(type_group)
         
+        # Grupo: Lote de URLs
+        batch_group = QGroupBox("📋 Lote de URLs")
+        batch_layout = QVBoxLayout()
+        batch_layout.setSpacing(10)
+        
+        batch_hint = QLabel("Cole várias URLs (uma por linha) ou importe um arquivo .txt/.csv")
+        batch_hint_font = QFont()
+        batch_hint_font.setPointSize(12)
+        batch_hint.setFont(batch_hint_font)
+        batch_hint.setStyleSheet("color: #aaaaaa; font-weight: normal;")
+        batch_hint.setWordWrap(True)
+        
+        self.batch_input = QPlainTextEdit()
+        self.batch_input.setPlaceholderText("https://www.youtube.com/watch?v=...\nhttps://youtu.be/...")
+        self.batch_input.setMinimumHeight(110)
+        
+        batch_button_style = """
+            QPushButton {
+                background-color: #4a9eff;
+                color: #ffffff;
+                border: none;
+                border-radius: 8px;
+                font-weight: bold;
+                padding: 8px 14px;
+            }
+            QPushButton:hover {
+                background-color: #2979ff;
+            }
+            QPushButton:disabled {
+                background-color: #3d3d3d;
+                color: #666666;
+            }
+        """
+        batch_buttons_layout = QHBoxLayout()
+        
+        self.import_urls_button = QPushButton("📂 Importar .txt/.csv")
+        self.import_urls_button.clicked.connect(self.import_url_file)
+        
+        self.analyze_batch_button = QPushButton("🔍 Analisar Lote")
+        self.analyze_batch_button.clicked.connect(self.analyze_batch)
+        
+        self.download_queue_button = QPushButton("⬇️ Baixar Fila")
+        self.download_queue_button.clicked.connect(self.start_queue_download)
+        
+        self.clear_queue_button = QPushButton("🗑️ Limpar Fila")
+        self.clear_queue_button.clicked.connect(self.clear_queue)
+        
+        self.manifest_button = QPushButton("📑 Importar Manifesto")
+        self.manifest_button.clicked.connect(self.import_manifest)
+        
+        for button in (self.import_urls_button, self.analyze_batch_button,
+                       self.download_queue_button, self.clear_queue_button,
+                       self.manifest_button):
+            button.setMinimumHeight(42)
+            button.setStyleSheet(batch_button_style)
+            batch_buttons_layout.addWidget(button)
+        
+        self.job_table = QTableWidget(0, 4)
+        self.job_table.setHorizontalHeaderLabels(["Status", "Título", "Duração", "URL"])
+        self.job_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.job_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.job_table.setMinimumHeight(180)
+        
+        batch_layout.addWidget(batch_hint)
+        batch_layout.addWidget(self.batch_input)
+        batch_layout.addLayout(batch_buttons_layout)
+        batch_layout.addWidget(self.job_table)
+        batch_group.setLayout(batch_layout)
+        main_layout.addWidget(batch_group)
+        
         # Barra de progresso
         progress_label = QLabel("⚡ Progresso do Download:")
         progress_font = QFont()
@@ -950,12 +6250,99 @@ class YouTubeDownloaderGUI(QMainWindow):
         
         central_widget.setLayout(main_layout)
         
+        self.init_history_menu()
+        self.init_debug_menu()
+        
         # Log inicial
         self.add_log("✅ Aplicação iniciada e pronta para uso!")
         self.add_log("ℹ️ Cole uma URL e clique em:")
         self.add_log("   📹 'Analisar Vídeo' para ver detalhes (opcional)")
         self.add_log("   ⚡ 'Download Direto' para baixar sem análise")
     
+    def init_history_menu(self):
+        """Cria o menu do histórico de jobs"""
+        history_menu = self.menuBar().addMenu("📜 Histórico")
+        history_action = QAction("Buscar no histórico...", self)
+        history_action.setShortcut(QKeySequence("Ctrl+H"))
+        history_action.triggered.connect(self.open_history)
+        history_menu.addAction(history_action)
+        self.history_dialog = None
+    
+    def open_history(self):
+        """Abre (ou traz para frente) a janela do histórico"""
+        if self.history_dialog is None:
+            self.history_dialog = HistoryDialog(get_history(), self)
+            self.history_dialog.retry_requested.connect(self.queue_failed_jobs)
+        else:
+            self.history_dialog.refresh()
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+    
+    def queue_failed_jobs(self, rows):
+        """Adiciona à fila os jobs que falharam, vindos do histórico"""
+        queued = {job['url'] for job in self.jobs}
+        added = 0
+        for row in rows:
+            if row['url'] in queued:
+                continue
+            index = self.add_job_row(row['url'])
+            self.jobs[index]['filename'] = row.get('filename')
+            self.set_job_status(index, 'queued', "🔁 Repetir")
+            queued.add(row['url'])
+            added += 1
+        self.add_log(f"🔁 {added} falhas do histórico adicionadas à fila. Clique em '⬇️ Baixar Fila' para repeti-las")
+    
+    def init_debug_menu(self):
+        """Cria o menu de depuração (perfilamento dos downloads)"""
+        debug_menu = self.menuBar().addMenu("🐞 Depuração")
+        
+        self.profile_action = QAction("Perfilar downloads (cProfile + tracemalloc)", self)
+        self.profile_action.setCheckable(True)
+        self.profile_action.setChecked(get_profile_dir() is not None)
+        self.profile_action.toggled.connect(self.toggle_profiling)
+        debug_menu.addAction(self.profile_action)
+        
+        self.trace_action = QAction("Gravar traces dos jobs (formato Chrome)", self)
+        self.trace_action.setCheckable(True)
+        self.trace_action.setChecked(get_tracer() is not None)
+        self.trace_action.toggled.connect(self.toggle_tracing)
+        debug_menu.addAction(self.trace_action)
+        
+        self.hedge_action = QAction("Extração paralela de player_client (YouTube)", self)
+        self.hedge_action.setCheckable(True)
+        self.hedge_action.setChecked(hedged_extraction_enabled())
+        self.hedge_action.toggled.connect(self.toggle_hedged_extraction)
+        debug_menu.addAction(self.hedge_action)
+    
+    def toggle_hedged_extraction(self, enabled):
+        """Liga/desliga a disputa entre configurações de player_client nas próximas extrações"""
+        if enabled:
+            os.environ[HEDGE_ENV_VAR] = '1'
+            order = get_client_stats().order(PLAYER_CLIENT_CANDIDATES)
+            self.add_log(f"⚡ Extração paralela ligada. Ordem atual: {' → '.join(','.join(c) for c in order)}")
+        else:
+            os.environ.pop(HEDGE_ENV_VAR, None)
+            self.add_log("⚡ Extração paralela desligada")
+    
+    def toggle_tracing(self, enabled):
+        """Liga/desliga a gravação de traces dos próximos jobs"""
+        if enabled:
+            enable_tracing()
+            self.add_log(f"🧵 Traces ligados. Abra os arquivos de {os.environ[TRACE_ENV_VAR]} em chrome://tracing ou ui.perfetto.dev")
+        else:
+            disable_tracing()
+            self.add_log("🧵 Traces desligados")
+    
+    def toggle_profiling(self, enabled):
+        """Liga/desliga o perfilamento dos próximos downloads"""
+        if enabled:
+            enable_profiling(get_profile_dir())
+            self.add_log(f"🔬 Perfilamento ligado. Perfis em: {get_profile_dir()}")
+        else:
+            disable_profiling()
+            os.environ.pop(PROFILE_ENV_VAR, None)
+            self.add_log("🔬 Perfilamento desligado")
+    
     def on_url_changed(self, text):
         """Habilita/desabilita botões baseado na URL"""
         has_url = bool(text.strip())
@@ -1092,7 +6479,9 @@ class YouTubeDownloaderGUI(QMainWindow):
             return
         
         # Limpa e valida a URL
-        url = clean_and_validate_url(url_raw)
+        metrics = JobMetrics()
+        with metrics.stage('url_cleaning', span='clean_and_validate_url'):
+            url = clean_and_validate_url(url_raw)
         
         if not url:
             QMessageBox.warning(
@@ -1168,7 +6557,7 @@ class YouTubeDownloaderGUI(QMainWindow):
         self.add_log("ℹ️ Pulando análise - iniciando download direto...")
         
         # Cria e inicia a thread de download
-        self.download_thread = DownloadThread(url, output_path, download_type, custom_filename)
+        self.download_thread = DownloadThread(url, output_path, download_type, custom_filename, metrics)
         self.download_thread.progress.connect(self.add_log)
         self.download_thread.download_progress.connect(self.update_progress)
         self.download_thread.finished.connect(self.download_finished)
@@ -1191,7 +6580,9 @@ class YouTubeDownloaderGUI(QMainWindow):
             return
         
         # Limpa e valida a URL
-        url = clean_and_validate_url(url_raw)
+        metrics = JobMetrics()
+        with metrics.stage('url_cleaning', span='clean_and_validate_url'):
+            url = clean_and_validate_url(url_raw)
         
         if not url:
             QMessageBox.warning(
@@ -1239,12 +6630,246 @@ class YouTubeDownloaderGUI(QMainWindow):
             self.add_log(f"📝 Nome personalizado: {custom_filename}.{download_type}")
         
         # Cria e inicia a thread de download
-        self.download_thread = DownloadThread(url, output_path, download_type, custom_filename)
+        self.download_thread = DownloadThread(url, output_path, download_type, custom_filename, metrics)
         self.download_thread.progress.connect(self.add_log)
         self.download_thread.download_progress.connect(self.update_progress)
         self.download_thread.finished.connect(self.download_finished)
         self.download_thread.start()
     
+    def on_multiline_paste(self, text):
+        """Envia uma colagem com várias URLs para o campo de lote"""
+        self.append_batch_text(text)
+        self.add_log(f"📋 {len(split_url_text(text))} URLs coladas no lote")
+    
+    def append_batch_text(self, text):
+        """Acrescenta texto ao campo de lote, uma URL por linha"""
+        current = self.batch_input.toPlainText().strip()
+        lines = '\n'.join(split_url_text(text))
+        self.batch_input.setPlainText(f"{current}\n{lines}" if current else lines)
+    
+    def import_url_file(self):
+        """Importa URLs de um arquivo .txt ou .csv para o lote"""
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Importar Lista de URLs",
+            self.path_input.text(),
+            "Listas de URLs (*.txt *.csv)"
+        )
+        if not path:
+            return
+        
+        try:
+            candidates = read_url_file(path)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            QMessageBox.warning(self, "Erro ao Importar", f"Não foi possível ler o arquivo:\n{e}")
+            return
+        
+        self.append_batch_text('\n'.join(candidates))
+        self.add_log(f"📂 {len(candidates)} URLs importadas de {os.path.basename(path)}")
+    
+    def add_job_row(self, url):
+        """Adiciona uma URL à fila e à tabela, retornando o índice da linha"""
+        row = self.job_table.rowCount()
+        self.job_table.insertRow(row)
+        self.jobs.append({'url': url, 'title': '', 'filename': None, 'status': 'queued'})
+        self.job_table.setItem(row, 0, QTableWidgetItem("⏳ Na fila"))
+        self.job_table.setItem(row, 1, QTableWidgetItem(""))
+        self.job_table.setItem(row, 2, QTableWidgetItem(""))
+        self.job_table.setItem(row, 3, QTableWidgetItem(url))
+        return row
+    
+    def set_job_status(self, row, status, label):
+        """Atualiza o status de um item da fila"""
+        self.jobs[row]['status'] = status
+        self.job_table.item(row, 0).setText(label)
+    
+    def analyze_batch(self):
+        """Limpa, remove duplicatas e analisa em paralelo as URLs do lote"""
+        if self.batch_info_thread and self.batch_info_thread.isRunning():
+            return
+        
+        urls, rejected = clean_url_batch(split_url_text(self.batch_input.toPlainText()))
+        queued = {job['url'] for job in self.jobs}
+        new_urls = [url for url in urls if url not in queued]
+        
+        if rejected:
+            self.add_log(f"⚠️ {len(rejected)} entradas ignoradas por não serem URLs válidas")
+        if not new_urls:
+            self.add_log("ℹ️ Nenhuma URL nova para analisar no lote")
+            return
+        
+        self.batch_rows = [self.add_job_row(url) for url in new_urls]
+        self.batch_input.clear()
+        self.analyze_batch_button.setEnabled(False)
+        self.analyze_batch_button.setText("🔄 Analisando...")
+        self.add_log(f"🔍 Analisando {len(new_urls)} URLs em paralelo ({MAX_ANALYSIS_WORKERS} por vez)...")
+        
+        self.batch_info_thread = BatchInfoThread(new_urls)
+        self.batch_info_thread.item_analyzed.connect(self.on_batch_item_analyzed)
+        self.batch_info_thread.item_failed.connect(self.on_batch_item_failed)
+        self.batch_info_thread.batch_done.connect(self.on_batch_done)
+        self.batch_info_thread.start()
+    
+    def on_batch_item_analyzed(self, index, info):
+        """Atualiza a linha da fila assim que a análise de uma URL termina"""
+        row = self.batch_rows[index]
+        job = self.jobs[row]
+        if job['status'] != 'queued':
+            return
+        
+        duration = info.get('duration') or 0
+        job['title'] = info['title']
+        job['duration'] = duration
+        job['filesize'] = info.get('filesize_approx')
+        if info.get('uploader') != 'Streamyard':
+            job['filename'] = suggest_filename(info['title'])
+        
+        self.job_table.item(row, 1).setText(info['title'])
+        self.job_table.item(row, 2).setText(f"{duration // 60}:{duration % 60:02d}" if duration > 0 else "—")
+        self.set_job_status(row, 'queued', "✅ Analisado")
+    
+    def on_batch_item_failed(self, index, error):
+        """Marca a linha cuja análise falhou (o download ainda pode ser tentado)"""
+        row = self.batch_rows[index]
+        if self.jobs[row]['status'] != 'queued':
+            return
+        self.job_table.item(row, 1).setText(error)
+        self.set_job_status(row, 'queued', "⚠️ Sem análise")
+    
+    def on_batch_done(self):
+        """Callback quando todas as URLs do lote foram analisadas"""
+        self.analyze_batch_button.setEnabled(True)
+        self.analyze_batch_button.setText("🔍 Analisar Lote")
+        self.add_log(f"✅ Análise do lote concluída ({len(self.batch_rows)} URLs)")
+    
+    def start_queue_download(self):
+        """Baixa, um após o outro, os itens da fila que ainda não foram baixados"""
+        if self.queue_current_row is not None:
+            return
+        
+        output_path = self.path_input.text().strip()
+        if not output_path or not os.path.exists(output_path):
+            QMessageBox.warning(
+                self,
+                "Pasta Inválida",
+                "Por favor, selecione uma pasta de destino válida!"
+            )
+            return
+        
+        # Itens analisados mais curtos vão primeiro; os sem análise esperam com o custo padrão
+        self.queue_pending = JobScheduler()
+        for row, job in enumerate(self.jobs):
+            if job['status'] == 'queued':
+                self.queue_pending.put(row, cost=estimate_job_cost(job))
+        if not self.queue_pending:
+            self.add_log("ℹ️ Não há itens pendentes na fila")
+            return
+        
+        self.download_queue_button.setEnabled(False)
+        self.clear_queue_button.setEnabled(False)
+        self.download_button.setEnabled(False)
+        self.direct_download_button.setEnabled(False)
+        self.add_log("=" * 60)
+        self.add_log(f"📋 Baixando fila: {len(self.queue_pending)} itens")
+        self.download_next_in_queue()
+    
+    def download_next_in_queue(self):
+        """Inicia o próximo download pendente da fila"""
+        if not self.queue_pending:
+            self.queue_current_row = None
+            self.download_queue_button.setEnabled(True)
+            self.clear_queue_button.setEnabled(True)
+            self.download_button.setEnabled(True)
+            self.direct_download_button.setEnabled(bool(self.url_input.text().strip()))
+            self.add_log("✅ Fila concluída!")
+            return
+        
+        row = self.queue_pending.get_nowait()
+        job = self.jobs[row]
+        self.queue_current_row = row
+        self.set_job_status(row, 'downloading', "⬇️ Baixando...")
+        
+        download_type = 'mp4' if self.radio_mp4.isChecked() else 'mp3'
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p% - Iniciando...")
+        self.add_log(f"⬇️ [{row + 1}/{len(self.jobs)}] {job['title'] or job['url']}")
+        
+        self.download_thread = DownloadThread(job['url'], self.path_input.text().strip(), download_type, job['filename'],
+                                              expected_size=job.get('filesize'))
+        self.download_thread.download_progress.connect(self.update_progress)
+        self.download_thread.finished.connect(self.on_queue_item_finished)
+        self.download_thread.start()
+    
+    def on_queue_item_finished(self, success, message):
+        """Callback quando um item da fila termina"""
+        row = self.queue_current_row
+        if success:
+            self.set_job_status(row, 'done', "✅ Concluído")
+        else:
+            self.set_job_status(row, 'failed', "❌ Erro")
+            self.add_log(f"❌ Falha no item {row + 1}: {message.splitlines()[0]}")
+        self.download_next_in_queue()
+    
+    def clear_queue(self):
+        """Remove todos os itens da fila"""
+        if self.batch_info_thread and self.batch_info_thread.isRunning():
+            # Resultados que ainda chegarem se referem a linhas que não existem mais
+            self.batch_info_thread.item_analyzed.disconnect()
+            self.batch_info_thread.item_failed.disconnect()
+            self.batch_info_thread.stop()
+        self.jobs = []
+        self.batch_rows = []
+        self.job_table.setRowCount(0)
+        self.add_log("🗑️ Fila limpa")
+    
+    def import_manifest(self):
+        """Processa um manifesto .csv/.jsonl de jobs em segundo plano"""
+        if self.manifest_thread and self.manifest_thread.isRunning():
+            self.manifest_thread.stop()
+            self.add_log("⏹️ Parando a leitura do manifesto (os downloads em andamento terminam)...")
+            return
+        
+        output_path = self.path_input.text().strip()
+        if not output_path or not os.path.exists(output_path):
+            QMessageBox.warning(
+                self,
+                "Pasta Inválida",
+                "Por favor, selecione uma pasta de destino válida!"
+            )
+            return
+        
+        manifest_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Importar Manifesto de Jobs",
+            output_path,
+            "Manifestos (*.csv *.jsonl)"
+        )
+        if not manifest_path:
+            return
+        
+        results_path = os.path.splitext(manifest_path)[0] + '.results.jsonl'
+        download_type = 'mp4' if self.radio_mp4.isChecked() else 'mp3'
+        
+        self.add_log("=" * 60)
+        self.add_log(f"📑 Processando manifesto: {os.path.basename(manifest_path)}")
+        self.add_log(f"📄 Resultados em: {results_path}")
+        self.manifest_button.setText("⏹️ Parar Manifesto")
+        
+        self.manifest_thread = ManifestThread(manifest_path, output_path, results_path, download_type,
+                                              workers=self.workers)
+        self.manifest_thread.progress.connect(self.add_log)
+        self.manifest_thread.finished.connect(self.on_manifest_finished)
+        self.manifest_thread.start()
+    
+    def on_manifest_finished(self, counts):
+        """Callback quando o manifesto termina de ser processado"""
+        self.manifest_button.setText("📑 Importar Manifesto")
+        if counts:
+            self.add_log(
+                f"✅ Manifesto concluído: {counts['ok']} ok, "
+                f"{counts['error']} com erro, {counts['invalid']} inválidos"
+            )
+    
     def update_progress(self, value):
         """Atualiza a barra de progresso"""
         self.progress_bar.setValue(value)
@@ -1278,14 +6903,709 @@ class YouTubeDownloaderGUI(QMainWindow):
             )
 
 
+# Endereço padrão do modo serviço (apenas a máquina local)
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
+# Nomes aceitos no cabeçalho Host quando a API roda sem token (protege contra DNS rebinding)
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+# Jobs aguardando na fila do serviço antes de novas submissões serem recusadas (503)
+DAEMON_MAX_QUEUED = 1000
+# Jobs terminados que continuam consultáveis na API (os mais antigos saem primeiro)
+DAEMON_MAX_FINISHED = 1000
+# Validade das informações de vídeo em cache no serviço
+METADATA_CACHE_SECONDS = 600
+
+
+class MetadataCache:
+    """Cache LRU com validade para as informações de vídeo (fetch_video_info_limited)"""
+    
+    def __init__(self, ttl=METADATA_CACHE_SECONDS, max_entries=1000):
+        from collections import OrderedDict
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, url, fetch=None):
+        """Devolve as informações em cache ou busca (e guarda) com fetch(url)"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(url)
+                return entry[1]
+        info = (fetch or fetch_video_info_limited)(url)
+        with self._lock:
+            self._entries[url] = (time.monotonic() + self.ttl, info)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+
+class JobService:
+    """
+    Fila de jobs do modo serviço
+    
+    Usa o mesmo DownloadEngine/run_job do modo linha de comando e guarda,
+    para cada job, um registro com status e progresso que a API consulta.
+    Mudanças nos registros acordam quem espera por elas (eventos SSE).
+    Só os últimos max_finished jobs terminados ficam na memória; um job
+    mais antigo passa a ser desconhecido (404) na API.
+    """
+    
+    FINAL_STATUSES = ('ok', 'error', 'cancelled')
+    # Intervalo mínimo entre atualizações de progresso de um mesmo job
+    PROGRESS_INTERVAL = 0.5
+    
+    def __init__(self, output_path, workers=2, default_type='mp4', max_queued=DAEMON_MAX_QUEUED,
+                 max_finished=DAEMON_MAX_FINISHED):
+        from collections import OrderedDict
+        self.output_path = output_path
+        self.default_type = default_type
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.metadata = MetadataCache()
+        self._records = {}
+        self._finished = OrderedDict()
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self.engine = DownloadEngine(self._run, workers=workers, max_pending=max_queued,
+                                     on_result=self._on_result, on_hold=self._on_hold)
+    
+    def submit(self, row):
+        """
+        Valida e enfileira um job (mesmos campos de uma linha do manifesto)
+        
+        Raises:
+            ValueError: Campos inválidos
+            OverflowError: Fila cheia
+        """
+        from datetime import datetime
+        job = validate_manifest_row(row, self.default_type)
+        metrics = JobMetrics(url=job['url'], download_type=job['download_type'])
+        job.update({
+            'output_path': self.output_path,
+            'metrics': metrics,
+            'cancel_event': threading.Event(),
+        })
+        if row.get('duration'):
+            job['duration'] = row['duration']
+        job['progress_hook'] = self._progress_hook(metrics.job_id, job['cancel_event'])
+        
+        with self._condition:
+            queued = sum(1 for record in self._records.values() if record['status'] == 'queued')
+            if queued >= self.max_queued:
+                raise OverflowError("Fila cheia")
+            now = datetime.now().isoformat(timespec='seconds')
+            self._records[metrics.job_id] = {
+                'job_id': metrics.job_id, 'url': job['url'], 'download_type': job['download_type'],
+                'priority': job['priority'], 'status': 'queued', 'percent': 0.0, 'speed': None,
+                'eta': None, 'file': None, 'sha256': None, 'error': None, 'error_type': None, 'message': None,
+                'created_at': now, 'updated_at': now, 'version': 0,
+            }
+            self._jobs[metrics.job_id] = job
+        self.engine.submit(job)
+        return self.get(metrics.job_id)
+    
+    def get(self, job_id):
+        with self._condition:
+            record = self._records.get(job_id)
+            return dict(record) if record else None
+    
+    def list(self, status=None):
+        with self._condition:
+            return [dict(record) for record in self._records.values()
+                    if status is None or record['status'] == status]
+    
+    def cancel(self, job_id):
+        """Cancela um job na fila ou em andamento; False se ele não existe ou já terminou"""
+        with self._condition:
+            record = self._records.get(job_id)
+            if record is None or record['status'] in self.FINAL_STATUSES:
+                return False
+            self._jobs[job_id]['cancel_event'].set()
+            if record['status'] == 'queued':
+                self._update(job_id, status='cancelled')
+            return True
+    
+    def wait_for_update(self, job_id, version, timeout):
+        """Espera o registro passar da versão informada (ou o tempo acabar) e o devolve"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: job_id not in self._records or self._records[job_id]['version'] != version,
+                timeout=timeout
+            )
+            record = self._records.get(job_id)
+            return dict(record) if record else None
+    
+    def close(self):
+        """Cancela o que ainda está na fila e espera os downloads em andamento"""
+        for record in self.list('queued'):
+            self.cancel(record['job_id'])
+        self.engine.close()
+    
+    def _update(self, job_id, **fields):
+        from datetime import datetime
+        with self._condition:
+            record = self._records.get(job_id)
+            if record is None or (record['status'] in self.FINAL_STATUSES and 'status' not in fields):
+                return
+            record.update(fields, updated_at=datetime.now().isoformat(timespec='seconds'))
+            record['version'] += 1
+            if record['status'] in self.FINAL_STATUSES:
+                self._finished[job_id] = None
+                self._finished.move_to_end(job_id)
+                while len(self._finished) > self.max_finished:
+                    self._records.pop(self._finished.popitem(last=False)[0], None)
+            self._condition.notify_all()
+    
+    def _progress_hook(self, job_id, cancel_event):
+        last_update = [0.0]
+        
+        def hook(d):
+            if cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Cancelado pela API")
+            if d['status'] != 'downloading' or time.monotonic() - last_update[0] < self.PROGRESS_INTERVAL:
+                return
+            last_update[0] = time.monotonic()
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            percent = round(d.get('downloaded_bytes', 0) / total * 100, 1) if total else None
+            self._update(job_id, percent=percent, speed=d.get('speed'), eta=d.get('eta'))
+        
+        return hook
+    
+    def _run(self, job):
+        job_id = job['metrics'].job_id
+        if job['cancel_event'].is_set():
+            return {'status': 'cancelled', 'job_id': job_id}
+        self._update(job_id, status='running')
+        return run_job(job, log=lambda message: self._update(job_id, message=message))
+    
+    def _on_hold(self, job):
+        self._update(job['metrics'].job_id, message="⏸️ Aguardando espaço em disco")
+    
+    def _on_result(self, job, result):
+        job_id = job['metrics'].job_id
+        fields = {'status': result['status'], 'file': result.get('file'), 'sha256': result.get('sha256'),
+                  'error': result.get('error'), 'error_type': result.get('error_type')}
+        if result['status'] == 'ok':
+            fields['percent'] = 100.0
+        self._update(job_id, **fields)
+        with self._condition:
+            # O job (com métricas e hooks) não é mais necessário; o registro continua consultável
+            self._jobs.pop(job_id, None)
+
+
+def make_api_handler(service, token=None):
+    """
+    Cria o handler HTTP da API do modo serviço
+    
+    Rotas:
+        POST   /jobs               Cria um job (JSON com os campos do manifesto)
+        GET    /jobs[?status=...]  Lista os jobs
+        GET    /jobs/<id>          Consulta um job
+        GET    /jobs/<id>/events   Progresso do job em Server-Sent Events
+        DELETE /jobs/<id>          Cancela um job
+        GET    /info?url=...       Informações do vídeo (com cache)
+        GET    /metrics            Métricas no formato texto do Prometheus
+    
+    Sem token, só são aceitas requisições endereçadas à máquina local
+    (cabeçalho Host em LOOPBACK_HOSTS), para que uma página aberta no
+    navegador não alcance a API por DNS rebinding. O POST exige
+    Content-Type application/json, que um formulário de outro site não
+    consegue enviar sem a permissão do CORS.
+    """
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlparse, urlsplit, parse_qs
+    
+    class ApiHandler(BaseHTTPRequestHandler):
+        server_version = 'ConversorVideoAudio'
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def authorized(self):
+            if token:
+                if self.headers.get('Authorization') != f"Bearer {token}":
+                    self.send_json(401, {'error': 'Token ausente ou inválido'})
+                    return False
+                return True
+            try:
+                host = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+            except ValueError:
+                host = None
+            if host not in LOOPBACK_HOSTS:
+                self.send_json(403, {'error': 'Host não permitido (defina CONVERSOR_API_TOKEN para acesso remoto)'})
+                return False
+            return True
+        
+        def route(self):
+            parsed = urlparse(self.path)
+            parts = [part for part in parsed.path.split('/') if part]
+            return parts, parse_qs(parsed.query)
+        
+        def do_POST(self):
+            if not self.authorized():
+                return
+            parts, _ = self.route()
+            if parts != ['jobs']:
+                return self.send_json(404, {'error': 'Rota não encontrada'})
+            content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+            if content_type != 'application/json':
+                return self.send_json(415, {'error': 'Envie o job com Content-Type: application/json'})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                row = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(row, dict):
+                    raise ValueError("o corpo deve ser um objeto JSON")
+                self.send_json(201, service.submit(row))
+            except (ValueError, TypeError) as e:
+                self.send_json(400, {'error': str(e)})
+            except OverflowError as e:
+                self.send_json(503, {'error': str(e)})
+        
+        def do_DELETE(self):
+            if not self.authorized():
+                return
+            parts, _ = self.route()
+            if len(parts) != 2 or parts[0] != 'jobs':
+                return self.send_json(404, {'error': 'Rota não encontrada'})
+            if service.cancel(parts[1]):
+                return self.send_json(202, service.get(parts[1]))
+            record = service.get(parts[1])
+            if record is None:
+                return self.send_json(404, {'error': 'Job não encontrado'})
+            self.send_json(409, record)
+        
+        def do_GET(self):
+            if not self.authorized():
+                return
+            parts, query = self.route()
+            if parts == ['jobs']:
+                return self.send_json(200, service.list(query.get('status', [None])[0]))
+            if len(parts) == 2 and parts[0] == 'jobs':
+                record = service.get(parts[1])
+                return self.send_json(200, record) if record else self.send_json(404, {'error': 'Job não encontrado'})
+            if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+                return self.stream_events(parts[1])
+            if parts == ['info'] and query.get('url'):
+                url = clean_and_validate_url(query['url'][0])
+                if not url:
+                    return self.send_json(400, {'error': 'URL inválida'})
+                try:
+                    return self.send_json(200, service.metadata.get(url))
+                except Exception as e:
+                    return self.send_json(502, {'error': describe_info_error(e)})
+            if parts == ['metrics']:
+                body = get_metrics_recorder().render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                return self.wfile.write(body)
+            self.send_json(404, {'error': 'Rota não encontrada'})
+        
+        def stream_events(self, job_id):
+            """Envia o registro a cada mudança até o job terminar (com keep-alive a cada 15s)"""
+            record = service.get(job_id)
+            if record is None:
+                return self.send_json(404, {'error': 'Job não encontrado'})
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            version = None
+            try:
+                while record is not None:
+                    if record['version'] != version:
+                        version = record['version']
+                        final = record['status'] in JobService.FINAL_STATUSES
+                        event = 'done' if final else 'progress'
+                        self.wfile.write(f"event: {event}\ndata: {json.dumps(record, ensure_ascii=False)}\n\n".encode('utf-8'))
+                        if final:
+                            break
+                    else:
+                        self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    record = service.wait_for_update(job_id, version, timeout=15)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+    
+    return ApiHandler
+
+
+def run_daemon(args):
+    """Executa o modo serviço (API HTTP local) até receber Ctrl+C"""
+    from http.server import ThreadingHTTPServer
+    
+    if not os.path.isdir(args.output):
+        print(f"❌ Pasta de destino inválida: {args.output}")
+        return 2
+    if not configure_from_args(args):
+        return 2
+    
+    token = os.environ.get('CONVERSOR_API_TOKEN')
+    if not token and args.host not in LOOPBACK_HOSTS:
+        print(f"❌ Para ouvir em {args.host}, defina CONVERSOR_API_TOKEN (sem token a API só aceita a máquina local)")
+        return 2
+    service = JobService(args.output, workers=args.workers, default_type=args.type)
+    enable_browser_pool()
+    server = ThreadingHTTPServer((args.host, args.port), make_api_handler(service, token))
+    server.daemon_threads = True
+    host, port = server.server_address[:2]
+    print(f"🛰️ Serviço ouvindo em http://{host}:{port} (pasta {args.output}, {args.workers} workers)")
+    if token:
+        print("🔑 Requisições precisam do cabeçalho Authorization: Bearer <CONVERSOR_API_TOKEN>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Encerrando: jobs na fila cancelados, aguardando os downloads em andamento...")
+    finally:
+        server.server_close()
+        service.close()
+        disable_browser_pool()
+    return 0
+
+
+def parse_args(argv=None):
+    """Lê os argumentos de linha de comando (sem argumentos, abre a interface gráfica)"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Conversor de Vídeo/Áudio - MP4 & MP3")
+    parser.add_argument('--manifest', help="Processa um manifesto .csv/.jsonl de jobs sem abrir a interface")
+    parser.add_argument('--serve', action='store_true',
+                        help="Modo serviço: API HTTP local para enviar, acompanhar e cancelar jobs (token opcional em CONVERSOR_API_TOKEN)")
+    parser.add_argument('--host', default=DAEMON_HOST, help="Endereço do modo serviço")
+    parser.add_argument('--port', type=int, default=DAEMON_PORT, help="Porta do modo serviço")
+    parser.add_argument('--history', nargs='?', const='', metavar='TEXTO',
+                        help="Busca no histórico de jobs por URL, ID do vídeo ou trecho do título")
+    parser.add_argument('--status', help="Filtra o histórico por status (ok, error, cancelled)")
+    parser.add_argument('--since', metavar='QUANDO', help="Filtra o histórico a partir de uma data (AAAA-MM-DD) ou 7d/12h/30m")
+    parser.add_argument('--limit', type=int, default=50, help="Máximo de linhas mostradas do histórico")
+    parser.add_argument('--retry-failed-since', metavar='QUANDO',
+                        help="Repete os jobs que falharam desde a data (com --store, enfileira na fila compartilhada)")
+    parser.add_argument('--record', metavar='URL',
+                        help="Grava uma transmissão ao vivo em segmentos (com --type mp3, cada segmento vira MP3 ao fechar)")
+    parser.add_argument('--segment-seconds', type=float, default=LIVE_SEGMENT_SECONDS,
+                        help="Duração de cada segmento da gravação ao vivo (--record)")
+    parser.add_argument('--retain', type=int, default=0,
+                        help="Segmentos prontos mantidos na pasta durante a gravação ao vivo (0 = todos)")
+    parser.add_argument('--watch', metavar='PASTA',
+                        help="Monitora uma pasta e baixa as URLs dos arquivos .txt/.csv/.jsonl deixados nela")
+    parser.add_argument('--store', metavar='BANCO',
+                        help="Fila compartilhada (SQLite): com --manifest enfileira, com --worker executa, sozinho mostra o andamento")
+    parser.add_argument('--worker', action='store_true', help="Executa jobs reivindicados da fila compartilhada (--store)")
+    parser.add_argument('--worker-id', help="Nome deste worker na fila compartilhada (padrão: máquina-pid)")
+    parser.add_argument('--lease', type=float, default=STORE_LEASE_SECONDS,
+                        help="Segundos sem sinal de vida até o job de um worker voltar para a fila")
+    parser.add_argument('--exit-when-idle', action='store_true',
+                        help="O worker sai quando a fila compartilhada estiver vazia e sem jobs em andamento")
+    parser.add_argument('--results', help="Arquivo de resultados (.jsonl ou .csv; padrão: <manifesto>.results.jsonl)")
+    parser.add_argument('--output', default=str(Path.home() / "Downloads"), help="Pasta de destino")
+    parser.add_argument('--type', choices=['mp4', 'mp3'], default='mp4', help="Tipo padrão dos jobs")
+    parser.add_argument('--workers', type=int, default=2, help="Downloads simultâneos")
+    parser.add_argument('--schedule', choices=JobScheduler.POLICIES, default='sjf',
+                        help="Ordem dos jobs: sjf = mais curtos primeiro (com envelhecimento), fifo = ordem do manifesto")
+    parser.add_argument('--metrics-file', help="Arquivo JSON-lines com as métricas de cada job")
+    parser.add_argument('--metrics-prom', help="Arquivo texto no formato do Prometheus (textfile collector)")
+    parser.add_argument('--trace', nargs='?', const='', metavar='PASTA',
+                        help=f"Grava spans de cada job no formato trace-event do Chrome (também via {TRACE_ENV_VAR}=PASTA)")
+    parser.add_argument('--profile', nargs='?', const='', metavar='PASTA',
+                        help=f"Perfila cada job com cProfile e tracemalloc (também via {PROFILE_ENV_VAR}=1)")
+    parser.add_argument('--hedge', action='store_true',
+                        help=f"Extrai vídeos do YouTube disputando vários player_client em paralelo (também via {HEDGE_ENV_VAR}=1)")
+    parser.add_argument('--loudnorm', type=float, metavar='LUFS', default=get_loudness_target(),
+                        help=f"Normaliza o volume para o alvo (ex: -16) na mesma passada do FFmpeg que gera o MP3, as tags e a capa (também via {LOUDNORM_ENV_VAR})")
+    parser.add_argument('--split-chapters', action='store_true',
+                        help=f"Gera também um arquivo por capítulo, em paralelo, numa pasta com o nome do vídeo (também via {CHAPTER_SPLIT_ENV_VAR}=1)")
+    parser.add_argument('--fragment-workers', type=int, metavar='N',
+                        help=f"Fragmentos HLS/DASH baixados ao mesmo tempo por arquivo (padrão: {DEFAULT_FRAGMENT_WORKERS}; também via {FRAGMENT_WORKERS_ENV_VAR})")
+    parser.add_argument('--max-bandwidth', metavar='TAXA', default=os.environ.get('CONVERSOR_MAX_BANDWIDTH'),
+                        help="Banda total dos downloads, ex: 5M = 5 MiB/s (também via CONVERSOR_MAX_BANDWIDTH)")
+    parser.add_argument('--job-bandwidth', metavar='TAXA', default=os.environ.get('CONVERSOR_JOB_BANDWIDTH'),
+                        help="Banda máxima de cada download (também via CONVERSOR_JOB_BANDWIDTH)")
+    parser.add_argument('--bandwidth-schedule', metavar='FAIXAS', default=os.environ.get('CONVERSOR_BANDWIDTH_SCHEDULE'),
+                        help="Banda total por horário, ex: 08:00-18:00=2M,18:00-08:00=0 (também via CONVERSOR_BANDWIDTH_SCHEDULE)")
+    parser.add_argument('--checksums', metavar='ALGORITMOS',
+                        help=f"Checksums calculados durante o download: sha256 (padrão), sha256,xxh64 ou none (também via {CHECKSUM_ENV_VAR})")
+    parser.add_argument('--scratch', metavar='PASTA', default=os.environ.get(SCRATCH_ENV_VAR),
+                        help=f"Pasta rápida (SSD local, tmpfs) para .part, fragmentos e conversões; o destino só recebe o arquivo pronto (também via {SCRATCH_ENV_VAR})")
+    parser.add_argument('--layout', choices=OUTPUT_LAYOUTS, default=os.environ.get(LAYOUT_ENV_VAR) or None,
+                        help=f"Subpastas do destino: por hash, data ou canal, com nomes únicos e índice de caminhos (também via {LAYOUT_ENV_VAR})")
+    parser.add_argument('--min-free', metavar='TAMANHO', default=os.environ.get('CONVERSOR_MIN_FREE'),
+                        help="Espaço mantido livre em disco; jobs que não cabem esperam na fila (padrão: 512M; também via CONVERSOR_MIN_FREE)")
+    parser.add_argument('--sink', metavar='s3://BUCKET/PREFIXO', default=os.environ.get(SINK_ENV_VAR),
+                        help=f"Envia os arquivos a um bucket S3/MinIO enquanto baixam (também via {SINK_ENV_VAR}; credenciais em AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY)")
+    parser.add_argument('--sink-endpoint', metavar='URL',
+                        help="Endereço do serviço compatível com S3, ex: http://localhost:9000 (também via AWS_ENDPOINT_URL)")
+    parser.add_argument('--no-local-copy', action='store_true',
+                        help="Com --sink, apaga a cópia da pasta de destino depois do envio")
+    parser.add_argument('--host-limit', action='append', default=[], metavar='HOST=N[:POR_SEG[:RAJADA]]',
+                        help=f"Limite de operações simultâneas e por segundo de um host (também via {HOST_LIMITS_ENV_VAR})")
+    return parser.parse_args(argv)
+
+
+def configure_bandwidth_from_args(args):
+    """Aplica os limites de banda da linha de comando; retorna False se nenhum foi informado"""
+    if not (args.max_bandwidth or args.job_bandwidth or args.bandwidth_schedule):
+        return False
+    configure_bandwidth(parse_rate(args.max_bandwidth), parse_rate(args.job_bandwidth),
+                        parse_bandwidth_schedule(args.bandwidth_schedule))
+    return True
+
+
+def configure_sink_from_args(args):
+    """Aplica o destino --sink; retorna False se nenhum foi informado"""
+    if not args.sink:
+        return False
+    configure_output_sink(S3Sink(args.sink, endpoint=args.sink_endpoint, keep_local=not args.no_local_copy))
+    return True
+
+
+# Opções que só fazem sentido sem a interface (--manifest, --serve, --watch, --store, --history)
+HEADLESS_ONLY_OPTIONS = ('results', 'schedule', 'host', 'port', 'worker_id', 'lease', 'exit_when_idle',
+                         'status', 'since', 'limit', 'segment_seconds', 'retain')
+
+
+def headless_only_options(args):
+    """Opções de HEADLESS_ONLY_OPTIONS informadas (diferentes do padrão), no formato --nome"""
+    defaults = parse_args([])
+    return [f"--{name.replace('_', '-')}" for name in HEADLESS_ONLY_OPTIONS
+            if getattr(args, name) != getattr(defaults, name)]
+
+
+def configure_from_args(args):
+    """Aplica as opções comuns à linha de comando e ao modo serviço; retorna False se alguma for inválida"""
+    if args.metrics_file or args.metrics_prom:
+        configure_metrics(args.metrics_file, args.metrics_prom)
+    if args.trace is not None:
+        enable_tracing(args.trace or None)
+        print(f"🧵 Traces dos jobs em: {os.environ[TRACE_ENV_VAR]}")
+    if args.profile is not None:
+        enable_profiling(args.profile or None)
+        print(f"🔬 Perfis dos jobs em: {get_profile_dir()}")
+    if args.hedge:
+        os.environ[HEDGE_ENV_VAR] = '1'
+        print("⚡ Extração paralela de player_client ligada")
+    if args.split_chapters:
+        os.environ[CHAPTER_SPLIT_ENV_VAR] = '1'
+        print("📑 Vídeos com capítulos também são separados em um arquivo por capítulo")
+    try:
+        if args.checksums:
+            os.environ[CHECKSUM_ENV_VAR] = args.checksums
+        if 'xxh64' in (os.environ.get(CHECKSUM_ENV_VAR) or '') and 'xxh64' not in checksum_algorithms():
+            print("⚠️ Módulo xxhash não instalado (pip install xxhash); usando só SHA-256")
+        configure_host_limits(parse_host_limits(','.join(args.host_limit)))
+        if configure_bandwidth_from_args(args):
+            print(f"📶 Banda: total {args.max_bandwidth or 'livre'}, por job {args.job_bandwidth or 'livre'}"
+                  + (f", agenda {args.bandwidth_schedule}" if args.bandwidth_schedule else ""))
+        if args.scratch:
+            configure_scratch_dir(args.scratch)
+            print(f"⚡ Arquivos temporários em: {args.scratch}")
+        if args.min_free:
+            configure_disk_space(parse_size(args.min_free))
+        if args.fragment_workers is not None:
+            configure_fragment_workers(args.fragment_workers)
+        if args.loudnorm is not None:
+            configure_loudness_target(args.loudnorm)
+            print(f"🔊 Volume normalizado para {args.loudnorm:g} LUFS")
+        if args.layout:
+            configure_output_layout(args.layout.lower())
+            print(f"🗃️ Destino organizado por {args.layout} (índice em {PATH_INDEX_FILENAME})")
+        if configure_sink_from_args(args):
+            print(f"☁️ Arquivos enviados para {args.sink}" + (" (sem cópia local)" if args.no_local_copy else ""))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    return True
+
+
+def run_cli(args):
+    """Executa o modo de linha de comando e retorna o código de saída"""
+    if not os.path.isdir(args.output):
+        print(f"❌ Pasta de destino inválida: {args.output}")
+        return 2
+    if not configure_from_args(args):
+        return 2
+    
+    results_path = args.results or os.path.splitext(args.manifest)[0] + '.results.jsonl'
+    print(f"📑 Manifesto: {args.manifest}")
+    print(f"📄 Resultados: {results_path}")
+    
+    counts = run_manifest(
+        args.manifest, args.output, results_path,
+        workers=args.workers, default_type=args.type, policy=args.schedule
+    )
+    print(f"✅ Concluído: {counts['ok']} ok, {counts['error']} com erro, {counts['invalid']} inválidos")
+    return 0 if counts['error'] == 0 and counts['invalid'] == 0 else 1
+
+
+def run_history_cli(args):
+    """Busca no histórico (--history) ou repete as falhas (--retry-failed-since) e retorna o código de saída"""
+    from datetime import datetime
+    try:
+        when = args.retry_failed_since or args.since
+        since = parse_since(when) if when else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+    history = get_history()
+    
+    if args.history is not None:
+        status_icons = {'ok': '✅', 'error': '❌', 'cancelled': '⏹️'}
+        entries = history.search(args.history, status=args.status, since=since, limit=args.limit)
+        for entry in entries:
+            when = datetime.fromtimestamp(entry['finished_at']).strftime('%Y-%m-%d %H:%M')
+            line = f"{when}  {status_icons.get(entry['status'], '•')} {entry['job_id']}  {entry['title'] or entry['url']}"
+            if entry['error_type']:
+                line += f"  [{entry['error_type']}]"
+            print(line)
+        print(f"📜 {len(entries)} jobs" + (" (use --limit para ver mais)" if len(entries) == args.limit else ""))
+        return 0
+    
+    rows = history.failed_since(since)
+    if not rows:
+        print("ℹ️ Nenhuma falha para repetir nesse período")
+        return 0
+    if args.store:
+        store = JobStore(args.store, lease_seconds=args.lease)
+        try:
+            for row in rows:
+                store.enqueue(validate_manifest_row(row, args.type), policy=args.schedule)
+        finally:
+            store.close()
+        print(f"📥 {len(rows)} falhas enfileiradas em {args.store}")
+        return 0
+    
+    if not os.path.isdir(args.output):
+        print(f"❌ Pasta de destino inválida: {args.output}")
+        return 2
+    if not configure_from_args(args):
+        return 2
+    results_path = args.results or os.path.join(args.output, 'retentativas.results.jsonl')
+    print(f"🔁 Repetindo {len(rows)} jobs que falharam desde {datetime.fromtimestamp(since):%Y-%m-%d %H:%M}")
+    print(f"📄 Resultados: {results_path}")
+    counts = run_manifest(None, args.output, results_path, workers=args.workers, default_type=args.type,
+                          policy=args.schedule, rows=enumerate(rows, 1))
+    print(f"✅ Concluído: {counts['ok']} ok, {counts['error']} com erro, {counts['invalid']} inválidos")
+    return 0 if counts['error'] == 0 and counts['invalid'] == 0 else 1
+
+
+def run_watch_cli(args):
+    """Executa o monitoramento da pasta (--watch) até receber Ctrl+C"""
+    for path in (args.watch, args.output):
+        if not os.path.isdir(path):
+            print(f"❌ Pasta inválida: {path}")
+            return 2
+    if not configure_from_args(args):
+        return 2
+    counts = watch_folder(args.watch, args.output, workers=args.workers, default_type=args.type)
+    print(f"✅ Monitoramento encerrado: {counts['done']} arquivos concluídos, {counts['failed']} com falhas")
+    return 0
+
+
+def run_record_cli(args):
+    """Grava uma transmissão ao vivo (--record) até ela terminar ou Ctrl+C e retorna o código de saída"""
+    if not os.path.isdir(args.output):
+        print(f"❌ Pasta de destino inválida: {args.output}")
+        return 2
+    if args.segment_seconds <= 0 or args.retain < 0:
+        print("❌ --segment-seconds precisa ser positivo e --retain não pode ser negativo")
+        return 2
+    if not configure_from_args(args):
+        return 2
+    try:
+        segments = record_live(args.record, args.output, args.type, segment_seconds=args.segment_seconds,
+                               retain=args.retain, log=print)
+    except Exception as e:
+        print(f"❌ {classify_error(e).describe()}")
+        return 1
+    print(f"✅ Gravação encerrada: {len(segments)} segmento(s) em {args.output}")
+    return 0
+
+
+def run_store_cli(args):
+    """Enfileira, executa ou resume os jobs da fila compartilhada (--store) e retorna o código de saída"""
+    if args.worker and not os.path.isdir(args.output):
+        print(f"❌ Pasta de destino inválida: {args.output}")
+        return 2
+    store = JobStore(args.store, lease_seconds=args.lease)
+    try:
+        if args.manifest:
+            counts = enqueue_manifest(store, args.manifest, default_type=args.type, policy=args.schedule)
+            print(f"📥 {counts['queued']} jobs enfileirados em {args.store} ({counts['invalid']} inválidos)")
+            return 0 if counts['invalid'] == 0 else 1
+        
+        if args.worker:
+            if not configure_from_args(args):
+                return 2
+            worker_id = args.worker_id or default_worker_id()
+            print(f"👷 Worker {worker_id}: {args.workers} downloads simultâneos, fila {args.store}")
+            counts = run_worker(store, args.output, workers=args.workers, worker_id=worker_id,
+                                exit_when_idle=args.exit_when_idle)
+            print(f"✅ Worker encerrado: {counts['ok']} ok, {counts['error']} com erro, "
+                  f"{counts['cancelled']} devolvidos à fila, {counts['lost']} assumidos por outro worker")
+            return 0 if counts['error'] == 0 else 1
+        
+        counts = store.counts()
+        print("📊 " + (", ".join(f"{status}: {n}" for status, n in sorted(counts.items())) or "fila vazia"))
+        if args.results:
+            writer = ResultsWriter(args.results)
+            for result in store.results():
+                writer.write(result)
+            writer.close()
+            print(f"📄 Resultados: {args.results}")
+        return 0
+    finally:
+        store.close()
+
+
 def main():
     """Função principal"""
+    args = parse_args()
+    try:
+        load_host_limits_from_env()
+    except ValueError as e:
+        print(f"⚠️ {e} (variável {HOST_LIMITS_ENV_VAR} ignorada)")
+    if args.history is not None or args.retry_failed_since:
+        sys.exit(run_history_cli(args))
+    if args.serve:
+        sys.exit(run_daemon(args))
+    if args.watch:
+        sys.exit(run_watch_cli(args))
+    if args.record:
+        sys.exit(run_record_cli(args))
+    if args.worker and not args.store:
+        print("❌ --worker precisa de --store com o caminho da fila compartilhada")
+        sys.exit(2)
+    if args.store:
+        sys.exit(run_store_cli(args))
+    if args.manifest:
+        sys.exit(run_cli(args))
+    
+    
+    # Interface gráfica: as mesmas opções globais da linha de comando valem para ela
+    ignored = headless_only_options(args)
+    if ignored:
+        print(f"⚠️ {', '.join(ignored)} não se aplica(m) à interface gráfica "
+              "(use com --manifest, --serve, --watch, --record ou --store)")
+    if not configure_from_args(args):
+        sys.exit(2)
+    
     app = QApplication(sys.argv)
     
     # Estilo da aplicação
     app.setStyle('Fusion')
     
-    window = YouTubeDownloaderGUI()
+    window = YouTubeDownloaderGUI(args.output, default_type=args.type, workers=args.workers)
     window.show()
     
     sys.exit(app.exec())
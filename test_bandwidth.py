@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Testes da divisão de banda entre downloads
+"""
+
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+import main
+from main import BandwidthAllocator, StallWatchdog, download_media, parse_rate, parse_bandwidth_schedule
+from benchmark import FixtureServer
+
+MB = 1024 * 1024
+KB = 1024
+
+
+@pytest.fixture
+def media(tmp_path):
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    for name, size in (('longo.mp4', 3 * MB), ('curto.mp4', 512 * KB), ('lento.mp4', 24 * KB)):
+        (media_dir / name).write_bytes(os.urandom(size))
+    return media_dir
+
+
+def test_parse_rate_and_schedule():
+    assert parse_rate('2M') == 2 * MB
+    assert parse_rate('0') is None
+    assert parse_bandwidth_schedule('08:00-18:00=2M,18:00-08:00=0') == [(480, 1080, 2 * MB), (1080, 480, None)]
+    with pytest.raises(ValueError):
+        parse_bandwidth_schedule('8h-18h=2M')
+
+
+def test_priority_shares_and_live_reallocation():
+    """Prioridades dividem o total; quem termina devolve sua parte aos outros"""
+    allocator = BandwidthAllocator(global_limit=6 * MB)
+    
+    with allocator.lease('low', {}, priority=1):
+        assert allocator.allocations() == {'low': 6 * MB}
+        with allocator.lease('high', {}, priority=2):
+            assert allocator.allocations() == {'low': 2 * MB, 'high': 4 * MB}
+        assert allocator.allocations() == {'low': 6 * MB}
+    assert allocator.allocations() == {}
+
+
+def test_job_limit_surplus_goes_to_other_jobs():
+    """A parte que um job limitado não usa vai para os demais"""
+    allocator = BandwidthAllocator(global_limit=6 * MB)
+    with allocator.lease('capped', {}, limit=1 * MB), allocator.lease('free', {}):
+        assert allocator.allocations() == {'capped': 1 * MB, 'free': 5 * MB}
+
+
+def test_schedule_switches_limit_by_time_of_day():
+    """À noite não há limite; durante o expediente vale a faixa"""
+    now = [datetime(2024, 1, 1, 10, 0)]
+    allocator = BandwidthAllocator(global_limit=1 * MB, job_limit=3 * MB,
+                                   schedule=parse_bandwidth_schedule('08:00-18:00=2M,22:00-06:00=0'),
+                                   clock=lambda: now[0])
+    with allocator.lease('job', {}) as lease:
+        assert lease.allocated == 2 * MB
+        now[0] = datetime(2024, 1, 1, 23, 30)
+        allocator._last_reallocation = 0
+        allocator.tick()
+        assert lease.allocated == 3 * MB
+        now[0] = datetime(2024, 1, 1, 20, 0)
+        allocator._last_reallocation = 0
+        allocator.tick()
+        assert lease.allocated == 1 * MB
+
+
+def test_shares_are_enforced_on_real_downloads(monkeypatch, media, tmp_path):
+    """
+    Um job sozinho usa os 2 MiB/s; quando outro entra, os dois ficam com metade
+    
+    O longo não paga pelo que baixou sozinho quando sua parte diminui (o
+    'ratelimit' do yt-dlp o faria dormir quase o tempo já decorrido) e volta
+    a usar tudo quando o curto termina: os 3,5 MiB somados saem em ~1,75 s.
+    """
+    monkeypatch.setattr(main, '_bandwidth_allocator', BandwidthAllocator(global_limit=2 * MB))
+    monkeypatch.setattr(main, 'STALL_READ_BLOCK_SIZE', 16 * KB)
+    times = {'longo': [], 'curto': []}
+    halfway = threading.Event()
+    
+    def download(name):
+        def progress(d):
+            times[name].append(main.time.monotonic())
+            if d.get('downloaded_bytes', 0) >= 512 * KB:
+                halfway.set()
+        if name == 'curto':
+            halfway.wait(10)
+        download_media(f"{server.base_url}/media/{name}.mp4", str(tmp_path / name), 'mp4', name,
+                       progress_hook=progress)
+    
+    with FixtureServer(str(media)) as server:
+        threads = [threading.Thread(target=download, args=(name,)) for name in times]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(20)
+    
+    assert (tmp_path / 'longo' / 'longo.mp4').stat().st_size == 3 * MB
+    assert 0.35 <= times['curto'][-1] - times['curto'][0] <= 0.7
+    assert 1.55 <= times['longo'][-1] - times['longo'][0] <= 2.1
+
+
+def test_watchdog_ignores_jobs_capped_below_its_minimum(monkeypatch, media, tmp_path):
+    """16 KiB/s alocados ficam abaixo dos 32 KiB/s do watchdog, mas a lentidão é proposital"""
+    monkeypatch.setattr(main, '_bandwidth_allocator', BandwidthAllocator(global_limit=16 * KB))
+    monkeypatch.setattr(main, 'STALL_READ_BLOCK_SIZE', 4 * KB)
+    metrics = main.JobMetrics()
+    
+    with FixtureServer(str(media)) as server:
+        started = main.time.monotonic()
+        download_media(f"{server.base_url}/media/lento.mp4", str(tmp_path), 'mp4', 'lento',
+                       metrics=metrics, watchdog=StallWatchdog(window=0.5))
+    
+    assert metrics.stall_restarts == 0
+    assert main.time.monotonic() - started >= 1.2
+    assert (tmp_path / 'lento.mp4').stat().st_size == 24 * KB
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Testes da limpeza e importação de lotes de URLs
+"""
+
+from main import split_url_text, read_url_file, clean_url_batch
+
+
+def test_split_url_text():
+    """Separa URLs coladas em várias linhas, com vírgulas ou espaços"""
+    text = "https://youtu.be/a\n  https://youtu.be/b, https://youtu.be/c;\r\n\n"
+    assert split_url_text(text) == [
+        'https://youtu.be/a', 'https://youtu.be/b', 'https://youtu.be/c'
+    ]
+    assert split_url_text('') == []
+
+
+def test_clean_url_batch_dedupes_and_rejects():
+    """Remove duplicatas (inclusive após a correção) e separa entradas inválidas"""
+    urls, rejected = clean_url_batch([
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'https://www.youtube.cohttps://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'not-a-url',
+        'https://youtu.be/dQw4w9WgXcQ',
+    ])
+    assert urls == [
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'https://youtu.be/dQw4w9WgXcQ',
+    ]
+    assert rejected == ['not-a-url']
+
+
+def test_read_url_file_txt_and_csv(tmp_path):
+    """Lê URLs de arquivos .txt e .csv (ignorando cabeçalhos e outras colunas)"""
+    txt = tmp_path / 'lista.txt'
+    txt.write_text("https://youtu.be/a\n\nhttps://youtu.be/b\n", encoding='utf-8')
+    assert read_url_file(txt) == ['https://youtu.be/a', 'https://youtu.be/b']
+    
+    csv_file = tmp_path / 'lista.csv'
+    csv_file.write_text("url,titulo\nhttps://youtu.be/a,Aula 1\nhttps://youtu.be/c,Aula 2\n", encoding='utf-8')
+    assert read_url_file(csv_file) == ['https://youtu.be/a', 'https://youtu.be/c']
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Testes do servidor de fixtures usado pelos benchmarks
+"""
+
+import requests
+
+from benchmark import FixtureServer
+
+
+def test_fixture_server_supports_ranges(tmp_path):
+    """Entrega o arquivo inteiro, trechos (206) e a página do Streamyard"""
+    (tmp_path / 'video.mp4').write_bytes(bytes(range(256)) * 4)
+    
+    with FixtureServer(str(tmp_path)) as server:
+        full = requests.get(f"{server.base_url}/media/video.mp4")
+        assert full.status_code == 200
+        assert len(full.content) == 1024
+        assert full.headers['Content-Type'] == 'video/mp4'
+        
+        part = requests.get(f"{server.base_url}/media/video.mp4", headers={'Range': 'bytes=10-19'})
+        assert part.status_code == 206
+        assert part.content == bytes(range(10, 20))
+        assert part.headers['Content-Range'] == 'bytes 10-19/1024'
+        
+        tail = requests.get(f"{server.base_url}/media/video.mp4", headers={'Range': 'bytes=-4'})
+        assert tail.content == bytes(range(252, 256))
+        
+        page = requests.get(f"{server.base_url}/streamyard.com/watch/abc")
+        assert 'VOD.mp4' in page.text
+        
+        assert requests.get(f"{server.base_url}/media/nada.mp4").status_code == 404
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Testes da separação por capítulos
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from main import plan_chapters, split_chapters
+from benchmark import create_media
+
+
+CHAPTERS = [
+    {'start_time': 0, 'end_time': 4.0, 'title': 'Abertura'},
+    {'start_time': 4.0, 'end_time': 5.0, 'title': 'Perguntas/Respostas'},
+    {'start_time': 5.0, 'end_time': 5.0, 'title': 'Vazio'},
+    {'start_time': 5.0, 'title': None},
+]
+
+
+def test_plan_copies_chapters_that_start_on_a_keyframe():
+    """Começo em quadro-chave = cópia; fora dele, recodificação; no MP3, sempre cópia"""
+    plan = plan_chapters(CHAPTERS, 'mp4', keyframes=[0.0, 2.0, 4.02, 6.0], duration=9.5)
+    assert [(c['index'], c['start'], c['end'], c['copy']) for c in plan] == [
+        (1, 0.0, 4.0, True), (2, 4.0, 5.0, True), (4, 5.0, 9.5, False)]
+    assert [c['name'] for c in plan] == ['01 - Abertura.mp4', '02 - Perguntas⧸Respostas.mp4',
+                                         '04 - Capítulo 4.mp4']
+    assert all(c['copy'] for c in plan_chapters(CHAPTERS, 'mp3', duration=9.5))
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason="FFmpeg não encontrado")
+def test_split_chapters_with_ffmpeg(tmp_path):
+    """Gera um arquivo por capítulo, com a duração de cada um, na pasta com o nome do vídeo"""
+    create_media(str(tmp_path), 1)
+    source = str(tmp_path / 'video.mp4')
+    chapters = [{'start_time': 0, 'end_time': 2.0, 'title': 'Um'}, {'start_time': 2.0, 'title': 'Dois'}]
+    
+    files = split_chapters(source, chapters, 'mp4', shutil.which('ffmpeg'), shutil.which('ffprobe'), duration=5)
+    
+    assert files == [str(tmp_path / 'video' / '01 - Um.mp4'), str(tmp_path / 'video' / '02 - Dois.mp4')]
+    durations = [float(subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                                       '-of', 'csv=p=0', path], capture_output=True, text=True).stdout)
+                 for path in files]
+    assert durations[0] == pytest.approx(2.0, abs=0.2)
+    assert durations[1] == pytest.approx(3.0, abs=0.2)
+    assert all(os.path.getsize(path) > 0 for path in files)
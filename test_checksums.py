@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Testes dos checksums calculados durante o download
+"""
+
+import functools
+import hashlib
+import os
+import sqlite3
+
+import pytest
+
+import main
+from main import ChecksumRecorder, HistoryStore, checksum_algorithms, run_job, validate_manifest_row
+from benchmark import FixtureServer
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'STALL_READ_BLOCK_SIZE', 4096)
+    monkeypatch.setattr(main, 'StallWatchdog', functools.partial(main.StallWatchdog, min_speed=64 * 1024, window=1.0))
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    data = os.urandom(2 * 1024 * 1024)
+    (media_dir / 'video.mp4').write_bytes(data)
+    return media_dir, data
+
+
+def test_digest_survives_a_stall_restart_and_is_stored(media, tmp_path):
+    """O .part retomado é relido só até onde parou; o digest vai para o job, o histórico e o sidecar"""
+    media_dir, data = media
+    expected = hashlib.sha256(data).hexdigest()
+    messages = []
+    
+    with FixtureServer(str(media_dir), stall_after=512 * 1024, stall_requests=(2,)) as server:
+        url = f"{server.base_url}/media/video.mp4"
+        job = validate_manifest_row({'url': url, 'filename': 'primeiro'})
+        job.update(output_path=str(tmp_path), metrics=main.JobMetrics(url=url))
+        first = run_job(job, log=messages.append)
+        assert job['metrics'].stall_restarts == 1
+        
+        second_job = validate_manifest_row({'url': url, 'filename': 'copia'})
+        second_job['output_path'] = str(tmp_path)
+        second = run_job(second_job, log=messages.append)
+    
+    assert first['sha256'] == second['sha256'] == expected
+    assert any('calculado durante o download' in message for message in messages)
+    assert (tmp_path / 'primeiro.mp4.sha256').read_text() == f"{expected}  primeiro.mp4\n"
+    assert second['duplicate_of'] == first['file'] and 'duplicate_of' not in first
+    assert [entry['job_id'] for entry in main.get_history().search(expected)] == [second['job_id'], first['job_id']]
+
+
+def test_rewritten_file_is_hashed_again(tmp_path):
+    """Se o arquivo final mudou depois do download (pós-processamento), o digest é recalculado"""
+    recorder = ChecksumRecorder(['sha256'])
+    part = tmp_path / 'a.mp4.part'
+    with open(part, 'wb') as f:
+        stream = recorder.wrap(f, str(part), 'wb')
+        stream.write(b'abc')
+    os.replace(part, tmp_path / 'a.mp4')
+    recorder.progress_hook({'status': 'finished', 'filename': str(tmp_path / 'a.mp4')})
+    assert recorder.digest_for(tmp_path / 'a.mp4') == ({'sha256': hashlib.sha256(b'abc').hexdigest()}, True)
+    
+    (tmp_path / 'a.mp4').write_bytes(b'convertido')
+    assert recorder.digest_for(tmp_path / 'a.mp4') == ({'sha256': hashlib.sha256(b'convertido').hexdigest()}, False)
+
+
+def test_checksum_algorithms(monkeypatch):
+    monkeypatch.setenv(main.CHECKSUM_ENV_VAR, 'none')
+    assert checksum_algorithms() == ()
+    monkeypatch.setenv(main.CHECKSUM_ENV_VAR, 'md5')
+    with pytest.raises(ValueError):
+        checksum_algorithms()
+    monkeypatch.delenv(main.CHECKSUM_ENV_VAR)
+    assert checksum_algorithms() == ('sha256',)
+
+
+def test_old_history_database_gains_the_digest_column(tmp_path):
+    path = tmp_path / 'history.db'
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE history (job_id TEXT PRIMARY KEY, url TEXT NOT NULL, media_id TEXT, title TEXT, "
+               "download_type TEXT, status TEXT NOT NULL, error_type TEXT, error TEXT, file TEXT, "
+               "started_at REAL NOT NULL, finished_at REAL NOT NULL, total_seconds REAL, "
+               "downloaded_bytes INTEGER, job TEXT)")
+    db.close()
+    history = HistoryStore(path)
+    assert history.find_by_sha256('0' * 64) == []
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Testes do modo serviço (API HTTP local)
+"""
+
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+import main
+from main import JobService, make_api_handler
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Sobe o serviço com um download simulado que reporta progresso e respeita o cancelamento"""
+    release = threading.Event()
+    
+    def fake_download(url, output_path, download_type, custom_filename=None, progress_hook=None, **kwargs):
+        for downloaded in range(0, 101, 25):
+            progress_hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': 100})
+            # Como o yt-dlp, chama o hook a cada bloco enquanto a transferência anda devagar
+            while 'lento' in url and not release.wait(0.05):
+                progress_hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': 100})
+        return f"{output_path}/{custom_filename}.{download_type}"
+    
+    monkeypatch.setattr(main, 'download_media', fake_download)
+    monkeypatch.setattr(JobService, 'PROGRESS_INTERVAL', 0)
+    service = JobService(str(tmp_path), workers=1)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_api_handler(service, token='segredo'))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    session = requests.Session()
+    session.headers['Authorization'] = 'Bearer segredo'
+    session.base = f"http://127.0.0.1:{server.server_address[1]}"
+    session.release = release
+    yield session
+    release.set()
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def wait_status(api, job_id, status):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        record = api.get(f"{api.base}/jobs/{job_id}").json()
+        if record['status'] == status:
+            return record
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} não chegou a {status}: {record}")
+
+
+def test_submit_query_and_stream_events(api):
+    """Um job enviado pela API é baixado pelo engine e acompanhado por SSE"""
+    assert requests.get(f"{api.base}/jobs").status_code == 401
+    assert api.post(f"{api.base}/jobs", json={'url': 'nada'}).status_code == 400
+    
+    created = api.post(f"{api.base}/jobs", json={'url': 'https://youtu.be/lento', 'filename': 'aula'})
+    assert created.status_code == 201
+    job_id = created.json()['job_id']
+    
+    events = []
+    with api.get(f"{api.base}/jobs/{job_id}/events", stream=True, timeout=5) as response:
+        assert response.headers['Content-Type'] == 'text/event-stream'
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: '):
+                events.append(line[7:])
+                api.release.set()  # inscrito: o download pode terminar
+            elif line.startswith('data: ') and events[-1] == 'done':
+                final = json.loads(line[6:])
+    
+    assert events[-1] == 'done' and 'progress' in events
+    assert final['status'] == 'ok' and final['percent'] == 100.0
+    assert final['file'].endswith('aula.mp4')
+    assert [job['job_id'] for job in api.get(f"{api.base}/jobs?status=ok").json()] == [job_id]
+    assert 'conversor_jobs_total{status="ok"} 1' in api.get(f"{api.base}/metrics").text
+
+
+def test_cancel_running_and_queued_jobs(api):
+    running = api.post(f"{api.base}/jobs", json={'url': 'https://youtu.be/lento'}).json()['job_id']
+    queued = api.post(f"{api.base}/jobs", json={'url': 'https://youtu.be/depois'}).json()['job_id']
+    wait_status(api, running, 'running')
+    
+    assert api.delete(f"{api.base}/jobs/{queued}").status_code == 202
+    assert api.delete(f"{api.base}/jobs/{running}").status_code == 202
+    wait_status(api, running, 'cancelled')
+    assert wait_status(api, queued, 'cancelled')['file'] is None
+    assert api.delete(f"{api.base}/jobs/{running}").status_code == 409
+    assert api.delete(f"{api.base}/jobs/inexistente").status_code == 404
+
+
+def test_post_requires_json_content_type(api):
+    """Um formulário de outro site (text/plain ou urlencoded) não cria jobs"""
+    body = json.dumps({'url': 'https://youtu.be/abc'})
+    for content_type in ('text/plain', 'application/x-www-form-urlencoded'):
+        response = api.post(f"{api.base}/jobs", data=body, headers={'Content-Type': content_type})
+        assert response.status_code == 415
+    assert api.get(f"{api.base}/jobs").json() == []
+
+
+def test_without_token_only_local_host_names_are_accepted(tmp_path):
+    """Sem token, um Host estranho (DNS rebinding) é recusado; localhost passa"""
+    service = JobService(str(tmp_path), workers=1)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_api_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        assert requests.get(f"{base}/jobs", headers={'Host': 'evil.example:8765'}).status_code == 403
+        assert requests.post(f"{base}/jobs", json={'url': 'nada'},
+                             headers={'Host': 'evil.example'}).status_code == 403
+        assert requests.get(f"{base}/jobs", headers={'Host': f"localhost:{server.server_address[1]}"}).json() == []
+        assert requests.get(f"{base}/jobs", headers={'Host': '[::1]'}).status_code == 200
+        assert requests.post(f"{base}/jobs", json={'url': 'nada'}).status_code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_metadata_cache_reuses_recent_results():
+    calls = []
+    cache = main.MetadataCache(ttl=60)
+    fetch = lambda url: calls.append(url) or {'title': url}
+    assert cache.get('a', fetch) == cache.get('a', fetch) == {'title': 'a'}
+    assert calls == ['a']
+
+
+def test_only_the_latest_finished_jobs_are_kept(monkeypatch, tmp_path):
+    """Os registros terminados mais antigos saem da memória; os da fila e os recentes continuam"""
+    monkeypatch.setattr(main, 'download_media', lambda url, output_path, download_type, custom_filename=None,
+                        **kwargs: f"{output_path}/{custom_filename}.{download_type}")
+    service = JobService(str(tmp_path), workers=1, max_finished=2)
+    try:
+        job_ids = [service.submit({'url': f"https://youtu.be/v{index}", 'filename': f"v{index}"})['job_id']
+                   for index in range(5)]
+        deadline = time.monotonic() + 5
+        while service._jobs:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        
+        assert [record['job_id'] for record in service.list()] == job_ids[3:]
+        assert service.get(job_ids[0]) is None and not service.cancel(job_ids[0])
+        assert len(service._finished) == 2
+    finally:
+        service.close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Testes do controle de admissão pelo espaço em disco
+"""
+
+import collections
+import threading
+
+import pytest
+
+import main
+from main import DiskSpaceManager, DownloadEngine, InsufficientSpaceError
+
+Usage = collections.namedtuple('Usage', 'total used free')
+
+
+@pytest.fixture
+def space(monkeypatch):
+    """Disco simulado com 3000 bytes livres e sem margem"""
+    monkeypatch.delenv(main.SCRATCH_ENV_VAR, raising=False)
+    disk = {'free': 3000}
+    manager = DiskSpaceManager(margin=0, usage=lambda path: Usage(10_000, 10_000 - disk['free'], disk['free']))
+    manager.disk = disk
+    monkeypatch.setattr(main, '_disk_space', manager)
+    return manager
+
+
+def job(tmp_path, size, **extra):
+    return {'url': f"https://youtu.be/{size}", 'output_path': str(tmp_path), 'download_type': 'mp4',
+            'filesize': size, 'metrics': main.JobMetrics(), **extra}
+
+
+def test_reservation_shrinks_with_written_bytes_and_is_released(space, tmp_path):
+    """O MP4 reserva o dobro do tamanho; o que já foi gravado deixa de contar como pendente"""
+    first = job(tmp_path, 1000)
+    reservation = space.try_reserve(first)
+    device = reservation.work_device
+    assert reservation.outstanding(device) == 2000
+    
+    assert space.try_reserve(job(tmp_path, 1000)) is None  # 3000 - 2000 < 2000
+    
+    reservation.progress_hook({'status': 'downloading', 'filename': 'a.part', 'downloaded_bytes': 1000})
+    space.disk['free'] = 2000  # os bytes gravados aparecem como ocupados no disco
+    assert reservation.outstanding(device) == 1000
+    assert space.try_reserve(job(tmp_path, 500)) is not None
+    
+    space.release(first['metrics'].job_id)
+    assert space.reservation(first['metrics'].job_id) is None
+
+
+def test_job_that_never_fits_fails_fast(space, tmp_path):
+    """Sem outros jobs para liberar espaço, um tamanho conhecido grande demais vira InsufficientSpaceError"""
+    with pytest.raises(InsufficientSpaceError):
+        space.try_reserve(job(tmp_path, 5000))
+    
+    big = job(tmp_path, 5000)
+    assert space.admit(big) and isinstance(big['space_error'], InsufficientSpaceError)
+    # Tamanho desconhecido: é só um palpite, então o job é tentado
+    assert space.try_reserve(job(tmp_path, None)) is not None
+
+
+def test_engine_holds_jobs_until_space_is_released(space, tmp_path):
+    """O segundo job espera na fila até o primeiro liberar a reserva; um menor pode passar na frente"""
+    order = []
+    release_first = threading.Event()
+    held = []
+    
+    def runner(item):
+        order.append(item['url'])
+        if item['filesize'] == 1000:
+            release_first.wait(5)
+        return {'status': 'ok'}
+    
+    engine = DownloadEngine(runner, workers=2, policy='fifo', on_hold=lambda item: held.append(item['url']))
+    engine.submit(job(tmp_path, 1000))
+    engine.submit(job(tmp_path, 900))
+    engine.submit(job(tmp_path, 400))
+    
+    deadline = main.time.monotonic() + 5
+    while len(order) < 2 and main.time.monotonic() < deadline:
+        main.time.sleep(0.01)
+    assert order == ['https://youtu.be/1000', 'https://youtu.be/400']
+    assert held == ['https://youtu.be/900']
+    
+    release_first.set()
+    engine.close()
+    assert order[-1] == 'https://youtu.be/900'
+    assert not space._reservations
+
+
+def test_admission_errors_do_not_stop_the_workers(monkeypatch, tmp_path):
+    """Se o espaço não puder ser medido, o job segue sem reserva em vez de derrubar o worker"""
+    def broken(path):
+        raise OSError("disco desconectado")
+    
+    monkeypatch.setattr(main, '_disk_space', DiskSpaceManager(usage=broken))
+    results = []
+    engine = DownloadEngine(lambda item: {'status': 'ok'}, workers=1,
+                            on_result=lambda item, result: results.append(result))
+    engine.submit(job(tmp_path, 1000))
+    engine.submit({'id': 'sem url'})
+    engine.close()
+    assert results == [{'status': 'ok'}, {'status': 'ok'}]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Testes do download de fragmentos HLS em paralelo, gravados em ordem
+"""
+
+import hashlib
+import os
+
+import main
+from main import download_media
+from benchmark import FixtureServer, write_hls
+
+
+def test_fragments_are_fetched_in_parallel_and_written_in_order(monkeypatch, tmp_path):
+    """Vários fragmentos ao mesmo tempo, sem arquivos -FragN, e o checksum do arquivo final"""
+    media_dir, output = tmp_path / 'media', tmp_path / 'out'
+    media_dir.mkdir()
+    data = write_hls(str(media_dir), 'aula', segments=16, segment_size=128 * 1024)
+    monkeypatch.setenv(main.FRAGMENT_WORKERS_ENV_VAR, '')  # restaurada ao fim do teste
+    main.configure_fragment_workers(3)
+    
+    with FixtureServer(str(media_dir), latency=0.05) as server:
+        filename = download_media(f"{server.base_url}/media/aula.m3u8", str(output), 'mp4', 'aula')
+    
+    assert filename == str(output / 'aula.mp4')
+    assert (output / 'aula.mp4').read_bytes() == data
+    assert sorted(os.listdir(output)) == ['aula.mp4', 'aula.mp4.sha256']
+    assert (output / 'aula.mp4.sha256').read_text().split()[0] == hashlib.sha256(data).hexdigest()
+    assert 2 <= server.peak_active <= 3
+
+
+def test_missing_fragment_is_skipped(monkeypatch, tmp_path):
+    """Um fragmento que não existe (404) é pulado e os seguintes continuam na ordem"""
+    media_dir, output = tmp_path / 'media', tmp_path / 'out'
+    media_dir.mkdir()
+    write_hls(str(media_dir), 'aula', segments=6, segment_size=64 * 1024)
+    segments = [(media_dir / f"aula-{index}.ts").read_bytes() for index in range(6)]
+    (media_dir / 'aula-2.ts').unlink()
+    monkeypatch.setenv(main.FRAGMENT_WORKERS_ENV_VAR, '')
+    main.configure_fragment_workers(4)
+    
+    with FixtureServer(str(media_dir)) as server:
+        filename = download_media(f"{server.base_url}/media/aula.m3u8", str(output), 'mp4', 'aula')
+    
+    assert open(filename, 'rb').read() == b''.join(segments[:2] + segments[3:])
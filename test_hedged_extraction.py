@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testes da extração paralela entre configurações de player_client
+"""
+
+import threading
+import time
+
+import pytest
+
+from main import hedged_extract_info, PlayerClientStats
+
+
+class FakeYoutubeDL:
+    """Imita o YoutubeDL: cada player_client tem sua latência e resultado"""
+    behaviour = {}
+    started = []
+    
+    def __init__(self, params):
+        self.client = tuple(params['extractor_args']['youtube']['player_client'])
+        assert params['extractor_args']['youtube']['skip'] == ['hls']
+    
+    def urlopen(self, request):
+        return request
+    
+    def extract_info(self, url, download=False, process=False):
+        self.started.append(self.client)
+        delay, error = self.behaviour[self.client]
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            self.urlopen('poll')
+            time.sleep(0.01)
+        if error:
+            raise Exception(error)
+        return {'id': url, 'client': self.client}
+    
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_ydl():
+    FakeYoutubeDL.started = []
+    return FakeYoutubeDL
+
+
+OPTS = {'extractor_args': {'youtube': {'player_client': ['android', 'ios'], 'skip': ['hls']}}}
+CLIENTS = (('android', 'ios'), ('web',), ('tv_embedded',))
+
+
+def test_slow_client_is_hedged_and_fastest_wins(fake_ydl, tmp_path):
+    """Sem resposta no prazo, a próxima configuração dispara; a mais rápida vence"""
+    fake_ydl.behaviour = {('android', 'ios'): (1.0, None), ('web',): (0.05, None), ('tv_embedded',): (0.05, None)}
+    stats = PlayerClientStats(tmp_path / 'clients.json')
+    
+    info, client = hedged_extract_info('vid', OPTS, CLIENTS, stats=stats, hedge_delay=0.1, ydl_class=fake_ydl)
+    
+    assert client == ('web',)
+    assert info['client'] == ('web',)
+    assert ('tv_embedded',) not in fake_ydl.started
+    assert stats.snapshot()['web']['successes'] == 1
+    # O histórico persistido coloca a configuração vencedora na frente
+    assert PlayerClientStats(tmp_path / 'clients.json').order(CLIENTS)[0] == ('web',)
+
+
+def test_failures_fall_through_and_last_error_is_raised(fake_ydl):
+    fake_ydl.behaviour = {c: (0, f'falhou {c[0]}') for c in CLIENTS}
+    stats = PlayerClientStats()
+    
+    with pytest.raises(Exception, match='falhou tv_embedded'):
+        hedged_extract_info('vid', OPTS, CLIENTS, stats=stats, hedge_delay=5, ydl_class=fake_ydl)
+    assert fake_ydl.started == list(CLIENTS)
+    assert all(entry['successes'] == 0 for entry in stats.snapshot().values())
+
+
+def test_losing_attempts_are_cancelled(fake_ydl):
+    """A tentativa lenta para na próxima requisição depois que outra venceu, sem contar como falha"""
+    fake_ydl.behaviour = {('android', 'ios'): (0.5, None), ('web',): (0.0, None)}
+    stats = PlayerClientStats()
+    hedging = lambda: [t for t in threading.enumerate() if t.name.startswith('hedge-')]
+    
+    hedged_extract_info('vid', OPTS, CLIENTS[:2], stats=stats, hedge_delay=0.05, ydl_class=fake_ydl)
+    
+    deadline = time.monotonic() + 0.3
+    while hedging() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not hedging()
+    loser = stats.snapshot()['android,ios']
+    assert (loser['attempts'], loser['successes'], loser['cancelled']) == (0, 0, 1)
+    assert stats.expected_seconds(('android', 'ios')) == PlayerClientStats().expected_seconds(('android', 'ios'))
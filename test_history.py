@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Testes do histórico de jobs em SQLite
+"""
+
+import time
+
+import pytest
+
+import main
+from main import HistoryStore, JobMetrics, parse_since, validate_manifest_row
+
+
+def finished_job(history, url, status, title=None, error=None, **row):
+    metrics = JobMetrics(url=url, download_type='mp4')
+    metrics.title = title
+    metrics.finish(status)
+    history.record(metrics, validate_manifest_row({'url': url, **row}), {'status': status, 'error': error})
+    return metrics.job_id
+
+
+def test_search_by_url_media_id_title_and_status(tmp_path):
+    history = HistoryStore(tmp_path / 'history.db')
+    finished_job(history, 'https://youtu.be/dQw4w9WgXcQ', 'ok', title='Aula de Física')
+    finished_job(history, 'https://vimeo.com/1', 'error', error='HTTP Error 403')
+    
+    assert [e['title'] for e in history.search('aula de')] == ['Aula de Física']
+    assert history.search('dQw4w9WgXcQ')[0]['media_id'] == 'dQw4w9WgXcQ'
+    assert history.search(' https://vimeo.com/1 ')[0]['error'] == 'HTTP Error 403'
+    assert [e['status'] for e in history.search(status='error')] == ['error']
+    assert history.search(since=time.time() + 60) == []
+    # Reabre o arquivo: o histórico sobrevive ao fechamento do programa
+    history.close()
+    assert len(HistoryStore(tmp_path / 'history.db').search()) == 2
+
+
+def test_failed_since_skips_urls_that_later_succeeded(monkeypatch):
+    history = HistoryStore(':memory:')
+    now = [1000.0]
+    monkeypatch.setattr(main.time, 'time', lambda: now[0])
+    finished_job(history, 'https://youtu.be/antigo', 'error')
+    now[0] = 2000.0
+    finished_job(history, 'https://youtu.be/a', 'error', type='mp3', filename='Aula', start='10')
+    finished_job(history, 'https://youtu.be/b', 'error')
+    finished_job(history, 'https://youtu.be/a', 'error', type='mp3', filename='Aula', start='10')
+    now[0] = 2001.0
+    finished_job(history, 'https://youtu.be/b', 'ok')
+    
+    rows = history.failed_since(1500.0)
+    assert rows == [{'url': 'https://youtu.be/a', 'type': 'mp3', 'filename': 'Aula', 'format': 'best',
+                     'start': 10.0, 'priority': 1}]
+    assert validate_manifest_row(rows[0])['clip_range'] == (10.0, float('inf'))
+
+
+def test_queries_use_indexes_on_a_large_history():
+    """Com dezenas de milhares de jobs, os filtros usam índices em vez de varrer a tabela"""
+    history = HistoryStore(':memory:')
+    rows = [(f"job{i}", f"https://youtu.be/v{i}", f"v{i}", f"Vídeo {i}", 'mp4', 'error' if i % 10 == 0 else 'ok',
+             None, None, None, i, i, 1.0, 0, None) for i in range(30_000)]
+    columns = HistoryStore.COLUMNS
+    history._db.executemany(f"INSERT INTO history ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+    
+    for sql, params in (("SELECT * FROM history WHERE url = ?", ('x',)),
+                        ("SELECT * FROM history WHERE media_id = ?", ('x',)),
+                        ("SELECT * FROM history WHERE status = ? ORDER BY finished_at DESC", ('error',))):
+        plan = ' '.join(row[-1] for row in history._db.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        assert 'USING INDEX' in plan or 'USING COVERING INDEX' in plan, plan
+    
+    assert [e['job_id'] for e in history.search('v12345')] == ['job12345']
+    assert len(history.search(status='error', since=29_000, limit=1000)) == 100
+    assert len(history.failed_since(29_000)) == 100
+
+
+def test_parse_since():
+    assert parse_since('2026-10-01') == pytest.approx(time.mktime((2026, 10, 1, 0, 0, 0, 0, 0, -1)))
+    assert time.time() - parse_since('2d') == pytest.approx(2 * 86400, abs=5)
+    with pytest.raises(ValueError):
+        parse_since('ontem')
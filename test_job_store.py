@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Testes da fila compartilhada entre workers (JobStore)
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import main
+from main import JobStore, validate_manifest_row
+from benchmark import FixtureServer
+
+
+def job(url, **row):
+    return validate_manifest_row({'url': url, **row})
+
+
+def test_claim_order_lease_expiry_and_requeue(tmp_path):
+    """Jobs curtos saem primeiro; lease vencido devolve o job; reivindicações demais viram erro"""
+    now = [1000.0]
+    store = JobStore(tmp_path / 'fila.db', lease_seconds=10, max_claims=2, clock=lambda: now[0])
+    long_id = store.enqueue(job('https://youtu.be/longo'), line=1)
+    short_id = store.enqueue(job('https://youtu.be/curto', start='0', end='30'), line=2)
+    
+    first = store.claim('a')
+    assert first['job_id'] == short_id and first['clip_range'] == (0.0, 30.0)
+    assert store.claim('b')['job_id'] == long_id
+    assert store.claim('b') is None
+    
+    # 'a' morre sem renovar; 'b' continua mandando sinal de vida
+    now[0] += 8
+    assert store.heartbeat(long_id, 'b')
+    now[0] += 3
+    assert store.claim('c')['job_id'] == short_id
+    assert not store.heartbeat(short_id, 'a')
+    assert not store.complete(short_id, 'a', {'status': 'ok', 'file': 'velho.mp4'})
+    
+    assert store.complete(long_id, 'b', {'status': 'ok', 'file': 'longo.mp4'})
+    now[0] += 11
+    assert store.claim('d') is None  # segunda reivindicação do curto vencida: erro
+    assert store.counts() == {'ok': 1, 'error': 1}
+    assert store.is_drained()
+    results = list(store.results())
+    assert [r['line'] for r in results] == [1, 2]
+    assert results[1]['error_type'] == 'WorkerLostError'
+
+
+def test_cancelled_job_returns_to_the_queue(tmp_path):
+    store = JobStore(tmp_path / 'fila.db')
+    job_id = store.enqueue(job('https://youtu.be/a'))
+    store.claim('a')
+    assert store.complete(job_id, 'a', {'status': 'cancelled'})
+    assert store.claim('b')['job_id'] == job_id
+
+
+def start_worker(store_path, output, *extra):
+    return subprocess.Popen(
+        [sys.executable, 'main.py', '--store', str(store_path), '--worker', '--output', str(output),
+         '--workers', '1', *extra],
+        cwd=os.path.dirname(os.path.abspath(main.__file__)),
+        env={**os.environ, 'CONVERSOR_DATA_DIR': str(store_path.parent / 'dados')},
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+
+def test_worker_processes_share_the_queue(tmp_path):
+    """Vários processos esvaziam a mesma fila sem repetir jobs"""
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    for i in range(6):
+        (media_dir / f"v{i}.mp4").write_bytes(os.urandom(64 * 1024))
+    output = tmp_path / 'out'
+    output.mkdir()
+    store_path = tmp_path / 'fila.db'
+    
+    with FixtureServer(str(media_dir), latency=0.2) as server:
+        store = JobStore(store_path)
+        for i in range(6):
+            store.enqueue(job(f"{server.base_url}/media/v{i}.mp4", filename=f"v{i}"), line=i + 1)
+        workers = [start_worker(store_path, output, '--exit-when-idle') for _ in range(3)]
+        for worker in workers:
+            worker.wait(60)
+            assert worker.returncode == 0, worker.stdout.read()
+    
+    results = list(store.results())
+    assert [r['status'] for r in results] == ['ok'] * 6
+    assert sorted(os.listdir(output)) == sorted(f"v{i}.mp4{ext}" for i in range(6) for ext in ('', '.sha256'))
+    assert store._db.execute("SELECT MAX(claims) FROM jobs").fetchone()[0] == 1
+
+
+def test_job_of_a_killed_worker_is_taken_over(tmp_path):
+    """Um worker morto no meio do download perde o lease e outro termina o job"""
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    data = os.urandom(1024 * 1024)
+    (media_dir / 'video.mp4').write_bytes(data)
+    output = tmp_path / 'out'
+    output.mkdir()
+    store_path = tmp_path / 'fila.db'
+    
+    # A requisição 2 (download do primeiro worker) trava depois de 256 KB
+    with FixtureServer(str(media_dir), stall_after=256 * 1024, stall_requests=(2,)) as server:
+        store = JobStore(store_path)
+        job_id = store.enqueue(job(f"{server.base_url}/media/video.mp4", filename='video'))
+        first = start_worker(store_path, output, '--lease', '1')
+        wait_for(lambda: server.media_requests >= 2 and (output / 'video.mp4.part').exists())
+        first.kill()
+        first.wait()
+        
+        second = start_worker(store_path, output, '--lease', '1', '--exit-when-idle')
+        second.wait(60)
+        assert second.returncode == 0, second.stdout.read()
+    
+    [result] = store.results()
+    assert result['status'] == 'ok' and result['job_id'] == job_id
+    assert (output / 'video.mp4').read_bytes() == data
+    assert store._db.execute("SELECT claims FROM jobs").fetchone()[0] == 2
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Testes das subpastas do destino e do índice de caminhos
+"""
+
+import os
+
+import pytest
+
+import main
+from main import PathIndex, download_media, layout_subdir
+from benchmark import FixtureServer
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, '_path_indexes', {})
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    for name in ('palestra', 'outra'):
+        (media_dir / f"{name}.mp4").write_bytes(os.urandom(256 * 1024))
+    return media_dir
+
+
+def test_index_gives_each_media_its_own_name(tmp_path):
+    """A mesma chave volta ao mesmo caminho; outra mídia com o mesmo nome recebe -2"""
+    index = PathIndex(tmp_path)
+    assert index.claim('Youtube:a|mp4|', 'ab/cd', 'aula', 'mp4') == 'ab/cd/aula.mp4'
+    assert index.claim('Youtube:b|mp4|', 'ab/cd', 'aula', 'mp4') == 'ab/cd/aula-2.mp4'
+    assert index.claim('Youtube:a|mp4|', 'ab/cd', 'aula', 'mp4') == 'ab/cd/aula.mp4'
+    
+    (tmp_path / 'antigo.mp3').write_bytes(b'')  # gravado antes do índice
+    assert index.claim('Youtube:c|mp3|', '', 'antigo', 'mp3') == 'antigo-2.mp3'
+    index.close()
+    
+    reopened = PathIndex(tmp_path)
+    assert reopened.lookup('Youtube:b|mp4|') == str(tmp_path / 'ab' / 'cd' / 'aula-2.mp4')
+    assert reopened.lookup('Youtube:x|mp4|') is None
+
+
+def test_layout_subdirs():
+    info = {'upload_date': '20240315', 'uploader': 'Canal/Oficial'}
+    assert layout_subdir('date', info, 'k') == os.path.join('2024', '03')
+    assert '/' not in layout_subdir('uploader', info, 'k')
+    first, second = layout_subdir('hash', {}, 'Youtube:a').split(os.sep)
+    assert len(first) == len(second) == 2
+    assert layout_subdir('flat', info, 'k') == ''
+
+
+def test_sharded_downloads_never_overwrite_each_other(monkeypatch, media, tmp_path):
+    """Duas mídias com o mesmo nome pedido vão para a mesma subpasta com nomes distintos"""
+    monkeypatch.setenv(main.LAYOUT_ENV_VAR, 'uploader')
+    output = tmp_path / 'saida'
+    with FixtureServer(str(media)) as server:
+        first = download_media(f"{server.base_url}/media/palestra.mp4", str(output), 'mp4', 'aula')
+        second = download_media(f"{server.base_url}/media/outra.mp4", str(output), 'mp4', 'aula')
+        again = download_media(f"{server.base_url}/media/palestra.mp4", str(output), 'mp4', 'aula')
+    
+    assert first == again == str(output / 'desconhecido' / 'aula.mp4')
+    assert second == str(output / 'desconhecido' / 'aula-2.mp4')
+    assert (output / 'desconhecido' / 'aula.mp4').read_bytes() == (media / 'palestra.mp4').read_bytes()
+    assert (output / 'desconhecido' / 'aula-2.mp4').read_bytes() == (media / 'outra.mp4').read_bytes()
+
+
+def test_hash_layout_with_scratch_publishes_into_the_shard(monkeypatch, media, tmp_path):
+    """Com pasta temporária, o arquivo é baixado nela e publicado direto na subpasta"""
+    monkeypatch.setenv(main.LAYOUT_ENV_VAR, 'hash')
+    monkeypatch.setenv(main.SCRATCH_ENV_VAR, str(tmp_path / 'scratch'))
+    output = tmp_path / 'saida'
+    with FixtureServer(str(media)) as server:
+        filename = download_media(f"{server.base_url}/media/palestra.mp4", str(output), 'mp4')
+    
+    shard = layout_subdir('hash', {}, 'Generic:palestra')
+    assert filename == str(output / shard / 'palestra.mp4')
+    assert sorted(os.listdir(output / shard)) == ['palestra.mp4', 'palestra.mp4.sha256']
+    assert os.listdir(tmp_path / 'scratch') == []
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Testes da gravação de transmissões ao vivo em segmentos
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import main
+from main import parse_live_playlist, record_live
+from benchmark import FixtureServer, write_hls
+
+
+def publish(media_dir, count, ended=False, first=0):
+    """Reescreve a playlist ao vivo com os fragmentos first..count-1 (como a janela de uma transmissão)"""
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1', f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+    for index in range(first, count):
+        lines += ['#EXTINF:1.0,', f"live-{index}.ts"]
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+    (media_dir / 'live.m3u8.tmp').write_text('\n'.join(lines) + '\n')
+    os.replace(media_dir / 'live.m3u8.tmp', media_dir / 'live.m3u8')
+
+
+def test_parse_live_playlist():
+    text = ('#EXTM3U\n#EXT-X-TARGETDURATION:4\n#EXT-X-MEDIA-SEQUENCE:120\n#EXT-X-MAP:URI="init.mp4"\n'
+            '#EXTINF:4.0,\na.m4s\n#EXTINF:3.5,\nhttps://cdn/b.m4s\n')
+    playlist = parse_live_playlist(text, 'https://origem/live/index.m3u8')
+    assert playlist['segments'] == [(120, 4.0, 'https://origem/live/a.m4s'), (121, 3.5, 'https://cdn/b.m4s')]
+    assert playlist['init'] == 'https://origem/live/init.mp4'
+    assert playlist['target_duration'] == 4.0 and not playlist['ended']
+    with pytest.raises(ValueError):
+        parse_live_playlist('#EXTM3U\n#EXT-X-KEY:METHOD=AES-128,URI="k"\n#EXTINF:4,\na.ts\n', 'https://origem/')
+
+
+def test_segments_close_while_recording_and_old_ones_are_removed(tmp_path):
+    """Cada segmento fica pronto durante a transmissão; com retain=2, só os dois últimos ficam"""
+    media_dir, output = tmp_path / 'media', tmp_path / 'out'
+    media_dir.mkdir()
+    write_hls(str(media_dir), 'live', segments=10, segment_size=32 * 1024, segment_seconds=1, ended=False)
+    fragments = [(media_dir / f"live-{index}.ts").read_bytes() for index in range(10)]
+    publish(media_dir, 3)
+    recording, ready_before_end = threading.Event(), threading.Event()
+    
+    def log(message):
+        if message.startswith('🔴'):
+            recording.set()
+        if message.startswith('✅ Pronto: live-001.ts'):
+            ready_before_end.set()
+    
+    def broadcast():
+        # A janela anda: os fragmentos mais antigos saem da playlist, como numa transmissão real
+        recording.wait(5)
+        for count in range(4, 11):
+            time.sleep(0.1)
+            publish(media_dir, count, first=max(0, count - 8))
+        ready_before_end.wait(5)
+        publish(media_dir, 10, ended=True, first=2)
+    
+    with FixtureServer(str(media_dir)) as server:
+        feeder = threading.Thread(target=broadcast)
+        feeder.start()
+        kept = record_live(f"{server.base_url}/media/live.m3u8", str(output), 'mp4', 'live',
+                           segment_seconds=4, retain=2, log=log, poll_interval=0.05)
+        feeder.join()
+    
+    assert kept == [str(output / 'live-002.ts'), str(output / 'live-003.ts')]
+    assert sorted(os.listdir(output)) == ['live-002.ts', 'live-002.ts.sha256', 'live-003.ts', 'live-003.ts.sha256']
+    assert (output / 'live-002.ts').read_bytes() == b''.join(fragments[4:8])
+    assert (output / 'live-003.ts').read_bytes() == b''.join(fragments[8:])
+    digest = hashlib.sha256(b''.join(fragments[8:])).hexdigest()
+    assert (output / 'live-003.ts.sha256').read_text() == f"{digest}  live-003.ts\n"
+    assert ready_before_end.is_set()
+
+
+def test_stop_event_closes_the_open_segment(tmp_path):
+    """Interromper a gravação fecha o segmento em andamento, que fica pronto como os outros"""
+    media_dir, output = tmp_path / 'media', tmp_path / 'out'
+    media_dir.mkdir()
+    write_hls(str(media_dir), 'live', segments=3, segment_size=16 * 1024, segment_seconds=1, ended=False)
+    publish(media_dir, 3)
+    stop = threading.Event()
+    
+    def log(message):
+        if message.startswith('🔴'):
+            threading.Timer(0.3, stop.set).start()
+    
+    with FixtureServer(str(media_dir)) as server:
+        kept = record_live(f"{server.base_url}/media/live.m3u8", str(output), 'mp4', 'live',
+                           segment_seconds=600, log=log, stop_event=stop, poll_interval=0.05)
+    
+    assert kept == [str(output / 'live-001.ts')]
+    assert (output / 'live-001.ts').stat().st_size == 3 * 16 * 1024
+    assert not list(output.glob('*.part'))
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is not None, reason="FFmpeg instalado")
+def test_mp3_without_ffmpeg_fails_before_recording(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        record_live('https://example.com/live.m3u8', str(tmp_path), 'mp3')
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_fragment_is_retried_or_skipped(monkeypatch, tmp_path):
+    """Uma falha passageira é repetida; um fragmento que não existe é pulado e a gravação continua"""
+    media_dir, output = tmp_path / 'media', tmp_path / 'out'
+    media_dir.mkdir()
+    write_hls(str(media_dir), 'live', segments=6, segment_size=16 * 1024, segment_seconds=1, ended=False)
+    fragments = [(media_dir / f"live-{index}.ts").read_bytes() for index in range(6)]
+    (media_dir / 'live-4.ts').unlink()
+    publish(media_dir, 6, ended=True)
+    real_fetch = main.LiveRecorder.fetch
+    failures = []
+    
+    def fetch(self, url):
+        if url.endswith('live-2.ts') and not failures:
+            failures.append(url)
+            raise ConnectionResetError(104, 'Connection reset by peer')
+        return real_fetch(self, url)
+    
+    monkeypatch.setattr(main.LiveRecorder, 'fetch', fetch)
+    messages = []
+    with FixtureServer(str(media_dir)) as server:
+        kept = record_live(f"{server.base_url}/media/live.m3u8", str(output), 'mp4', 'live',
+                           segment_seconds=2, log=messages.append, poll_interval=0.01)
+    
+    assert failures
+    assert kept == [str(output / f"live-00{index}.ts") for index in (1, 2, 3)]
+    assert (output / 'live-002.ts').read_bytes() == b''.join(fragments[2:4])
+    assert (output / 'live-003.ts').read_bytes() == fragments[5]
+    assert any(message.startswith('⚠️ Fragmento 4 pulado') for message in messages)
+    assert '⚠️ 1 fragmento(s) perdidos durante a gravação' in messages
+
+
+def test_failed_conversion_does_not_stop_the_recording(monkeypatch, tmp_path):
+    """Uma falha ao finalizar um segmento é registrada e os seguintes continuam prontos"""
+    media_dir, output = tmp_path / 'media', tmp_path / 'out'
+    media_dir.mkdir()
+    write_hls(str(media_dir), 'live', segments=6, segment_size=16 * 1024, segment_seconds=1, ended=False)
+    publish(media_dir, 6, ended=True)
+    real_sidecars = main.write_checksum_sidecars
+    
+    def write_checksum_sidecars(path, digests):
+        if path.endswith('-001.ts'):
+            raise OSError(28, 'No space left on device')
+        return real_sidecars(path, digests)
+    
+    monkeypatch.setattr(main, 'write_checksum_sidecars', write_checksum_sidecars)
+    messages = []
+    with FixtureServer(str(media_dir)) as server:
+        kept = record_live(f"{server.base_url}/media/live.m3u8", str(output), 'mp4', 'live',
+                           segment_seconds=2, log=messages.append, poll_interval=0.01)
+    
+    assert kept == [str(output / 'live-002.ts'), str(output / 'live-003.ts')]
+    assert any(message.startswith('❌ Falha ao finalizar live-001.ts') for message in messages)
+    assert '⚠️ 1 segmento(s) não foram finalizados' in messages
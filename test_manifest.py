@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Testes da importação de manifestos de jobs
+"""
+
+import json
+import threading
+
+import pytest
+
+import main
+from main import validate_manifest_row, iter_manifest, run_manifest, DownloadEngine
+
+
+@pytest.fixture(autouse=True)
+def offline_jobs(monkeypatch):
+    """Jobs sem retentativas nem acesso à rede para os metadados"""
+    # Sem retentativas: os erros simulados devem aparecer de imediato
+    monkeypatch.setattr(main, 'RETRY_POLICIES', {})
+    # Os metadados usados para ordenar a fila não saem para a rede
+    monkeypatch.setattr(main, 'fetch_video_info', lambda url: {'title': url, 'duration': 60})
+
+
+def test_validate_manifest_row():
+    """Converte aliases de tipo, trechos e nomes de arquivo"""
+    job = validate_manifest_row({
+        'url': ' https://youtu.be/abc ', 'type': 'audio', 'filename': 'Aula: 1',
+        'format': '720p', 'start': '1:30', 'end': '', 'priority': '3',
+    })
+    assert job == {
+        'url': 'https://youtu.be/abc',
+        'download_type': 'mp3',
+        'custom_filename': 'Aula 1',
+        'format_policy': '720p',
+        'clip_range': (90.0, float('inf')),
+        'priority': 3,
+    }
+    
+    for row in ({'url': 'nada'}, {'url': 'https://youtu.be/a', 'type': 'avi'},
+                {'url': 'https://youtu.be/a', 'format': '4k'},
+                {'url': 'https://youtu.be/a', 'start': '10', 'end': '5'},
+                {'url': 'https://youtu.be/a', 'priority': '0'}):
+        with pytest.raises(ValueError):
+            validate_manifest_row(row)
+
+
+def test_iter_manifest_reports_bad_json(tmp_path):
+    """Linhas JSON inválidas viram mensagens de erro, sem interromper a leitura"""
+    manifest = tmp_path / 'jobs.jsonl'
+    manifest.write_text('{"url": "https://youtu.be/a"}\n\n{quebrado\n[1]\n', encoding='utf-8')
+    rows = list(iter_manifest(manifest))
+    assert rows[0] == (1, {'url': 'https://youtu.be/a'})
+    assert rows[1][0] == 3 and rows[1][1].startswith("JSON inválido")
+    assert rows[2] == (4, "a linha não é um objeto JSON")
+
+
+def test_run_manifest_writes_results(tmp_path, monkeypatch):
+    """Cada linha gera exatamente uma linha no manifesto de resultados"""
+    def fake_download(url, output_path, download_type, custom_filename=None, **kwargs):
+        if url.endswith('erro'):
+            raise RuntimeError("HTTP Error 403: Forbidden")
+        return f"{output_path}/{custom_filename}.{download_type}"
+    monkeypatch.setattr(main, 'download_media', fake_download)
+    
+    manifest = tmp_path / 'jobs.csv'
+    manifest.write_text(
+        "url,type,filename\n"
+        "https://youtu.be/a,mp3,a\n"
+        "invalida,mp4,b\n"
+        "https://youtu.be/erro,mp4,c\n",
+        encoding='utf-8'
+    )
+    results = tmp_path / 'results.jsonl'
+    counts = run_manifest(manifest, str(tmp_path), results, workers=2, log=lambda m: None)
+    
+    assert counts == {'ok': 1, 'error': 1, 'invalid': 1}
+    rows = sorted((json.loads(line) for line in results.read_text().splitlines()), key=lambda r: r['line'])
+    assert [r['status'] for r in rows] == ['ok', 'invalid', 'error']
+    assert rows[0]['file'].endswith('a.mp3')
+    assert rows[0]['job_id'] and rows[2]['job_id']
+    assert rows[2]['error_type'] == 'AccessDeniedError'
+    assert 'conversor_jobs_total{status="error"} 1' in main.get_metrics_recorder().render_prometheus()
+
+
+def test_engine_applies_backpressure():
+    """submit() bloqueia enquanto a fila limitada estiver cheia"""
+    release = threading.Event()
+    engine = DownloadEngine(lambda job: release.wait() and {'status': 'ok'}, workers=1, max_pending=1)
+    engine.submit({'id': 1})  # ocupa o worker
+    engine.submit({'id': 2})  # ocupa a fila
+    
+    blocked = threading.Thread(target=engine.submit, args=({'id': 3},))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    
+    release.set()
+    blocked.join(2)
+    assert not blocked.is_alive()
+    engine.close()
+
+
+def test_headless_only_options_are_reported_for_the_gui():
+    """Na interface, só as opções exclusivas dos modos sem interface que foram informadas geram aviso"""
+    assert main.headless_only_options(main.parse_args([])) == []
+    args = main.parse_args(['--schedule', 'fifo', '--port', '9000', '--workers', '4', '--max-bandwidth', '2M'])
+    assert main.headless_only_options(args) == ['--schedule', '--port']
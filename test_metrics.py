@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Testes das métricas por job
+"""
+
+import json
+
+from main import JobMetrics, MetricsRecorder
+
+
+def test_job_metrics_from_hooks():
+    """TTFB, bytes e etapas de pós-processamento vêm dos hooks do yt-dlp"""
+    metrics = JobMetrics(url='https://youtu.be/a', download_type='mp4')
+    with metrics.stage('extraction'):
+        pass
+    metrics.mark_download_start()
+    metrics.progress_hook({'status': 'downloading', 'filename': 'v.mp4', 'downloaded_bytes': 100})
+    metrics.progress_hook({'status': 'finished', 'filename': 'v.mp4', 'downloaded_bytes': 300})
+    metrics.progress_hook({'status': 'finished', 'filename': 'a.m4a', 'downloaded_bytes': 200})
+    metrics.postprocessor_hook({'status': 'started', 'postprocessor': 'Merger'})
+    metrics.postprocessor_hook({'status': 'finished', 'postprocessor': 'Merger'})
+    metrics.finish('ok')
+    
+    data = metrics.to_dict()
+    assert data['downloaded_bytes'] == 500
+    assert data['ttfb_seconds'] is not None
+    assert set(data['stages']) == {'extraction', 'download', 'merge'}
+    assert data['total_seconds'] >= data['stages']['download']
+
+
+def test_recorder_writes_jsonl_and_prometheus(tmp_path):
+    """Cada job vira uma linha JSON e entra nos agregados do Prometheus"""
+    recorder = MetricsRecorder(tmp_path / 'm.jsonl', tmp_path / 'm.prom')
+    for status in ('ok', 'ok', 'error'):
+        metrics = JobMetrics()
+        metrics.add_stage('extraction', 0.5)
+        metrics.finish(status)
+        recorder.record(metrics)
+    
+    lines = (tmp_path / 'm.jsonl').read_text().splitlines()
+    assert [json.loads(line)['status'] for line in lines] == ['ok', 'ok', 'error']
+    prom = (tmp_path / 'm.prom').read_text()
+    assert 'conversor_jobs_total{status="ok"} 2' in prom
+    assert 'conversor_stage_seconds_sum{stage="extraction"} 1.500000' in prom
+    assert 'conversor_stage_seconds_count{stage="total"} 3' in prom
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Testes do pós-processamento em uma passada (MP3, tags, capa e loudness)
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+import main
+from main import LoudnessCache, download_media, loudnorm_filter, parse_loudnorm_stats, single_pass_args
+from benchmark import FixtureServer, create_media
+
+LOUDNORM_OUTPUT = """[Parsed_loudnorm_0 @ 0x55d0c8a0]
+{
+	"input_i" : "-27.61",
+	"input_tp" : "-4.47",
+	"input_lra" : "18.06",
+	"input_thresh" : "-39.20",
+	"output_i" : "-16.58",
+	"output_tp" : "-1.50",
+	"output_lra" : "14.78",
+	"output_thresh" : "-27.71",
+	"normalization_type" : "dynamic",
+	"target_offset" : "0.58"
+}
+size=    2843kB time=00:03:00.02 bitrate= 129.4kbits/s speed=48.2x
+"""
+
+MEASURED = {'input_i': -27.61, 'input_tp': -4.47, 'input_lra': 18.06, 'input_thresh': -39.2}
+
+
+def test_loudnorm_filter_uses_cached_measurement():
+    """Sem medição, normalização dinâmica; com a medição de antes, ganho linear exato"""
+    assert loudnorm_filter(-16) == 'loudnorm=I=-16:TP=-1.5:LRA=11:print_format=json'
+    assert parse_loudnorm_stats(LOUDNORM_OUTPUT) == MEASURED
+    assert parse_loudnorm_stats('sem estatísticas') is None
+    assert loudnorm_filter(-16, MEASURED) == (
+        'loudnorm=I=-16:TP=-1.5:LRA=11:measured_I=-27.61:measured_TP=-4.47:measured_LRA=18.06:'
+        'measured_thresh=-39.2:linear=true:print_format=json')
+
+
+def test_single_pass_args_for_mp3():
+    """Áudio, capa, tags e normalização saem de uma única lista de opções"""
+    info = {'title': 'Aula 1', 'uploader': 'Canal', 'upload_date': '20240105',
+            'webpage_url': 'https://youtu.be/abc'}
+    args = single_pass_args('mp3', info, has_thumbnail=True, loudnorm=loudnorm_filter(-16))
+    assert args[:8] == ['-map', '0:a:0', '-c:a', 'libmp3lame', '-q:a', '0', '-id3v2_version', '3']
+    assert args[args.index('-disposition:v') + 1] == 'attached_pic'
+    assert args[args.index('-af') + 1].startswith('loudnorm=I=-16')
+    tags = [args[i + 1] for i, arg in enumerate(args) if arg == '-metadata']
+    assert tags == ['title=Aula 1', 'artist=Canal', 'date=2024', 'comment=https://youtu.be/abc']
+    
+    video = single_pass_args('mp4', info, has_thumbnail=False)
+    assert '-af' not in video and video[video.index('-c:a') + 1] == 'copy'
+
+
+def test_loudness_cache_persists(tmp_path):
+    cache = LoudnessCache(tmp_path / 'loudness.json')
+    cache.store('Youtube:abc|140', MEASURED)
+    assert LoudnessCache(tmp_path / 'loudness.json').get('Youtube:abc|140') == MEASURED
+    assert cache.get('Youtube:outro|140') is None
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason="FFmpeg não encontrado")
+def test_mp3_is_normalized_in_one_pass_and_measurement_is_reused(monkeypatch, tmp_path):
+    """A primeira exportação mede a entrada; a segunda reaproveita a medição"""
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    create_media(str(media_dir), 1)
+    monkeypatch.setenv(main.LOUDNORM_ENV_VAR, '')
+    main.configure_loudness_target(-16)
+    
+    with FixtureServer(str(media_dir)) as server:
+        first = download_media(f"{server.base_url}/media/audio.m4a", str(tmp_path / 'a'), 'mp3', 'audio')
+        assert len(main.get_loudness_cache()._data) == 1
+        second = download_media(f"{server.base_url}/media/audio.m4a", str(tmp_path / 'b'), 'mp3', 'audio')
+    
+    for path in (first, second):
+        tags = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format_tags=comment',
+                               '-of', 'csv=p=0', path], capture_output=True, text=True).stdout
+        assert 'audio.m4a' in tags
+    assert sorted(p.name for p in (tmp_path / 'a').iterdir()) == ['audio.mp3', 'audio.mp3.sha256']
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Testes do perfilamento opcional dos jobs
+"""
+
+import pstats
+import tracemalloc
+
+import main
+from main import profile_job
+
+
+def test_profile_job_writes_files_and_summary(tmp_path):
+    """Grava .prof e snapshot de memória e resume os itens mais caros no log"""
+    messages = []
+    result = profile_job('job123', lambda: sum(range(10000)), log=messages.append, output_dir=tmp_path)
+    
+    assert result == sum(range(10000))
+    assert pstats.Stats(str(tmp_path / 'job123.prof')).total_calls > 0
+    assert tracemalloc.Snapshot.load(str(tmp_path / 'job123.tracemalloc')) is not None
+    assert any('Memória' in message for message in messages)
+    assert any('Funções mais caras' in message for message in messages)
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_dir_from_env(monkeypatch, tmp_path):
+    """A variável de ambiente liga o perfilamento sem flag na linha de comando"""
+    monkeypatch.setattr(main, '_profile_dir', None)
+    monkeypatch.delenv(main.PROFILE_ENV_VAR, raising=False)
+    assert main.get_profile_dir() is None
+    
+    monkeypatch.setenv(main.PROFILE_ENV_VAR, str(tmp_path))
+    assert main.get_profile_dir() == tmp_path
+    
+    monkeypatch.setenv(main.PROFILE_ENV_VAR, '0')
+    assert main.get_profile_dir() is None
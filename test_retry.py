@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Testes da classificação de erros, das retentativas e do circuit breaker
+"""
+
+import os
+import random
+import threading
+import urllib.error
+
+import pytest
+
+import main
+from main import (
+    classify_error, host_key, run_with_retry, CircuitBreaker,
+    RateLimitedError, BotDetectionError, UnavailableError, NetworkError, UnknownJobError,
+)
+from benchmark import FixtureServer
+
+
+@pytest.fixture(autouse=True)
+def isolated_breakers(monkeypatch):
+    """Cada teste começa com os circuit breakers fechados e limitadores novos"""
+    monkeypatch.setattr(main, '_circuit_breakers', {})
+    monkeypatch.setattr(main, '_host_limiters', {})
+
+
+def test_classify_error_by_status_and_message():
+    """Usa o código HTTP encadeado e, na falta dele, o texto da mensagem"""
+    http_error = urllib.error.HTTPError('https://x', 429, 'Too Many', {'Retry-After': '42'}, None)
+    wrapper = Exception('ERROR: unable to download')
+    wrapper.exc_info = (type(http_error), http_error, None)
+    
+    error = classify_error(wrapper)
+    assert isinstance(error, RateLimitedError)
+    assert error.retry_after == 42
+    assert isinstance(classify_error(Exception('Sign in to confirm you are not a bot')), BotDetectionError)
+    assert isinstance(classify_error(Exception('Private video')), UnavailableError)
+    assert isinstance(classify_error(Exception('Read timed out')), NetworkError)
+    assert isinstance(classify_error(Exception('???')), UnknownJobError)
+    assert classify_error(Exception('HTTP Error 403: Forbidden')).describe().startswith('❌ Acesso negado')
+
+
+def test_host_key_normalizes_aliases():
+    assert host_key('https://youtu.be/abc') == 'youtube.com'
+    assert host_key('https://www.youtube.com/watch?v=1') == 'youtube.com'
+    assert host_key('https://m.youtube.com/watch?v=1') == 'youtube.com'
+
+
+def test_run_with_retry_retries_transient_errors(monkeypatch):
+    """Erros de rede são repetidos com backoff; vídeo indisponível não"""
+    monkeypatch.setattr(random, 'uniform', lambda a, b: b)
+    sleeps, calls = [], []
+    
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError('connection reset')
+        return 'ok'
+    
+    assert run_with_retry(flaky, 'https://example.com/a', sleep=sleeps.append) == 'ok'
+    assert sleeps == [2, 4]
+    
+    def removed():
+        calls.append(1)
+        raise Exception('Video unavailable')
+    
+    calls.clear()
+    with pytest.raises(UnavailableError):
+        run_with_retry(removed, 'https://example.com/b', sleep=sleeps.append)
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_on_throttling_and_probes(monkeypatch):
+    """Dois 429 seguidos pausam o host; depois só um job de teste passa"""
+    now = [1000.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    
+    breaker.record_failure(NetworkError('x'))
+    breaker.record_failure(RateLimitedError('x'))
+    assert breaker.wait_time() == 0
+    breaker.record_failure(RateLimitedError('x', retry_after=90))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.wait_time() == 90
+    
+    now[0] += 91
+    assert breaker.wait_time() == 0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.wait_time() > 0
+    
+    breaker.record_failure(RateLimitedError('x'))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.wait_time() == 120
+    
+    now[0] += 121
+    assert breaker.wait_time() == 0
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_parse_host_limits():
+    assert main.parse_host_limits('www.youtube.com=3:0.5,vimeo.com=1') == {
+        'youtube.com': (3, 0.5, 3),
+        'vimeo.com': (1, 2.0, 1),
+    }
+    with pytest.raises(ValueError):
+        main.parse_host_limits('youtube.com=0')
+
+
+def test_host_limiter_caps_concurrency_and_rate(monkeypatch):
+    """Só `concurrency` operações ao mesmo tempo; sem tokens, espera a reposição"""
+    now = [0.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    limiter = main.HostLimiter(concurrency=1, rate=2.0, burst=1)
+    sleeps = []
+    
+    def advance(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    
+    with limiter.slot(advance):
+        assert not limiter._semaphore.acquire(blocking=False)
+    with limiter.slot(advance):
+        pass
+    assert sleeps == [0.5]
+
+
+def test_host_slot_is_held_for_extraction_not_for_the_transfer(monkeypatch, tmp_path):
+    """Com uma vaga só, dois downloads do mesmo host transferem ao mesmo tempo"""
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    (media_dir / 'video.mp4').write_bytes(os.urandom(512 * 1024))
+    monkeypatch.setitem(main.HOST_LIMITS, '127.0.0.1', (1, 100.0, 10))
+    limiter = main.get_host_limiter('127.0.0.1')
+    real_extract = main.yt_dlp.YoutubeDL.extract_info
+    slot_during_extraction = []
+    
+    def extract_info(self, *args, **kwargs):
+        slot_during_extraction.append(limiter._semaphore._value == 0)
+        return real_extract(self, *args, **kwargs)
+    
+    monkeypatch.setattr(main.yt_dlp.YoutubeDL, 'extract_info', extract_info)
+    transferring = {}
+    
+    def download(name):
+        def progress(d):
+            transferring.setdefault(name, []).append(main.time.monotonic())
+        run_with_retry(lambda: main.download_media(f"{server.base_url}/media/video.mp4", str(tmp_path / name),
+                                                   'mp4', name, progress_hook=progress), server.base_url)
+    
+    with FixtureServer(str(media_dir), bandwidth=512 * 1024) as server:
+        threads = [threading.Thread(target=download, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+    
+    assert slot_during_extraction == [True, True]
+    (a_start, a_end), (b_start, b_end) = ((t[0], t[-1]) for t in transferring.values())
+    assert a_start < b_end and b_start < a_end
+    assert (tmp_path / 'b' / 'b.mp4').stat().st_size == 512 * 1024
+
+
+def test_batch_analysis_respects_the_host_limit(monkeypatch):
+    """Com 6 análises simultâneas no lote, um host limitado a 2 nunca recebe mais que 2"""
+    monkeypatch.setitem(main.HOST_LIMITS, 'example.com', (2, 1000.0, 100))
+    lock, active, peak = threading.Lock(), [0], [0]
+    
+    def fetch_video_info(url):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        main.time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return {'title': url}
+    
+    monkeypatch.setattr(main, 'fetch_video_info', fetch_video_info)
+    analyzed = []
+    batch = main.BatchInfoThread([f"https://example.com/v/{index}" for index in range(12)])
+    batch.item_analyzed.connect(lambda index, info: analyzed.append(index))
+    batch.run()
+    
+    assert sorted(analyzed) == list(range(12))
+    assert peak[0] == 2
+    
+    peak[0] = 0
+    cache = main.MetadataCache()
+    threads = [threading.Thread(target=cache.get, args=(f"https://example.com/i/{index}",)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak[0] == 2
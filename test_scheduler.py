@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Testes da fila de jobs com prioridade e tamanho
+"""
+
+import queue
+
+import pytest
+
+import main
+from main import JobScheduler, estimate_job_cost
+
+
+def test_estimate_job_cost():
+    assert estimate_job_cost({'duration': 600}) == 600
+    assert estimate_job_cost({'duration': 600, 'priority': 3}) == 200
+    assert estimate_job_cost({'duration': 600, 'clip_range': (10.0, 70.0)}) == 60
+    assert estimate_job_cost({'duration': 600, 'clip_range': (100.0, float('inf'))}) == 500
+    assert estimate_job_cost({'filesize': main.ASSUMED_BYTES_PER_SECOND * 30}) == 30
+    assert estimate_job_cost({}) == main.DEFAULT_JOB_COST
+
+
+def test_shortest_first_with_aging(monkeypatch):
+    """Jobs curtos passam na frente, mas um job longo antigo acaba sendo atendido"""
+    now = [0.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    scheduler = JobScheduler(aging_rate=10)
+    
+    scheduler.put({'name': 'live', 'duration': 4 * 3600})
+    scheduler.put({'name': 'clip', 'duration': 60})
+    scheduler.put(None)
+    scheduler.put({'name': 'short', 'duration': 30})
+    assert [scheduler.get()['name'] for _ in range(3)] == ['short', 'clip', 'live']
+    assert scheduler.get() is None
+    
+    scheduler.put({'name': 'live', 'duration': 4 * 3600})
+    now[0] += 1500  # 25 minutos na fila valem 15000 s de mídia
+    scheduler.put({'name': 'clip', 'duration': 60})
+    assert scheduler.get()['name'] == 'live'
+
+
+def test_fifo_policy_and_nonblocking_get():
+    scheduler = JobScheduler(policy='fifo')
+    for name in ('a', 'b', 'c'):
+        scheduler.put({'name': name, 'duration': {'a': 900, 'b': 10, 'c': 60}[name]})
+    assert [scheduler.get()['name'] for _ in range(3)] == ['a', 'b', 'c']
+    with pytest.raises(queue.Empty):
+        scheduler.get_nowait()
+    with pytest.raises(ValueError):
+        JobScheduler(policy='lifo')
+
+
+def test_sjf_lowers_mean_completion_of_mixed_batch():
+    """No lote misto do benchmark, os clipes não esperam o stream longo"""
+    from benchmark import simulate_mean_completion
+    mixed = [14_400] + [120] * 30
+    assert simulate_mean_completion('sjf', mixed, workers=1) < simulate_mean_completion('fifo', mixed, workers=1) / 5
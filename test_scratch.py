@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testes da pasta temporária rápida e da publicação atômica no destino
+"""
+
+import errno
+import os
+
+import main
+from main import download_media, publish_output
+from benchmark import FixtureServer
+
+
+def test_download_goes_through_scratch(monkeypatch, tmp_path):
+    """O .part fica na pasta temporária; o destino só recebe o arquivo pronto e o .sha256"""
+    media_dir, scratch, share = tmp_path / 'media', tmp_path / 'scratch', tmp_path / 'share'
+    media_dir.mkdir()
+    data = os.urandom(1024 * 1024)
+    (media_dir / 'video.mp4').write_bytes(data)
+    monkeypatch.setenv(main.SCRATCH_ENV_VAR, '')  # restaurada ao fim do teste
+    main.configure_scratch_dir(str(scratch))
+    seen_in_share = []
+    
+    def progress(d):
+        seen_in_share.extend(os.listdir(share) if share.exists() else [])
+    
+    metrics = main.JobMetrics()
+    with FixtureServer(str(media_dir)) as server:
+        filename = download_media(f"{server.base_url}/media/video.mp4", str(share), 'mp4', 'video',
+                                  progress_hook=progress, metrics=metrics)
+    
+    assert filename == str(share / 'video.mp4')
+    assert (share / 'video.mp4').read_bytes() == data
+    assert sorted(os.listdir(share)) == ['video.mp4', 'video.mp4.sha256']
+    assert not seen_in_share
+    assert os.listdir(scratch) == []
+    assert 'publish' in metrics.stages
+
+
+def test_publish_across_filesystems_is_atomic(monkeypatch, tmp_path):
+    """Sem rename possível (EXDEV), copia para um nome oculto e renomeia no destino"""
+    source = tmp_path / 'scratch' / 'aula.mp4'
+    source.parent.mkdir()
+    source.write_bytes(b'x' * 100_000)
+    os.utime(source, (1_600_000_000, 1_600_000_000))
+    (tmp_path / 'scratch' / 'aula.mp4.sha256').write_text('abc  aula.mp4\n')
+    real_replace = os.replace
+    renames = []
+    
+    def replace(src, dst):
+        if not os.path.basename(src).startswith('.'):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        renames.append(os.path.basename(src))
+        return real_replace(src, dst)
+    
+    monkeypatch.setattr(main.os, 'replace', replace)
+    target = publish_output(str(source), str(tmp_path / 'share'), [f"{source}.sha256"])
+    
+    assert target == str(tmp_path / 'share' / 'aula.mp4')
+    assert open(target, 'rb').read() == b'x' * 100_000
+    assert os.stat(target).st_mtime == 1_600_000_000
+    assert sorted(os.listdir(tmp_path / 'share')) == ['aula.mp4', 'aula.mp4.sha256']
+    assert os.listdir(tmp_path / 'scratch') == []
+    assert renames[0].startswith('.aula.mp4.') and renames[0].endswith('.tmp')
+
+
+def test_untitled_streamyard_download_is_published(monkeypatch, tmp_path):
+    """O nome com data e hora é decidido uma vez, mesmo que o download atravesse a virada do segundo"""
+    media_dir, scratch, share = tmp_path / 'media', tmp_path / 'scratch', tmp_path / 'share'
+    media_dir.mkdir()
+    data = os.urandom(1024 * 1024)
+    (media_dir / 'VOD.mp4').write_bytes(data)
+    monkeypatch.setenv(main.SCRATCH_ENV_VAR, '')
+    main.configure_scratch_dir(str(scratch))
+    
+    with FixtureServer(str(media_dir), bandwidth=768 * 1024) as server:
+        monkeypatch.setattr(main, 'extract_streamyard_url', lambda url: f"{server.base_url}/media/VOD.mp4")
+        filename = download_media("https://streamyard.com/abc123", str(share), 'mp4')
+    
+    assert os.path.dirname(filename) == str(share)
+    assert os.path.basename(filename).startswith('streamyard_') and filename.endswith('.mp4')
+    assert open(filename, 'rb').read() == data
+    assert os.listdir(scratch) == []
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Testes do watchdog que reabre downloads travados
+"""
+
+import os
+
+import pytest
+
+import main
+from main import StallWatchdog, StallDetected, download_media
+from benchmark import FixtureServer
+
+
+def test_watchdog_raises_only_after_a_slow_window(monkeypatch):
+    """Uma queda rápida não conta; vazão baixa durante a janela inteira sim"""
+    now = [0.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    watchdog = StallWatchdog(min_speed=1000, window=10)
+    
+    def progress(seconds, downloaded, filename='a.part'):
+        now[0] += seconds
+        watchdog.progress_hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'filename': filename})
+    
+    progress(0, 0)
+    progress(5, 50_000)
+    progress(4, 50_100)          # lento, mas a janela ainda não fechou
+    progress(2, 70_000)          # 20 KB em 10s: acima do mínimo
+    progress(0, 0, 'b.part')     # outro arquivo tem sua própria janela
+    with pytest.raises(StallDetected):
+        progress(10, 70_500)
+    
+    watchdog.progress_hook({'status': 'finished', 'filename': 'b.part'})
+    progress(10, 5_000, 'b.part')  # começa uma nova janela após o fim
+
+
+def test_stalled_download_resumes_from_offset(monkeypatch, tmp_path):
+    """A conexão travada é reaberta e o arquivo final fica íntegro"""
+    monkeypatch.setattr(main, 'STALL_READ_BLOCK_SIZE', 4096)
+    media_dir = tmp_path / 'media'
+    media_dir.mkdir()
+    data = os.urandom(2 * 1024 * 1024)
+    (media_dir / 'video.mp4').write_bytes(data)
+    messages = []
+    metrics = main.JobMetrics()
+    
+    # Requisição 1: análise do extrator genérico; 2: download, que trava após 512 KB
+    with FixtureServer(str(media_dir), stall_after=512 * 1024, stall_requests=(2,)) as server:
+        filename = download_media(
+            f"{server.base_url}/media/video.mp4", str(tmp_path), 'mp4', 'video',
+            log=messages.append, metrics=metrics,
+            watchdog=StallWatchdog(min_speed=64 * 1024, window=1.0)
+        )
+        assert server.media_requests == 3
+    
+    assert metrics.stall_restarts == 1
+    assert any('reabrindo a conexão' in message for message in messages)
+    with open(filename, 'rb') as f:
+        assert f.read() == data
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Testes dos spans de tracing no formato do Chrome
+"""
+
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pytest
+
+import main
+
+
+def load_trace(path):
+    """Fecha o array sem terminação gravado pelo Tracer e o decodifica"""
+    return json.loads(path.read_text().rstrip().rstrip(',') + ']')
+
+
+def traced_work(name):
+    with main.trace_span(name):
+        return main.current_job_id.get()
+
+
+def traced_work_in_job(job_id, name):
+    """Alvo do processo filho: recebe o job_id explicitamente (contextvars não atravessam processos)"""
+    with main.job_context(job_id):
+        return traced_work(name)
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    tracer = main.enable_tracing(tmp_path)
+    yield tracer
+    main.disable_tracing()
+
+
+def test_job_id_propagates_to_threads_and_processes(tracer, tmp_path):
+    """Spans de threads e processos filhos caem no arquivo do mesmo job"""
+    with main.job_context('job42'):
+        with main.trace_span('job'):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                assert executor.submit(contextvars.copy_context().run, traced_work, 'thread').result() == 'job42'
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                assert executor.submit(traced_work_in_job, 'job42', 'process').result() == 'job42'
+    tracer.close_job('job42')
+    
+    events = load_trace(tmp_path / 'job42.json')
+    assert {event['name'] for event in events} == {'job', 'thread', 'process'}
+    assert all(event['ph'] == 'X' and event['args']['job_id'] == 'job42' for event in events)
+    assert len({event['pid'] for event in events}) == 2
+
+
+def test_metrics_hooks_emit_fragment_and_postprocessor_spans(tracer, tmp_path):
+    """Os hooks do yt-dlp viram spans de download, fragmentos e pós-processamento"""
+    metrics = main.JobMetrics(job_id='job7')
+    with metrics.stage('extraction', span='extract_info'):
+        pass
+    for index in (0, 1, 2):
+        metrics.progress_hook({'status': 'downloading', 'filename': 'v.mp4', 'downloaded_bytes': index,
+                               'fragment_index': index, 'fragment_count': 3})
+    metrics.progress_hook({'status': 'finished', 'filename': 'v.mp4', 'downloaded_bytes': 3})
+    metrics.postprocessor_hook({'status': 'started', 'postprocessor': 'ExtractAudio'})
+    metrics.postprocessor_hook({'status': 'finished', 'postprocessor': 'ExtractAudio'})
+    tracer.close_job('job7')
+    
+    names = [event['name'] for event in load_trace(tmp_path / 'job7.json')]
+    assert names.count('fragment') == 3
+    assert names.count('download') == 1
+    assert 'extract_info' in names and 'FFmpegExtractAudio' in names
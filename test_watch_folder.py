@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes da pasta monitorada
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import main
+from main import FolderWatcher, watch_folder
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_watcher_reports_finished_files_quickly(tmp_path, use_inotify):
+    """Arquivos já existentes e novos são entregues em menos de um segundo"""
+    (tmp_path / 'antigo.txt').write_text('https://youtu.be/a\n')
+    (tmp_path / 'ignorado.mp4').write_text('')
+    watcher = FolderWatcher(tmp_path, use_inotify=use_inotify)
+    assert watcher.backend == ('inotify' if use_inotify else 'polling')
+    assert watcher.wait(timeout=1) == [str(tmp_path / 'antigo.txt')]
+    
+    started = time.monotonic()
+    threading.Timer(0.1, lambda: (tmp_path / 'novo.txt').write_text('https://youtu.be/b\n')).start()
+    assert watcher.wait(timeout=2) == [str(tmp_path / 'novo.txt')]
+    assert time.monotonic() - started < 1.0
+    assert watcher.wait(timeout=0.3) == []
+    watcher.close()
+
+
+def test_network_folder_falls_back_to_polling(tmp_path, monkeypatch):
+    """Numa pasta NFS/SMB o inotify não veria arquivos de outras máquinas: a pasta é varrida"""
+    monkeypatch.setattr(main, 'filesystem_type', lambda path: 'nfs4')
+    watcher = FolderWatcher(tmp_path)
+    assert (watcher.backend, watcher.network_fs) == ('polling', 'nfs4')
+    (tmp_path / 'lote.txt').write_text('https://youtu.be/a\n')
+    assert watcher.wait(timeout=1) == [str(tmp_path / 'lote.txt')]
+    watcher.close()
+
+
+def test_rescan_picks_up_files_whose_events_were_lost(tmp_path):
+    """Se o evento do inotify se perder, a varredura periódica ainda entrega o arquivo (uma vez)"""
+    watcher = FolderWatcher(tmp_path, rescan_interval=0.2)
+    assert watcher.backend == 'inotify'
+    (tmp_path / 'perdido.txt').write_text('https://youtu.be/a\n')
+    time.sleep(0.05)
+    main.os.read(watcher._fd, 64 * 1024)  # descarta o IN_CLOSE_WRITE
+    assert watcher.wait(timeout=2) == [str(tmp_path / 'perdido.txt')]
+    assert watcher.wait(timeout=0.6) == []
+    watcher.close()
+
+
+def test_watch_folder_moves_files_with_reports(tmp_path, monkeypatch):
+    """Cada arquivo vai para done/ ou failed/ com seu relatório de resultados"""
+    monkeypatch.setattr(main, 'RETRY_POLICIES', {})
+    
+    def fake_download(url, output_path, download_type, custom_filename=None, **kwargs):
+        if url.endswith('erro'):
+            raise RuntimeError("Video unavailable")
+        return f"{output_path}/{url[-1]}.{download_type}"
+    monkeypatch.setattr(main, 'download_media', fake_download)
+    
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    (inbox / 'lote1.txt').write_text('https://youtu.be/a https://youtu.be/b\n# comentário\nhttps://youtu.be/a\n')
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_folder, args=(str(inbox), str(tmp_path)),
+                               kwargs={'log': lambda m: None, 'stop_event': stop})
+    watcher.start()
+    (inbox / '.parcial.txt').write_text('https://youtu.be/c\n')
+    (inbox / 'lote2.txt').write_text('https://youtu.be/erro\nnao-e-url\n')
+    
+    deadline = time.monotonic() + 5
+    while not ((inbox / 'done' / 'lote1.txt').exists() and (inbox / 'failed' / 'lote2.txt').exists()):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    stop.set()
+    watcher.join(5)
+    
+    done = [json.loads(line) for line in (inbox / 'done' / 'lote1.results.jsonl').read_text().splitlines()]
+    # Os dois jobs da linha 1 correm em paralelo: o relatório segue a ordem de término
+    assert sorted((r['line'], r['status'], r['file']) for r in done) == [(1, 'ok', f"{tmp_path}/a.mp4"),
+                                                                          (1, 'ok', f"{tmp_path}/b.mp4")]
+    failed = [json.loads(line) for line in (inbox / 'failed' / 'lote2.results.jsonl').read_text().splitlines()]
+    assert [(r['line'], r['status']) for r in failed] == [(1, 'error'), (2, 'invalid')]
+    assert (inbox / '.parcial.txt').exists()
+    assert list((inbox / 'processing').iterdir()) == []